@@ -0,0 +1,80 @@
+"""add accuracy_histograms table for rank computation
+
+Revision ID: add_accuracy_histograms
+Revises: add_monthly_session_summaries
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+import json
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_accuracy_histograms'
+down_revision: Union[str, None] = 'add_monthly_session_summaries'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(table_name: str) -> bool:
+    """Sprawdza czy tabela istnieje"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return inspector.has_table(table_name)
+
+
+HISTOGRAM_BUCKETS = 101
+
+
+def _bucket(accuracy_percent, hits, shots):
+    # Ta sama reguła co przy zapisie sesji: brak celności -> z trafień i strzałów, poza 0..100 -> pomijana
+    accuracy = accuracy_percent
+    if accuracy is None and hits is not None and shots:
+        accuracy = round((hits / shots) * 100, 2)
+    if accuracy is None or accuracy < 0 or accuracy > 100:
+        return None
+    return int(math.floor(accuracy))
+
+
+def _backfill() -> None:
+    """Histogramy wszystkich użytkowników z sesji (SQL tej rewizji, bez serwisów)."""
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT user_id, accuracy_percent, hits, shots, COUNT(*) FROM shooting_sessions "
+        "WHERE accuracy_percent IS NOT NULL OR (hits IS NOT NULL AND shots > 0) "
+        "GROUP BY user_id, accuracy_percent, hits, shots"
+    )).all()
+    histograms = {}
+    for user_id, accuracy_percent, hits, shots, count in rows:
+        buckets = histograms.setdefault(user_id, [0] * HISTOGRAM_BUCKETS)
+        bucket = _bucket(accuracy_percent, hits, shots)
+        if bucket is not None:
+            buckets[bucket] += int(count)
+    bind.execute(sa.text("DELETE FROM accuracy_histograms"))
+    if histograms:
+        bind.execute(
+            sa.text("INSERT INTO accuracy_histograms (user_id, buckets) VALUES (:user_id, :buckets)"),
+            [{"user_id": user_id, "buckets": json.dumps(buckets)} for user_id, buckets in histograms.items()]
+        )
+
+
+def upgrade() -> None:
+    if not _table_exists('accuracy_histograms'):
+        op.create_table(
+            'accuracy_histograms',
+            sa.Column('user_id', sa.String(length=64), nullable=False),
+            sa.Column('buckets', sa.JSON(), nullable=False),
+            sa.PrimaryKeyConstraint('user_id')
+        )
+
+    _backfill()
+
+
+def downgrade() -> None:
+    if _table_exists('accuracy_histograms'):
+        op.drop_table('accuracy_histograms')
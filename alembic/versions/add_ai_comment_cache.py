@@ -0,0 +1,50 @@
+"""add ai_comment_cache table
+
+Revision ID: add_ai_comment_cache
+Revises: add_currency_rate_unique
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_ai_comment_cache'
+down_revision: Union[str, None] = 'add_currency_rate_unique'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(table_name: str) -> bool:
+    """Sprawdza czy tabela istnieje"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade() -> None:
+    if not _table_exists('ai_comment_cache'):
+        op.create_table(
+            'ai_comment_cache',
+            sa.Column('fingerprint', sa.String(length=64), nullable=False),
+            sa.Column('comment', sa.Text(), nullable=False),
+            sa.Column('language', sa.String(length=10), nullable=False),
+            sa.Column('hit_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('last_used_at', sa.DateTime(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('fingerprint')
+        )
+        op.create_index('ix_ai_comment_cache_last_used_at', 'ai_comment_cache', ['last_used_at'])
+        op.create_index('ix_ai_comment_cache_expires_at', 'ai_comment_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    if _table_exists('ai_comment_cache'):
+        op.drop_index('ix_ai_comment_cache_expires_at', table_name='ai_comment_cache')
+        op.drop_index('ix_ai_comment_cache_last_used_at', table_name='ai_comment_cache')
+        op.drop_table('ai_comment_cache')
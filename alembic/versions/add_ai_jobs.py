@@ -0,0 +1,57 @@
+"""add ai_jobs table
+
+Revision ID: add_ai_jobs
+Revises: add_ai_comment_cache
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_ai_jobs'
+down_revision: Union[str, None] = 'add_ai_comment_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(table_name: str) -> bool:
+    """Sprawdza czy tabela istnieje"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade() -> None:
+    if not _table_exists('ai_jobs'):
+        op.create_table(
+            'ai_jobs',
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('session_id', sa.String(), nullable=False),
+            sa.Column('user_id', sa.String(length=64), nullable=False),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('result', sa.Text(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('error_status', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['session_id'], ['shooting_sessions.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_ai_jobs_session_id', 'ai_jobs', ['session_id'])
+        op.create_index('ix_ai_jobs_user_id', 'ai_jobs', ['user_id'])
+        op.create_index('ix_ai_jobs_status_created', 'ai_jobs', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    if _table_exists('ai_jobs'):
+        op.drop_index('ix_ai_jobs_status_created', table_name='ai_jobs')
+        op.drop_index('ix_ai_jobs_user_id', table_name='ai_jobs')
+        op.drop_index('ix_ai_jobs_session_id', table_name='ai_jobs')
+        op.drop_table('ai_jobs')
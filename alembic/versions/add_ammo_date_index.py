@@ -0,0 +1,37 @@
+"""add (ammo_id, date) index on shooting_sessions for ammo forecasts
+
+Revision ID: add_ammo_date_index
+Revises: add_gun_daily_rounds
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_ammo_date_index'
+down_revision: Union[str, None] = 'add_gun_daily_rounds'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    """Sprawdza czy indeks istnieje w tabeli"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if not inspector.has_table(table_name):
+        return False
+    return index_name in [idx['name'] for idx in inspector.get_indexes(table_name)]
+
+
+def upgrade() -> None:
+    if not _index_exists('shooting_sessions', 'ix_shooting_sessions_ammo_date'):
+        op.create_index('ix_shooting_sessions_ammo_date', 'shooting_sessions', ['ammo_id', 'date'])
+
+
+def downgrade() -> None:
+    if _index_exists('shooting_sessions', 'ix_shooting_sessions_ammo_date'):
+        op.drop_index('ix_shooting_sessions_ammo_date', table_name='shooting_sessions')
@@ -0,0 +1,45 @@
+"""add unique (code, date) index on currency_rates for bulk upsert
+
+Revision ID: add_currency_rate_unique
+Revises: add_ammo_date_index
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_currency_rate_unique'
+down_revision: Union[str, None] = 'add_ammo_date_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    """Sprawdza czy indeks istnieje w tabeli"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if not inspector.has_table(table_name):
+        return False
+    return index_name in [idx['name'] for idx in inspector.get_indexes(table_name)]
+
+
+def upgrade() -> None:
+    if not inspect(op.get_bind()).has_table('currency_rates'):
+        return
+    # Duplikaty (code, date) z dawnego zapisu po jednym kursie - zostaje najnowszy wiersz
+    op.execute(sa.text(
+        "DELETE FROM currency_rates WHERE id NOT IN "
+        "(SELECT MAX(id) FROM currency_rates GROUP BY code, date)"
+    ))
+    if not _index_exists('currency_rates', 'uq_currency_rates_code_date'):
+        op.create_index('uq_currency_rates_code_date', 'currency_rates', ['code', 'date'], unique=True)
+
+
+def downgrade() -> None:
+    if _index_exists('currency_rates', 'uq_currency_rates_code_date'):
+        op.drop_index('uq_currency_rates_code_date', table_name='currency_rates')
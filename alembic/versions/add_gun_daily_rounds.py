@@ -0,0 +1,65 @@
+"""add gun_daily_rounds table with per-day cumulative shots
+
+Revision ID: add_gun_daily_rounds
+Revises: add_maintenance_due
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_gun_daily_rounds'
+down_revision: Union[str, None] = 'add_maintenance_due'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(table_name: str) -> bool:
+    """Sprawdza czy tabela istnieje"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def _backfill() -> None:
+    """
+    Strzały dzienne i sumy narastające wszystkich broni jednym INSERT ... SELECT (SQL tej rewizji, bez serwisów).
+    Suma narastająca z funkcji okna - PostgreSQL i SQLite >= 3.25.
+    """
+    bind = op.get_bind()
+    bind.execute(sa.text("DELETE FROM gun_daily_rounds"))
+    bind.execute(sa.text(
+        "INSERT INTO gun_daily_rounds (gun_id, day, user_id, shots, cumulative_shots) "
+        "SELECT d.gun_id, d.day, g.user_id, d.shots, "
+        "SUM(d.shots) OVER (PARTITION BY d.gun_id ORDER BY d.day) "
+        "FROM (SELECT gun_id, date AS day, SUM(COALESCE(shots, 0)) AS shots "
+        "FROM shooting_sessions GROUP BY gun_id, date) d "
+        "JOIN guns g ON g.id = d.gun_id"
+    ))
+
+
+def upgrade() -> None:
+    if not _table_exists('gun_daily_rounds'):
+        op.create_table(
+            'gun_daily_rounds',
+            sa.Column('gun_id', sa.String(length=64), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('user_id', sa.String(length=64), nullable=False),
+            sa.Column('shots', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('cumulative_shots', sa.Integer(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('gun_id', 'day')
+        )
+        op.create_index('ix_gun_daily_rounds_user_id', 'gun_daily_rounds', ['user_id'])
+
+    _backfill()
+
+
+def downgrade() -> None:
+    if _table_exists('gun_daily_rounds'):
+        op.drop_index('ix_gun_daily_rounds_user_id', table_name='gun_daily_rounds')
+        op.drop_table('gun_daily_rounds')
@@ -0,0 +1,65 @@
+"""add gun_round_counters table for per-gun round counts
+
+Revision ID: add_gun_round_counters
+Revises: add_accuracy_histograms
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_gun_round_counters'
+down_revision: Union[str, None] = 'add_accuracy_histograms'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(table_name: str) -> bool:
+    """Sprawdza czy tabela istnieje"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def _backfill() -> None:
+    """Liczniki wszystkich broni z sesji i konserwacji jednym INSERT ... SELECT (SQL tej rewizji, bez serwisów)."""
+    bind = op.get_bind()
+    bind.execute(sa.text("DELETE FROM gun_round_counters"))
+    bind.execute(sa.text(
+        "INSERT INTO gun_round_counters "
+        "(gun_id, user_id, lifetime_rounds, rounds_since_maintenance, last_maintenance_date) "
+        "SELECT g.id, g.user_id, COALESCE(SUM(s.shots), 0), "
+        "COALESCE(SUM(CASE WHEN m.last_date IS NULL OR s.date > m.last_date THEN s.shots ELSE 0 END), 0), "
+        "m.last_date "
+        "FROM guns g "
+        "LEFT JOIN (SELECT gun_id, MAX(date) AS last_date FROM maintenance GROUP BY gun_id) m ON m.gun_id = g.id "
+        "LEFT JOIN shooting_sessions s ON s.gun_id = g.id "
+        "GROUP BY g.id, g.user_id, m.last_date"
+    ))
+
+
+def upgrade() -> None:
+    if not _table_exists('gun_round_counters'):
+        op.create_table(
+            'gun_round_counters',
+            sa.Column('gun_id', sa.String(length=64), nullable=False),
+            sa.Column('user_id', sa.String(length=64), nullable=False),
+            sa.Column('lifetime_rounds', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('rounds_since_maintenance', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('last_maintenance_date', sa.Date(), nullable=True),
+            sa.PrimaryKeyConstraint('gun_id')
+        )
+        op.create_index('ix_gun_round_counters_user_id', 'gun_round_counters', ['user_id'])
+
+    _backfill()
+
+
+def downgrade() -> None:
+    if _table_exists('gun_round_counters'):
+        op.drop_index('ix_gun_round_counters_user_id', table_name='gun_round_counters')
+        op.drop_table('gun_round_counters')
@@ -0,0 +1,47 @@
+"""add composite indexes for keyset pagination
+
+Revision ID: add_keyset_pagination_indexes
+Revises: update_attachments_add_fields
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_keyset_pagination_indexes'
+down_revision: Union[str, None] = 'update_attachments_add_fields'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_guns_user_name_id', 'guns', ['user_id', 'name', 'id']),
+    ('ix_ammo_user_name_id', 'ammo', ['user_id', 'name', 'id']),
+    ('ix_shooting_sessions_user_date_id', 'shooting_sessions', ['user_id', 'date', 'id']),
+    ('ix_maintenance_user_date_id', 'maintenance', ['user_id', 'date', 'id']),
+]
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    """Sprawdza czy indeks istnieje w tabeli"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if not inspector.has_table(table_name):
+        return False
+    return index_name in [idx['name'] for idx in inspector.get_indexes(table_name)]
+
+
+def upgrade() -> None:
+    for index_name, table_name, columns in INDEXES:
+        if not _index_exists(table_name, index_name):
+            op.create_index(index_name, table_name, columns)
+
+
+def downgrade() -> None:
+    for index_name, table_name, _ in INDEXES:
+        if _index_exists(table_name, index_name):
+            op.drop_index(index_name, table_name=table_name)
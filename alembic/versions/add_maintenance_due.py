@@ -0,0 +1,74 @@
+"""add maintenance_due table and per-gun date indexes
+
+Revision ID: add_maintenance_due
+Revises: add_gun_round_counters
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_maintenance_due'
+down_revision: Union[str, None] = 'add_gun_round_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_shooting_sessions_gun_date', 'shooting_sessions', ['gun_id', 'date']),
+    ('ix_maintenance_gun_date', 'maintenance', ['gun_id', 'date']),
+]
+
+
+def _table_exists(table_name: str) -> bool:
+    """Sprawdza czy tabela istnieje"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    """Sprawdza czy indeks istnieje w tabeli"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if not inspector.has_table(table_name):
+        return False
+    return index_name in [idx['name'] for idx in inspector.get_indexes(table_name)]
+
+
+def upgrade() -> None:
+    if not _table_exists('maintenance_due'):
+        op.create_table(
+            'maintenance_due',
+            sa.Column('gun_id', sa.String(length=64), nullable=False),
+            sa.Column('user_id', sa.String(length=64), nullable=False),
+            sa.Column('gun_name', sa.String(length=100), nullable=False),
+            sa.Column('rounds_since_last', sa.Integer(), nullable=False),
+            sa.Column('rounds_limit', sa.Integer(), nullable=False),
+            sa.Column('days_since_last', sa.Integer(), nullable=False),
+            sa.Column('days_limit', sa.Integer(), nullable=False),
+            sa.Column('rounds_exceeded', sa.Boolean(), nullable=False),
+            sa.Column('days_exceeded', sa.Boolean(), nullable=False),
+            sa.Column('evaluated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('gun_id')
+        )
+        op.create_index('ix_maintenance_due_user_id', 'maintenance_due', ['user_id'])
+
+    # Tabela jest wypełniana przez zadanie w tle przy pierwszym przebiegu po starcie
+    for index_name, table_name, columns in INDEXES:
+        if not _index_exists(table_name, index_name):
+            op.create_index(index_name, table_name, columns)
+
+
+def downgrade() -> None:
+    for index_name, table_name, _ in INDEXES:
+        if _index_exists(table_name, index_name):
+            op.drop_index(index_name, table_name=table_name)
+    if _table_exists('maintenance_due'):
+        op.drop_index('ix_maintenance_due_user_id', table_name='maintenance_due')
+        op.drop_table('maintenance_due')
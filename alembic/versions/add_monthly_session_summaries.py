@@ -0,0 +1,96 @@
+"""add monthly_session_summaries rollup table
+
+Revision ID: add_monthly_session_summaries
+Revises: add_search_text
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from uuid import uuid4
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_monthly_session_summaries'
+down_revision: Union[str, None] = 'add_search_text'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(table_name: str) -> bool:
+    """Sprawdza czy tabela istnieje"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def _backfill() -> None:
+    """Sumy z istniejących sesji jednym zgrupowanym zapytaniem (SQL tej rewizji, bez serwisów)."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        month = "to_char(date, 'YYYY-MM')"
+    else:
+        month = "strftime('%Y-%m', date)"
+    rows = bind.execute(sa.text(
+        f"SELECT user_id, {month} AS month, gun_id, ammo_id, "
+        "SUM(COALESCE(cost, 0)), SUM(shots), COUNT(id) "
+        "FROM shooting_sessions "
+        f"GROUP BY user_id, {month}, gun_id, ammo_id"
+    )).all()
+    bind.execute(sa.text("DELETE FROM monthly_session_summaries"))
+    if not rows:
+        return
+    bind.execute(
+        sa.text(
+            "INSERT INTO monthly_session_summaries "
+            "(id, user_id, month, gun_id, ammo_id, total_cost, total_shots, session_count) "
+            "VALUES (:id, :user_id, :month, :gun_id, :ammo_id, :total_cost, :total_shots, :session_count)"
+        ),
+        [
+            {
+                "id": str(uuid4()),
+                "user_id": user_id,
+                "month": month_value,
+                "gun_id": gun_id,
+                "ammo_id": ammo_id,
+                "total_cost": round(float(cost or 0.0), 2),
+                "total_shots": int(shots or 0),
+                "session_count": int(count),
+            }
+            for user_id, month_value, gun_id, ammo_id, cost, shots, count in rows
+        ]
+    )
+
+
+def upgrade() -> None:
+    if not _table_exists('monthly_session_summaries'):
+        op.create_table(
+            'monthly_session_summaries',
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('user_id', sa.String(length=64), nullable=False),
+            sa.Column('month', sa.String(length=7), nullable=False),
+            sa.Column('gun_id', sa.String(length=64), nullable=False),
+            sa.Column('ammo_id', sa.String(length=64), nullable=False),
+            sa.Column('total_cost', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('total_shots', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('session_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'month', 'gun_id', 'ammo_id', name='uq_monthly_session_summaries_key')
+        )
+        op.create_index(
+            'ix_monthly_session_summaries_user_month',
+            'monthly_session_summaries',
+            ['user_id', 'month']
+        )
+
+    # Jednorazowe wypełnienie z istniejących sesji
+    _backfill()
+
+
+def downgrade() -> None:
+    if _table_exists('monthly_session_summaries'):
+        op.drop_index('ix_monthly_session_summaries_user_month', table_name='monthly_session_summaries')
+        op.drop_table('monthly_session_summaries')
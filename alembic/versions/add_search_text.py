@@ -0,0 +1,101 @@
+"""add normalized search_text columns and trigram indexes
+
+Revision ID: add_search_text
+Revises: add_keyset_pagination_indexes
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_search_text'
+down_revision: Union[str, None] = 'add_keyset_pagination_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ['guns', 'ammo', 'shooting_sessions']
+
+# Kolumny składające się na search_text w chwili tej rewizji (kopia - migracja nie importuje modeli ani serwisów)
+SEARCH_FIELDS = {
+    'guns': ('name', 'caliber', 'type', 'notes'),
+    'ammo': ('name', 'caliber'),
+    'shooting_sessions': ('date', 'notes', 'ai_comment'),
+}
+BATCH_SIZE = 500
+
+_SPECIAL_CHARS = str.maketrans({"ł": "l", "Ł": "l", "ß": "ss"})
+
+
+def _normalize(value) -> str:
+    if value in (None, ""):
+        return ""
+    value = str(value).translate(_SPECIAL_CHARS)
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+def _backfill(bind, table_name: str, fields) -> None:
+    """Wypełnia search_text partiami po id (normalizacja w Pythonie, zapis jednym UPDATE na partię)."""
+    select_sql = sa.text(
+        f"SELECT id, {', '.join(fields)} FROM {table_name} WHERE id > :after ORDER BY id LIMIT :limit"
+    )
+    update_sql = sa.text(f"UPDATE {table_name} SET search_text = :search_text WHERE id = :id")
+    after = ""
+    while True:
+        rows = bind.execute(select_sql, {"after": after, "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            text = " ".join(part for part in (_normalize(value) for value in row[1:]) if part)
+            params.append({"id": row[0], "search_text": text or None})
+        bind.execute(update_sql, params)
+        after = rows[-1][0]
+
+
+def _column_exists(table_name: str, column_name: str) -> bool:
+    """Sprawdza czy kolumna istnieje w tabeli"""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if not inspector.has_table(table_name):
+        return False
+    columns = [col['name'] for col in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for table_name in TABLES:
+        if not _column_exists(table_name, 'search_text'):
+            op.add_column(table_name, sa.Column('search_text', sa.Text(), nullable=True))
+
+    # Wypełnij kolumnę dla istniejących rekordów
+    for table_name in TABLES:
+        _backfill(bind, table_name, SEARCH_FIELDS[table_name])
+
+    if bind.dialect.name == 'postgresql':
+        # Indeks trigramowy przyspiesza LIKE '%fraza%' i ranking similarity()
+        op.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table_name in TABLES:
+            op.execute(sa.text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table_name}_search_text_trgm "
+                f"ON {table_name} USING gin (search_text gin_trgm_ops)"
+            ))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table_name in TABLES:
+            op.execute(sa.text(f"DROP INDEX IF EXISTS ix_{table_name}_search_text_trgm"))
+    for table_name in TABLES:
+        if _column_exists(table_name, 'search_text'):
+            op.drop_column(table_name, 'search_text')
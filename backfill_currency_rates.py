@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import asyncio
+from datetime import date, timedelta
+from typing import Optional
+from sqlmodel import select
+from sqlalchemy import func
+from database import async_session_maker
+from models import ShootingSession
+from services.currency_service import backfill_currency_rates, close_http_client
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def main(start: Optional[date], end: Optional[date]) -> int:
+    try:
+        async with async_session_maker() as session:
+            if start is None:
+                # Domyślnie od najstarszej sesji (kilka dni wcześniej - pierwsza sesja może wypaść w weekend)
+                first = (await session.exec(select(func.min(ShootingSession.date)))).first()
+                start = (first or date.today()) - timedelta(days=7)
+            return await backfill_currency_rates(session, start, end)
+    finally:
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    start = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    end = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+    try:
+        count = asyncio.run(main(start, end))
+        logger.info(f"Currency rates backfilled: {count} rows")
+    except Exception as e:
+        logger.error(f"Error backfilling currency rates: {e}")
+        sys.exit(1)
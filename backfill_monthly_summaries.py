@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import get_session
+from services.session_summary_service import SessionSummaryService
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    try:
+        session = next(get_session())
+        created = SessionSummaryService.rebuild(session, user_id=user_id)
+        logger.info(f"Monthly summaries rebuilt: {created} rows")
+    except Exception as e:
+        logger.error(f"Error rebuilding monthly summaries: {e}")
+        sys.exit(1)
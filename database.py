@@ -1,7 +1,11 @@
-from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from sqlmodel import SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Generator, AsyncGenerator
 from settings import settings
-from sqlalchemy import inspect, text
+from sqlalchemy import inspect, text, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from services.pool_metrics import TimedQueuePool, TimedAsyncAdaptedQueuePool, instrument_engine
 import logging
 
 DATABASE_URL = settings.database_url or "sqlite:///./dev.db"
@@ -9,17 +13,95 @@ DATABASE_URL = settings.database_url or "sqlite:///./dev.db"
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://", 1)
 
+
+def _to_async_url(url: str) -> str:
+    """Sterownik asynchroniczny dla tego samego URL: asyncpg dla PostgreSQL, aiosqlite dla SQLite"""
+    if url.startswith("postgresql+psycopg2://"):
+        return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite:///") or url == "sqlite://":
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+ASYNC_DATABASE_URL = _to_async_url(DATABASE_URL)
+
 echo_sql = settings.debug
 
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    """Parametry puli i połączenia z ustawień; SQLite zostaje przy domyślnej puli."""
+    if "sqlite" in url:
+        return {"connect_args": {"check_same_thread": False}}
+
+    connect_args = {}
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+
+    if settings.db_pooler_mode:
+        # Pooler transakcyjny sam trzyma połączenia - aplikacja nie może ich przetrzymywać,
+        # a prepared statements nie przeżywają zmiany połączenia serwerowego
+        options["poolclass"] = NullPool
+        if is_async:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+    else:
+        options.update(
+            poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+        if settings.db_statement_timeout_ms:
+            # Parametr startowy sesji - bez dodatkowego zapytania na każde połączenie
+            if is_async:
+                connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+            else:
+                connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+
+    options["connect_args"] = connect_args
+    return options
+
+
+def _set_local_statement_timeout(sync_engine) -> None:
+    """
+    Za poolerem transakcyjnym parametry startowe sesji są odrzucane lub gubione,
+    więc limit jest ustawiany per transakcja (SET LOCAL nie przecieka do innych klientów).
+    """
+    timeout_ms = int(settings.db_statement_timeout_ms)
+
+    @event.listens_for(sync_engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
 engine = create_engine(
     DATABASE_URL,
     echo=echo_sql,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    **_engine_options(DATABASE_URL, is_async=False)
 )
 
-def get_async_session() -> Generator[Session, None, None]:
+# Silnik asynchroniczny dla endpointów - zapytania nie blokują pętli zdarzeń.
+# Synchroniczny `engine` zostaje dla init_db, migracji i skryptów.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=echo_sql,
+    **_engine_options(ASYNC_DATABASE_URL, is_async=True)
+)
+
+if settings.db_pooler_mode and settings.db_statement_timeout_ms and "sqlite" not in DATABASE_URL:
+    _set_local_statement_timeout(engine)
+    _set_local_statement_timeout(async_engine.sync_engine)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine, "async")
+
+# expire_on_commit=False - po commit atrybuty nie są przeładowywane leniwie (w async to błąd)
+async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """Unified function for getting database session"""
-    with Session(engine) as session:
+    async with async_session_maker() as session:
         yield session
 
 def init_db():
@@ -89,8 +171,67 @@ def init_db():
                         logging.info("Added final_score column to shooting_sessions table")
     except Exception as e:
         logging.warning(f"Could not add columns to shooting_sessions: {e}")
+    
+    try:
+        inspector = inspect(engine)
+        added_search_text = False
+        for table_name in ("guns", "ammo", "shooting_sessions"):
+            if not inspector.has_table(table_name):
+                continue
+            columns = [col["name"] for col in inspector.get_columns(table_name)]
+            if "search_text" not in columns:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN search_text TEXT"))
+                    logging.info(f"Added search_text column to {table_name} table")
+                added_search_text = True
+        if added_search_text:
+            from services.search_service import rebuild_search_text
+            with Session(engine) as session:
+                rebuild_search_text(session)
+    except Exception as e:
+        logging.warning(f"Could not add search_text columns: {e}")
+
+    try:
+        from models import MonthlySessionSummary, ShootingSession
+        with Session(engine) as session:
+            has_summaries = session.exec(select(MonthlySessionSummary.id).limit(1)).first()
+            has_sessions = session.exec(select(ShootingSession.id).limit(1)).first()
+            if has_sessions and not has_summaries:
+                from services.session_summary_service import SessionSummaryService
+                SessionSummaryService.rebuild(session)
+    except Exception as e:
+        logging.warning(f"Could not backfill monthly session summaries: {e}")
+
+    # Wdrożenia bez `alembic upgrade` (tylko create_all): tabele liczników zaczynają puste,
+    # a zapis sesji dolicza tylko różnicę - historię trzeba przeliczyć z sesji przed pierwszym użyciem
+    try:
+        from models import AccuracyHistogram, ShootingSession
+        with Session(engine) as session:
+            missing_histogram = session.exec(
+                select(ShootingSession.user_id)
+                .where(ShootingSession.user_id.not_in(select(AccuracyHistogram.user_id)))
+                .limit(1)
+            ).first()
+            if missing_histogram:
+                from services.accuracy_histogram_service import AccuracyHistogramService
+                AccuracyHistogramService.rebuild_all(session)
+    except Exception as e:
+        logging.warning(f"Could not backfill accuracy histograms: {e}")
+
+    try:
+        from models import Gun, GunRoundCounter
+        with Session(engine) as session:
+            missing_counter = session.exec(
+                select(Gun.id).where(Gun.id.not_in(select(GunRoundCounter.gun_id))).limit(1)
+            ).first()
+            if missing_counter:
+                # Uzgadnianie buduje liczniki i sumy dzienne (gun_daily_rounds) wszystkich broni
+                from services.gun_round_counter_service import GunRoundCounterService
+                GunRoundCounterService.reconcile(session)
+    except Exception as e:
+        logging.warning(f"Could not backfill gun round counters: {e}")
 
 def get_session() -> Generator[Session, None, None]:
-    """Alias for get_async_session for backward compatibility"""
+    """Synchroniczna sesja dla skryptów i zadań uruchamianych poza pętlą zdarzeń"""
     with Session(engine) as session:
         yield session
\ No newline at end of file
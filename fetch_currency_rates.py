@@ -2,7 +2,8 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
-from database import get_session
+import asyncio
+from database import async_session_maker
 from services.currency_service import fetch_and_save_currency_rates
 import logging
 
@@ -13,10 +14,15 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+async def main() -> dict:
+    async with async_session_maker() as session:
+        return await fetch_and_save_currency_rates(session)
+
+
 if __name__ == "__main__":
     try:
-        session = next(get_session())
-        results = fetch_and_save_currency_rates(session)
+        results = asyncio.run(main())
         logger.info(f"Currency rates fetched successfully: {results}")
     except Exception as e:
         logger.error(f"Error fetching currency rates: {e}")
@@ -1,10 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db
-from routers import guns, ammo, auth, maintenance, settings as settings_router, account, attachments, shooting_sessions, currency_rates
+from fastapi.responses import JSONResponse
+from routers import guns, ammo, auth, maintenance, settings as settings_router, account, attachments, shooting_sessions, currency_rates, search
 import logging
 import os
 from settings import settings
+from routers.auth import role_required
+from services.user_context import UserRole
 import models
 
 logging.basicConfig(
@@ -29,33 +31,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Has-More", "X-Next-Cursor"],
 )
 
 @app.on_event("startup")
-def startup_event():
-    init_db()
-    # Pobierz kursy walut przy starcie aplikacji (tylko jeśli nie ma dzisiejszych kursów)
-    try:
-        from database import get_session
-        from services.currency_service import fetch_and_save_currency_rates, get_latest_rate
-        from datetime import date
-        session_gen = get_session()
-        session = next(session_gen)
-        today = date.today()
-        
-        # Sprawdź czy mamy już dzisiejsze kursy
-        has_today_rates = all(
-            get_latest_rate(session, code) and get_latest_rate(session, code).date == today
-            for code in ["USD", "EUR", "GBP"]
-        )
-        
-        if not has_today_rates:
-            fetch_and_save_currency_rates(session)
-            logging.info("Currency rates fetched on startup")
-        else:
-            logging.info("Currency rates already up to date")
-    except Exception as e:
-        logging.warning(f"Could not fetch currency rates on startup: {e}")
+async def startup_event():
+    # Szybka ścieżka: schemat, kursy walut i zadania okresowe startują w tle - stan w GET /ready
+    from services.warmup_service import start_warmup
+    start_warmup()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from database import async_engine
+    from services.currency_service import close_http_client
+    from services.warmup_service import stop_warmup
+    from services.ai_service import close_ai_clients
+    from services.ai_job_service import AIJobService
+    await stop_warmup()
+    await AIJobService.stop_workers()
+    await close_http_client()
+    await close_ai_clients()
+    await async_engine.dispose()
 
 app.include_router(guns.router, prefix="/api/guns", tags=["Broń"])
 app.include_router(ammo.router, prefix="/api/ammo", tags=["Amunicja"])
@@ -66,6 +63,7 @@ app.include_router(account.router, prefix="/api/account", tags=["Konto"])
 app.include_router(attachments.router, prefix="/api", tags=["Wyposażenie"])
 app.include_router(shooting_sessions.router, prefix="/api", tags=["Sesje strzeleckie"])
 app.include_router(currency_rates.router, prefix="/api/currency-rates", tags=["Kursy walut"])
+app.include_router(search.router, prefix="/api/search", tags=["Wyszukiwanie"])
 
 
 @app.get("/")
@@ -76,6 +74,25 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+def readiness_check():
+    """Gotowość do obsługi ruchu: 503, dopóki wymagane kroki rozgrzewki się nie zakończą"""
+    from services.warmup_service import get_warmup_state
+    state = get_warmup_state().snapshot()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@app.get("/health/pool", dependencies=[Depends(role_required([UserRole.admin]))])
+def pool_health():
+    """Stan i liczniki pul połączeń (checkout, oczekiwanie, timeouty, unieważnione połączenia)"""
+    from services.pool_metrics import get_pool_stats
+    return get_pool_stats()
+
+@app.get("/health/ai-cache", dependencies=[Depends(role_required([UserRole.admin]))])
+def ai_cache_health():
+    """Liczniki cache komentarzy AI (trafienia w pamięci i w bazie, chybienia, zapisy) - tylko admin"""
+    from services.ai_comment_cache_service import AICommentCacheService
+    return AICommentCacheService.stats()
+
 if __name__ == "__main__":
     import os
     import uvicorn
@@ -5,6 +5,24 @@ from .attachment import Attachment, AttachmentBase, AttachmentType
 from .maintenance import Maintenance, MaintenanceBase
 from .user import User, UserBase, UserSettings, UserSettingsBase
 from .currency_rate import CurrencyRate, CurrencyRateBase
+from .session_summary import MonthlySessionSummary
+from .accuracy_histogram import AccuracyHistogram, HISTOGRAM_BUCKETS
+from .gun_round_counter import GunRoundCounter
+from .gun_daily_rounds import GunDailyRounds
+from .maintenance_due import MaintenanceDue
+from .ai_comment_cache import AICommentCache
+from .ai_job import AIJob
+from .search_text import register_search_text, normalize_search_text
+
+# Pola składające się na znormalizowaną kolumnę `search_text`
+SEARCH_TEXT_FIELDS = {
+    Gun: ("name", "caliber", "type", "notes"),
+    Ammo: ("name", "caliber"),
+    ShootingSession: ("date", "notes", "ai_comment"),
+}
+
+for _model, _fields in SEARCH_TEXT_FIELDS.items():
+    register_search_text(_model, _fields)
 
 __all__ = [
     "Gun",
@@ -28,4 +46,14 @@ __all__ = [
     "UserSettingsBase",
     "CurrencyRate",
     "CurrencyRateBase",
+    "MonthlySessionSummary",
+    "AccuracyHistogram",
+    "HISTOGRAM_BUCKETS",
+    "GunRoundCounter",
+    "GunDailyRounds",
+    "MaintenanceDue",
+    "AICommentCache",
+    "AIJob",
+    "SEARCH_TEXT_FIELDS",
+    "normalize_search_text",
 ]
@@ -0,0 +1,19 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, JSON
+from typing import List
+
+
+HISTOGRAM_BUCKETS = 101  # celność 0..100% z dokładnością do 1 punktu procentowego
+
+
+class AccuracyHistogram(SQLModel, table=True):
+    """
+    Liczba sesji użytkownika w każdym koszyku celności (indeks = pełne procenty).
+    Pozwala policzyć zaliczone sesje dla dowolnego progu bez skanowania sesji.
+    """
+    __tablename__ = "accuracy_histograms"
+    user_id: str = Field(primary_key=True, max_length=64)
+    buckets: List[int] = Field(
+        default_factory=lambda: [0] * HISTOGRAM_BUCKETS,
+        sa_column=Column(JSON, nullable=False)
+    )
@@ -0,0 +1,19 @@
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import Text
+from datetime import datetime
+
+
+class AICommentCache(SQLModel, table=True):
+    """
+    Komentarze AI adresowane odciskiem znormalizowanych danych promptu (sha256).
+    Te same dane sesji (typ broni, kaliber, dystans, trafienia, przedział celności, poziom, język)
+    dają ten sam komentarz bez ponownego wywołania modelu.
+    """
+    __tablename__ = "ai_comment_cache"
+    fingerprint: str = Field(primary_key=True, max_length=64)
+    comment: str = Field(sa_column=Column(Text, nullable=False))
+    language: str = Field(max_length=10)
+    hit_count: int = Field(default=0)
+    created_at: datetime
+    last_used_at: datetime = Field(index=True)
+    expires_at: datetime = Field(index=True)
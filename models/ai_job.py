@@ -0,0 +1,25 @@
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import ForeignKey, Index, Text
+from typing import Optional
+from uuid import uuid4
+from datetime import datetime
+
+
+class AIJob(SQLModel, table=True):
+    """
+    Zlecenie analizy AI sesji (komentarz tekstowy lub Vision) wykonywane przez pulę workerów w tle.
+    Stan: queued -> running -> done/failed; wynik jako JSON w `result`.
+    """
+    __tablename__ = "ai_jobs"
+    __table_args__ = (Index("ix_ai_jobs_status_created", "status", "created_at"),)
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    session_id: str = Field(sa_column=Column(ForeignKey("shooting_sessions.id", ondelete="CASCADE"), nullable=False, index=True))
+    user_id: str = Field(index=True, max_length=64)
+    role: str = Field(default="user", max_length=20)
+    status: str = Field(default="queued", max_length=20)
+    result: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    error: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    error_status: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
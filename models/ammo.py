@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship, Column
-from sqlalchemy import Enum as SQLEnum
+from sqlalchemy import Enum as SQLEnum, Index, Text
 from typing import Optional, List
 from uuid import uuid4
 from datetime import datetime
@@ -47,9 +47,11 @@ class AmmoUpdate(SQLModel):
 
 class Ammo(AmmoBase, table=True):
     __tablename__ = "ammo"
+    __table_args__ = (Index("ix_ammo_user_name_id", "user_id", "name", "id"),)
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     user_id: str = Field(index=True, max_length=64)
     type: Optional[AmmoType] = Field(default=None, sa_column=Column(SQLEnum(AmmoType, name="ammo_type_enum"), nullable=True))
     category: Optional[AmmoCategory] = Field(default=None, sa_column=Column(SQLEnum(AmmoCategory, name="ammo_category_enum"), nullable=True))
+    search_text: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
     sessions: List["ShootingSession"] = Relationship(back_populates="ammo", passive_deletes=True)
 
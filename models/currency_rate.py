@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from datetime import date as Date
 from typing import Optional
 
@@ -11,5 +12,6 @@ class CurrencyRateBase(SQLModel):
 
 class CurrencyRate(CurrencyRateBase, table=True):
     __tablename__ = "currency_rates"
+    __table_args__ = (Index("uq_currency_rates_code_date", "code", "date", unique=True),)
     id: Optional[int] = Field(default=None, primary_key=True)
 
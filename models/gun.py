@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship, Column
-from sqlalchemy import Date
+from sqlalchemy import Date, Index, Text
 from typing import Optional, List
 from uuid import uuid4
 from datetime import date
@@ -23,9 +23,11 @@ class GunUpdate(SQLModel):
 
 class Gun(GunBase, table=True):
     __tablename__ = "guns"
+    __table_args__ = (Index("ix_guns_user_name_id", "user_id", "name", "id"),)
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     user_id: str = Field(index=True, max_length=64)
     created_at: date = Field(default_factory=lambda: date.today(), sa_column=Column(Date, default=date.today))
+    search_text: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
     sessions: List["ShootingSession"] = Relationship(back_populates="gun", passive_deletes=True)
     attachments: List["Attachment"] = Relationship(back_populates="gun", passive_deletes=True)
     maintenance: List["Maintenance"] = Relationship(back_populates="gun", passive_deletes=True)
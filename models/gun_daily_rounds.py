@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel, Field
+from datetime import date as Date
+
+
+class GunDailyRounds(SQLModel, table=True):
+    """
+    Strzały broni w danym dniu i suma narastająca do tego dnia włącznie.
+    Strzały w przedziale dat to różnica dwóch sum narastających.
+    """
+    __tablename__ = "gun_daily_rounds"
+    gun_id: str = Field(primary_key=True, max_length=64)
+    day: Date = Field(primary_key=True)
+    user_id: str = Field(index=True, max_length=64)
+    shots: int = Field(default=0)
+    cumulative_shots: int = Field(default=0)
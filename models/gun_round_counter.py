@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import date as Date
+
+
+class GunRoundCounter(SQLModel, table=True):
+    """
+    Liczniki strzałów broni: łącznie i od ostatniej konserwacji.
+    Aktualizowane o różnicę przy zapisie sesji i zerowane przy dodaniu konserwacji.
+    """
+    __tablename__ = "gun_round_counters"
+    gun_id: str = Field(primary_key=True, max_length=64)
+    user_id: str = Field(index=True, max_length=64)
+    lifetime_rounds: int = Field(default=0)
+    rounds_since_maintenance: int = Field(default=0)
+    last_maintenance_date: Optional[Date] = Field(default=None)
@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship, Column
-from sqlalchemy import ForeignKey, JSON
+from sqlalchemy import ForeignKey, JSON, Index
 from typing import Optional, List
 from uuid import uuid4
 from datetime import date as Date, datetime
@@ -14,6 +14,10 @@ class MaintenanceBase(SQLModel):
 
 class Maintenance(MaintenanceBase, table=True):
     __tablename__ = "maintenance"
+    __table_args__ = (
+        Index("ix_maintenance_user_date_id", "user_id", "date", "id"),
+        Index("ix_maintenance_gun_date", "gun_id", "date"),
+    )
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     gun_id: str = Field(sa_column=Column(ForeignKey("guns.id", ondelete="CASCADE"), nullable=False))
     user_id: str = Field(index=True, max_length=64)
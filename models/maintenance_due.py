@@ -0,0 +1,20 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class MaintenanceDue(SQLModel, table=True):
+    """
+    Broń, która przekroczyła limit strzałów lub dni od ostatniej konserwacji.
+    Wypełniana okresowo przez MaintenanceDueService.evaluate - odczyt nie przelicza stanu.
+    """
+    __tablename__ = "maintenance_due"
+    gun_id: str = Field(primary_key=True, max_length=64)
+    user_id: str = Field(index=True, max_length=64)
+    gun_name: str = Field(max_length=100)
+    rounds_since_last: int = Field(default=0)
+    rounds_limit: int
+    days_since_last: int = Field(default=0)
+    days_limit: int
+    rounds_exceeded: bool = Field(default=False)
+    days_exceeded: bool = Field(default=False)
+    evaluated_at: datetime
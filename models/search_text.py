@@ -0,0 +1,41 @@
+import unicodedata
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import event
+
+
+# Litery, których NFKD nie rozkłada na literę bazową + znak diakrytyczny
+_SPECIAL_CHARS = str.maketrans({"ł": "l", "Ł": "l", "ß": "ss"})
+
+
+def normalize_search_text(value: Optional[str]) -> str:
+    """
+    Normalizuje tekst do wyszukiwania: małe litery, bez polskich znaków
+    i zbędnych spacji ("Żółć  Łódź" -> "zolc lodz").
+    """
+    if not value:
+        return ""
+    value = value.translate(_SPECIAL_CHARS)
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+def build_search_text(parts: Iterable[Any]) -> Optional[str]:
+    normalized = [normalize_search_text(str(part)) for part in parts if part not in (None, "")]
+    text = " ".join(part for part in normalized if part)
+    return text or None
+
+
+def register_search_text(model, fields: Iterable[str]) -> None:
+    """
+    Utrzymuje kolumnę `search_text` modelu przy każdym INSERT/UPDATE,
+    dzięki czemu wyszukiwanie nie musi normalizować kolumn w zapytaniu.
+    """
+    fields = tuple(fields)
+
+    def _refresh(mapper, connection, target):
+        target.search_text = build_search_text(getattr(target, name, None) for name in fields)
+
+    event.listen(model, "before_insert", _refresh)
+    event.listen(model, "before_update", _refresh)
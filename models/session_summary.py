@@ -0,0 +1,23 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, UniqueConstraint
+from uuid import uuid4
+
+
+class MonthlySessionSummary(SQLModel, table=True):
+    """
+    Miesięczne sumy kosztów i strzałów per (użytkownik, miesiąc, broń, amunicja).
+    Aktualizowane przyrostowo przy zapisie sesji strzeleckich.
+    """
+    __tablename__ = "monthly_session_summaries"
+    __table_args__ = (
+        UniqueConstraint("user_id", "month", "gun_id", "ammo_id", name="uq_monthly_session_summaries_key"),
+        Index("ix_monthly_session_summaries_user_month", "user_id", "month"),
+    )
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    user_id: str = Field(max_length=64)
+    month: str = Field(max_length=7)  # YYYY-MM
+    gun_id: str = Field(max_length=64)
+    ammo_id: str = Field(max_length=64)
+    total_cost: float = Field(default=0.0)
+    total_shots: int = Field(default=0)
+    session_count: int = Field(default=0)
@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship, Column
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, Text
 from typing import Optional
 from uuid import uuid4
 from datetime import date as Date, datetime
@@ -22,9 +22,15 @@ class ShootingSessionBase(SQLModel):
 
 class ShootingSession(ShootingSessionBase, table=True):
     __tablename__ = "shooting_sessions"
+    __table_args__ = (
+        Index("ix_shooting_sessions_user_date_id", "user_id", "date", "id"),
+        Index("ix_shooting_sessions_gun_date", "gun_id", "date"),
+        Index("ix_shooting_sessions_ammo_date", "ammo_id", "date"),
+    )
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     gun_id: str = Field(sa_column=Column(ForeignKey("guns.id", ondelete="CASCADE"), nullable=False))
     ammo_id: str = Field(sa_column=Column(ForeignKey("ammo.id", ondelete="CASCADE"), nullable=False))
     user_id: str = Field(index=True, max_length=64)
+    search_text: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
     gun: Optional["Gun"] = Relationship(back_populates="sessions", passive_deletes=True)
     ammo: Optional["Ammo"] = Relationship(back_populates="sessions", passive_deletes=True)
@@ -0,0 +1,28 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import get_session
+from services.accuracy_histogram_service import AccuracyHistogramService
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    try:
+        session = next(get_session())
+        if user_id:
+            AccuracyHistogramService.rebuild(session, user_id)
+            logger.info(f"Accuracy histogram rebuilt for user {user_id}")
+        else:
+            count = AccuracyHistogramService.rebuild_all(session)
+            logger.info(f"Accuracy histograms rebuilt for {count} users")
+    except Exception as e:
+        logger.error(f"Error rebuilding accuracy histograms: {e}")
+        sys.exit(1)
@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import get_session
+from services.gun_round_counter_service import GunRoundCounterService
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    try:
+        session = next(get_session())
+        corrected = GunRoundCounterService.reconcile(session, user_id=user_id)
+        logger.info(f"Gun round counters reconciled: {corrected} rows corrected")
+    except Exception as e:
+        logger.error(f"Error reconciling gun round counters: {e}")
+        sys.exit(1)
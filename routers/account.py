@@ -1,34 +1,35 @@
 from fastapi import APIRouter, Depends, Header
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from schemas.account import ChangePasswordRequest, ChangeEmailRequest, UpdateSkillLevelRequest, DeleteAccountRequest
-from database import get_session
-from routers.auth import get_current_user
+from database import get_async_session
+from routers.auth import get_current_user, get_verified_current_user
 from services.account_service import AccountService
 from services.user_context import UserContext
 from routers.auth import supabase
 from models import User
 from fastapi.security import HTTPAuthorizationCredentials
 from routers.auth import security
+from services.auth_token_service import token_cache
 from services.rank_service import get_rank_info, update_user_rank
-import asyncio
 
 router = APIRouter()
 
 
 @router.get("/skill-level")
 async def get_skill_level(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(get_current_user)
 ):
     query = select(User).where(User.user_id == user.user_id)
-    user_record = await asyncio.to_thread(lambda: session.exec(query).first())
+    user_record = (await session.exec(query)).first()
     return {"skill_level": user_record.skill_level if user_record else "beginner"}
 
 
 @router.post("/skill-level")
 async def update_skill_level(
     data: UpdateSkillLevelRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(get_current_user)
 ):
     return await AccountService.update_skill_level(session, user, data.skill_level)
@@ -37,7 +38,7 @@ async def update_skill_level(
 @router.post("/change-password")
 async def change_password(
     data: ChangePasswordRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -50,7 +51,7 @@ async def change_password(
 @router.post("/change-email")
 async def change_email(
     data: ChangeEmailRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -62,11 +63,11 @@ async def change_email(
 
 @router.get("/rank")
 async def get_rank(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(get_current_user)
 ):
     # Zapewnij, że użytkownik istnieje w bazie
-    user_record = await asyncio.to_thread(lambda: AccountService.ensure_user_exists(session, user))
+    user_record = await AccountService.ensure_user_exists(session, user)
     
     if not user_record:
         from fastapi import HTTPException
@@ -76,12 +77,12 @@ async def get_rank(
     if not hasattr(user_record, 'rank') or user_record.rank is None or user_record.rank.strip() == "":
         user_record.rank = "Nowicjusz"
         session.add(user_record)
-        await asyncio.to_thread(lambda: session.commit())
-        await asyncio.to_thread(lambda: session.refresh(user_record))
+        await session.commit()
+        await session.refresh(user_record)
     
-    updated_rank = await asyncio.to_thread(lambda: update_user_rank(user_record, session))
-    await asyncio.to_thread(lambda: session.refresh(user_record))
-    rank_info = await asyncio.to_thread(lambda: get_rank_info(user_record, session))
+    updated_rank = await update_user_rank(user_record, session)
+    await session.refresh(user_record)
+    rank_info = await get_rank_info(user_record, session)
     rank_info["rank"] = updated_rank
     return rank_info
 
@@ -89,12 +90,13 @@ async def get_rank(
 @router.delete("")
 async def delete_account(
     data: DeleteAccountRequest,
-    session: Session = Depends(get_session),
-    user: UserContext = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(get_verified_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     if not credentials:
         from fastapi import HTTPException
         raise HTTPException(status_code=401, detail="Brak tokena uwierzytelniającego")
+    token_cache.invalidate(credentials.credentials)
     return await AccountService.delete_account(session, user, supabase, credentials.credentials, data.password)
 
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, Query
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel, Field
-from schemas.ammo import AmmoCreate, AmmoRead
+from schemas.ammo import AmmoCreate, AmmoRead, AmmoForecastRead, AmmoInventoryValueRead
 from schemas.pagination import PaginatedResponse
 from models import AmmoUpdate
-from database import get_session
+from database import get_async_session
 from routers.auth import role_required
 from services.ammo_service import AmmoService
+from services.ammo_forecast_service import AmmoForecastService
 from services.user_context import UserContext, UserRole
 
 router = APIRouter()
@@ -17,52 +18,70 @@ class QuantityPayload(BaseModel):
 
 @router.get("", response_model=PaginatedResponse[AmmoRead])
 async def get_ammo(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin])),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    search: Optional[str] = Query(default=None, min_length=1)
+    search: Optional[str] = Query(default=None, min_length=1),
+    cursor: Optional[str] = Query(default=None),
+    include_total: bool = Query(default=True)
 ):
-    return AmmoService.get_all_ammo(session, user, limit, offset, search)
+    return await AmmoService.get_all_ammo(session, user, limit, offset, search, cursor, include_total)
+
+@router.get("/forecast", response_model=List[AmmoForecastRead])
+async def get_ammo_forecast(
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
+):
+    """Prognoza wyczerpania zapasu i sugestia zakupu dla każdej amunicji"""
+    return await AmmoForecastService.get_forecasts(session, user)
+
+@router.get("/value", response_model=AmmoInventoryValueRead)
+async def get_ammo_value(
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
+):
+    """Wartość zapasu amunicji w PLN i w walucie użytkownika"""
+    return await AmmoService.get_inventory_value(session, user)
 
 @router.get("/{ammo_id}", response_model=AmmoRead)
 async def get_ammo_by_id(
     ammo_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return AmmoService.get_ammo_by_id(session, ammo_id, user)
+    return await AmmoService.get_ammo_by_id(session, ammo_id, user)
 
 @router.post("", response_model=AmmoRead)
 async def add_ammo(
     ammo_data: AmmoCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return AmmoService.create_ammo(session, ammo_data, user)
+    return await AmmoService.create_ammo(session, ammo_data, user)
 
 @router.put("/{ammo_id}", response_model=AmmoRead)
 async def update_ammo(
     ammo_id: str,
     ammo_data: AmmoUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return AmmoService.update_ammo(session, ammo_id, ammo_data, user)
+    return await AmmoService.update_ammo(session, ammo_id, ammo_data, user)
 
 @router.delete("/{ammo_id}")
 async def delete_ammo(
     ammo_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return AmmoService.delete_ammo(session, ammo_id, user)
+    return await AmmoService.delete_ammo(session, ammo_id, user)
 
 @router.post("/{ammo_id}/add", response_model=AmmoRead)
 async def add_ammo_quantity(
     ammo_id: str,
     payload: QuantityPayload,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return AmmoService.add_ammo_quantity(session, ammo_id, payload.amount, user)
\ No newline at end of file
+    return await AmmoService.add_ammo_quantity(session, ammo_id, payload.amount, user)
\ No newline at end of file
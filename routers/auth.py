@@ -7,7 +7,8 @@ from typing import Optional, Iterable, Union
 from uuid import uuid4
 from datetime import datetime
 from services.error_handler import ErrorHandler
-from services.user_context import UserContext, UserRole, calculate_guest_expiration
+from services.user_context import UserContext, UserRole, calculate_guest_expiration, resolve_role
+from services.auth_token_service import authenticate_token, token_cache
 from settings import settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -60,19 +61,8 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
     confirm_password: str
 
-def _resolve_role(metadata: Optional[dict]) -> UserRole:
-    if not metadata:
-        return UserRole.user
-    value = metadata.get("role")
-    if not value:
-        return UserRole.user
-    try:
-        return UserRole(value)
-    except ValueError:
-        return UserRole.user
-
-
 async def _fetch_supabase_user(token: str) -> UserContext:
+    """Zdalna weryfikacja tokena w Supabase Auth (wykrywa też unieważnione sesje)"""
     if not supabase:
         raise HTTPException(status_code=503, detail="Authentication service not available")
     try:
@@ -81,7 +71,7 @@ async def _fetch_supabase_user(token: str) -> UserContext:
             raise HTTPException(status_code=401, detail="Nieprawidłowy token")
         user_metadata = response.user.user_metadata or {}
         username = user_metadata.get("username", response.user.email.split("@")[0])
-        role = _resolve_role(user_metadata)
+        role = resolve_role(user_metadata)
         return UserContext(
             user_id=response.user.id,
             email=response.user.email,
@@ -94,7 +84,18 @@ async def _fetch_supabase_user(token: str) -> UserContext:
         raise ErrorHandler.handle_supabase_error(e, "get_current_user")
 
 
+async def _authenticate(token: str) -> UserContext:
+    return await authenticate_token(token, _fetch_supabase_user)
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserContext:
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Brak tokena uwierzytelniającego")
+    return await _authenticate(credentials.credentials)
+
+
+async def get_verified_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserContext:
+    """Jak get_current_user, ale zawsze pyta Supabase - dla operacji wrażliwych na unieważnienie sesji"""
     if not credentials:
         raise HTTPException(status_code=401, detail="Brak tokena uwierzytelniającego")
     return await _fetch_supabase_user(credentials.credentials)
@@ -107,7 +108,7 @@ async def get_user_context(
     guest_id_expires_at: Optional[str] = Header(default=None, alias="X-Guest-Id-Expires-At")
 ) -> UserContext:
     if credentials:
-        return await _fetch_supabase_user(credentials.credentials)
+        return await _authenticate(credentials.credentials)
     expires_at = None
     if guest_id and guest_id_expires_at:
         try:
@@ -168,7 +169,7 @@ async def login(request: LoginRequest):
             raise HTTPException(status_code=401, detail="Nieprawidłowe dane logowania")
         user_metadata = response.user.user_metadata or {}
         username = user_metadata.get("username", request.email.split("@")[0])
-        role = _resolve_role(user_metadata)
+        role = resolve_role(user_metadata)
         return AuthResponse(
             access_token=response.session.access_token,
             refresh_token=response.session.refresh_token,
@@ -218,11 +219,15 @@ async def register(request: RegisterRequest):
         raise ErrorHandler.handle_supabase_error(e, "register")
 
 @router.post("/logout")
-async def logout(current_user: UserContext = Depends(get_current_user)):
+async def logout(
+    current_user: UserContext = Depends(get_verified_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
     """Logout user"""
     if not supabase:
         raise HTTPException(status_code=503, detail="Authentication service not available")
     try:
+        token_cache.invalidate(credentials.credentials)
         await asyncio.to_thread(supabase.auth.sign_out)
         return {"message": "Wylogowano pomyślnie"}
     except HTTPException:
@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Depends, BackgroundTasks
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from datetime import date
 from pydantic import BaseModel
-from schemas.currency_rate import CurrencyRateRead
+from schemas.currency_rate import CurrencyRateRead, CurrencyConversionBatchRequest, CurrencyConversionBatchResponse
 from models.currency_rate import CurrencyRate
-from database import get_session
+from database import get_async_session
 from services.currency_service import (
     fetch_and_save_currency_rates,
     get_latest_rate,
+    convert_batch,
     convert_currency,
+    convert_currency_on,
     get_currency_rate,
+    get_currency_rate_on,
     SUPPORTED_CURRENCIES
 )
 import logging
@@ -23,7 +27,7 @@ router = APIRouter()
 @router.get("", response_model=List[CurrencyRateRead])
 async def get_currency_rates(
     code: Optional[str] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if code:
         code = code.upper()
@@ -32,24 +36,24 @@ async def get_currency_rates(
         stmt = select(CurrencyRate).where(
             CurrencyRate.code == code
         ).order_by(CurrencyRate.date.desc())
-        rates = list(session.exec(stmt).all())
+        rates = list((await session.exec(stmt)).all())
     else:
         stmt = select(CurrencyRate).order_by(
             CurrencyRate.date.desc(),
             CurrencyRate.code
         )
-        rates = list(session.exec(stmt).all())
+        rates = list((await session.exec(stmt)).all())
     
     return rates
 
 
 @router.get("/latest", response_model=List[CurrencyRateRead])
 async def get_latest_currency_rates(
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     rates = []
     for code in SUPPORTED_CURRENCIES:
-        rate = get_latest_rate(session, code)
+        rate = await get_latest_rate(session, code)
         if rate:
             rates.append(rate)
     return rates
@@ -58,20 +62,20 @@ async def get_latest_currency_rates(
 @router.get("/latest/{code}", response_model=Optional[CurrencyRateRead])
 async def get_latest_currency_rate(
     code: str,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     code = code.upper()
     if code not in SUPPORTED_CURRENCIES:
         return None
-    return get_latest_rate(session, code)
+    return await get_latest_rate(session, code)
 
 
 @router.post("/fetch")
 async def fetch_currency_rates(
     background_tasks: BackgroundTasks,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    results = fetch_and_save_currency_rates(session)
+    results = await fetch_and_save_currency_rates(session)
     return {
         "message": "Currency rates fetched",
         "results": results
@@ -80,9 +84,9 @@ async def fetch_currency_rates(
 
 @router.post("/fetch-sync")
 async def fetch_currency_rates_sync(
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    results = fetch_and_save_currency_rates(session)
+    results = await fetch_and_save_currency_rates(session)
     return {
         "message": "Currency rates fetched synchronously",
         "results": results
@@ -93,19 +97,29 @@ class ConvertCurrencyRequest(BaseModel):
     amount: float
     from_currency: str
     to_currency: str
+    on_date: Optional[date] = None  # kurs z tego dnia zamiast najnowszego
 
 
 @router.post("/convert")
 async def convert_currency_endpoint(
     request: ConvertCurrencyRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    result = convert_currency(
-        session,
-        request.amount,
-        request.from_currency.lower(),
-        request.to_currency.lower()
-    )
+    if request.on_date:
+        result = await convert_currency_on(
+            session,
+            request.amount,
+            request.from_currency.lower(),
+            request.to_currency.lower(),
+            request.on_date
+        )
+    else:
+        result = await convert_currency(
+            session,
+            request.amount,
+            request.from_currency.lower(),
+            request.to_currency.lower()
+        )
     if result is None:
         return {
             "error": "Could not convert currency. Rates may not be available."
@@ -118,12 +132,38 @@ async def convert_currency_endpoint(
     }
 
 
+@router.post("/convert/batch", response_model=CurrencyConversionBatchResponse)
+async def convert_currency_batch_endpoint(
+    request: CurrencyConversionBatchRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Wiele konwersji w jednym żądaniu - wszystkie liczone na tym samym snapshocie kursów"""
+    converted = await convert_batch(
+        session,
+        [(item.amount, item.from_currency, item.to_currency, item.on_date) for item in request.items]
+    )
+    results = []
+    for item, value in zip(request.items, converted):
+        result = item.model_dump()
+        result["from_currency"] = item.from_currency.upper()
+        result["to_currency"] = item.to_currency.upper()
+        result["converted_amount"] = value
+        if value is None:
+            result["error"] = "Could not convert currency. Rates may not be available."
+        results.append(result)
+    return {"results": results}
+
+
 @router.get("/rate/{currency}")
 async def get_currency_rate_endpoint(
     currency: str,
-    session: Session = Depends(get_session)
+    on: Optional[date] = None,
+    session: AsyncSession = Depends(get_async_session)
 ):
-    rate = get_currency_rate(session, currency.lower())
+    if on:
+        rate = await get_currency_rate_on(session, currency.lower(), on)
+    else:
+        rate = await get_currency_rate(session, currency.lower())
     if rate is None:
         return {
             "error": f"Currency rate for {currency} not available"
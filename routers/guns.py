@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, Query, UploadFile, File, HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
-from schemas.gun import GunCreate, GunRead
+from schemas.gun import GunCreate, GunRead, GunRoundsRead
 from schemas.pagination import PaginatedResponse
 from models import GunUpdate
-from database import get_session
+from database import get_async_session
 from routers.auth import role_required
 from services.gun_service import GunService
+from services.gun_round_counter_service import GunRoundCounterService
 from services.user_context import UserContext, UserRole
 import asyncio
 
@@ -28,27 +29,29 @@ router = APIRouter()
 
 @router.get("", response_model=PaginatedResponse[GunRead])
 async def get_guns(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin])),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    search: Optional[str] = Query(default=None, min_length=1)
+    search: Optional[str] = Query(default=None, min_length=1),
+    cursor: Optional[str] = Query(default=None),
+    include_total: bool = Query(default=True)
 ):
-    return GunService.get_all_guns(session, user, limit, offset, search)
+    return await GunService.get_all_guns(session, user, limit, offset, search, cursor, include_total)
 
 @router.post("", response_model=GunRead)
 async def add_gun(
     gun_data: GunCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return GunService.create_gun(session, gun_data, user)
+    return await GunService.create_gun(session, gun_data, user)
 
 @router.post("/{gun_id}/upload-image")
 async def upload_weapon_image_endpoint(
     gun_id: str,
     file: UploadFile = File(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.user, UserRole.admin]))
 ):
     """
@@ -61,7 +64,7 @@ async def upload_weapon_image_endpoint(
     if not file.content_type or not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Plik musi być obrazem")
     
-    gun = GunService._get_single_gun(session, gun_id, user)
+    gun = await GunService._get_single_gun(session, gun_id, user)
     
     if gun.user_id != user.user_id and user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Brak uprawnień do tej broni")
@@ -84,8 +87,8 @@ async def upload_weapon_image_endpoint(
         
         gun.image_path = image_path
         session.add(gun)
-        await asyncio.to_thread(session.commit)
-        await asyncio.to_thread(session.refresh, gun)
+        await session.commit()
+        await session.refresh(gun)
         
         return {"image_path": image_path}
     except ValueError as e:
@@ -97,7 +100,7 @@ async def upload_weapon_image_endpoint(
 @router.get("/{gun_id}/image")
 async def get_weapon_image(
     gun_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     """
@@ -105,7 +108,7 @@ async def get_weapon_image(
     Returns null if no image is uploaded or if Supabase is not configured.
     """
     try:
-        gun = GunService._get_single_gun(session, gun_id, user)
+        gun = await GunService._get_single_gun(session, gun_id, user)
         
         if not gun.image_path:
             return {"url": None}
@@ -122,27 +125,36 @@ async def get_weapon_image(
         print(f"Warning: Could not get weapon image: {e}")
         return {"url": None}
 
+@router.get("/{gun_id}/rounds", response_model=GunRoundsRead)
+async def get_gun_rounds(
+    gun_id: str,
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
+):
+    await GunService._get_single_gun(session, gun_id, user)
+    return await GunRoundCounterService.get_counter(session, gun_id)
+
 @router.get("/{gun_id}", response_model=GunRead)
 async def get_gun(
     gun_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return GunService.get_gun_by_id(session, gun_id, user)
+    return await GunService.get_gun_by_id(session, gun_id, user)
 
 @router.put("/{gun_id}", response_model=GunRead)
 async def update_gun(
     gun_id: str,
     gun_data: GunUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return GunService.update_gun(session, gun_id, gun_data, user)
+    return await GunService.update_gun(session, gun_id, gun_data, user)
 
 @router.delete("/{gun_id}")
 async def delete_gun(
     gun_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     return await GunService.delete_gun(session, gun_id, user)
@@ -150,7 +162,7 @@ async def delete_gun(
 @router.delete("/{gun_id}/image")
 async def delete_weapon_image_endpoint(
     gun_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.user, UserRole.admin]))
 ):
     """
@@ -160,7 +172,7 @@ async def delete_weapon_image_endpoint(
     if user.is_guest:
         raise HTTPException(status_code=403, detail="Goście nie mogą usuwać zdjęć")
     
-    gun = GunService._get_single_gun(session, gun_id, user)
+    gun = await GunService._get_single_gun(session, gun_id, user)
     
     if gun.user_id != user.user_id and user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Brak uprawnień do tej broni")
@@ -173,8 +185,8 @@ async def delete_weapon_image_endpoint(
         
         gun.image_path = None
         session.add(gun)
-        await asyncio.to_thread(session.commit)
-        await asyncio.to_thread(session.refresh, gun)
+        await session.commit()
+        await session.refresh(gun)
         
         return {"message": "Zdjęcie zostało usunięte"}
     except ValueError as e:
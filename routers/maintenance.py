@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional, Dict, Any
-from schemas.maintenance import MaintenanceCreate, MaintenanceUpdate, MaintenanceRead
-from database import get_session
+from schemas.maintenance import MaintenanceCreate, MaintenanceUpdate, MaintenanceRead, MaintenanceDueRead
+from database import get_async_session
 from routers.auth import role_required
+from routers.pagination import set_pagination_headers
 from services.maintenance_service import MaintenanceService
+from services.maintenance_due_service import MaintenanceDueService
 from services.user_context import UserContext, UserRole
 import logging
 
@@ -15,12 +17,19 @@ router = APIRouter()
 @router.get("", response_model=List[Dict[str, Any]])
 @router.get("/", response_model=List[Dict[str, Any]])
 async def get_all_maintenance(
-    session: Session = Depends(get_session),
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin])),
-    gun_id: Optional[str] = Query(default=None)
+    gun_id: Optional[str] = Query(default=None),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None)
 ):
     try:
-        return MaintenanceService.list_all(session, user, gun_id)
+        result = await MaintenanceService.list_all(session, user, gun_id, limit, cursor)
+        set_pagination_headers(response, result)
+        return result["items"]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Błąd podczas pobierania konserwacji: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Błąd podczas pobierania konserwacji: {str(e)}")
@@ -28,48 +37,56 @@ async def get_all_maintenance(
 @router.get("/guns/{gun_id}/maintenance", response_model=List[MaintenanceRead])
 async def get_gun_maintenance(
     gun_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return MaintenanceService.list_for_gun(session, user, gun_id)
+    return await MaintenanceService.list_for_gun(session, user, gun_id)
 
 @router.get("/statistics", response_model=Dict[str, Any])
 async def get_maintenance_statistics(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     try:
-        return MaintenanceService.get_statistics(session, user)
+        return await MaintenanceService.get_statistics(session, user)
     except Exception as e:
         logger.error(f"Błąd podczas pobierania statystyk konserwacji: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Błąd podczas pobierania statystyk konserwacji: {str(e)}")
 
+@router.get("/due", response_model=List[MaintenanceDueRead])
+async def get_maintenance_due(
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
+):
+    """Broń wymagająca konserwacji - odczyt tabeli przeliczanej okresowo w tle"""
+    return await MaintenanceDueService.list_due(session, user)
+
 @router.post("/guns/{gun_id}/maintenance", response_model=MaintenanceRead)
 async def add_maintenance(
     gun_id: str,
     maintenance_data: MaintenanceCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return MaintenanceService.create_maintenance(session, user, gun_id, maintenance_data.model_dump())
+    return await MaintenanceService.create_maintenance(session, user, gun_id, maintenance_data.model_dump())
 
 @router.put("/maintenance/{maintenance_id}", response_model=MaintenanceRead)
 async def update_maintenance(
     maintenance_id: str,
     maintenance_data: MaintenanceUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     data_dict = maintenance_data.model_dump(exclude_none=True, by_alias=True)
-    return MaintenanceService.update_maintenance(session, user, maintenance_id, data_dict)
+    return await MaintenanceService.update_maintenance(session, user, maintenance_id, data_dict)
 
 @router.delete("/maintenance/{maintenance_id}")
 async def delete_maintenance(
     maintenance_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    return MaintenanceService.delete_maintenance(session, user, maintenance_id)
+    return await MaintenanceService.delete_maintenance(session, user, maintenance_id)
 
 
 
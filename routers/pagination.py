@@ -0,0 +1,14 @@
+from typing import Any, Dict
+from fastapi import Response
+
+
+def set_pagination_headers(response: Response, result: Dict[str, Any]) -> None:
+    """
+    Endpointy zwracające czystą listę przekazują dane paginacji w nagłówkach,
+    żeby nie zmieniać kształtu odpowiedzi dla frontendu.
+    """
+    if result.get("total") is not None:
+        response.headers["X-Total-Count"] = str(result["total"])
+    response.headers["X-Has-More"] = "true" if result.get("has_more") else "false"
+    if result.get("next_cursor"):
+        response.headers["X-Next-Cursor"] = result["next_cursor"]
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from schemas.search import SearchResponse
+from database import get_async_session
+from routers.auth import role_required
+from services.search_service import SearchService
+from services.user_context import UserContext, UserRole
+
+router = APIRouter()
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
+):
+    return await SearchService.search(session, user, q, limit)
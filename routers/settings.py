@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from schemas.settings import UserSettingsRead, UserSettingsUpdate
-from database import get_session
+from database import get_async_session
 from routers.auth import role_required
 from services.user_settings_service import UserSettingsService
 from services.user_context import UserContext, UserRole
@@ -11,7 +11,7 @@ router = APIRouter()
 
 @router.get("", response_model=UserSettingsRead)
 async def get_settings(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     return await UserSettingsService.get_settings(session, user)
@@ -20,7 +20,7 @@ async def get_settings(
 @router.post("", response_model=UserSettingsRead)
 async def update_settings(
     settings_data: UserSettingsUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     return await UserSettingsService.update_settings(session, user, settings_data.model_dump(exclude_unset=True))
@@ -29,7 +29,7 @@ async def update_settings(
 @router.put("", response_model=UserSettingsRead)
 async def update_settings_put(
     settings_data: UserSettingsUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     return await UserSettingsService.update_settings(session, user, settings_data.model_dump(exclude_unset=True))
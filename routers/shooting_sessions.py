@@ -1,23 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
-from sqlmodel import Session, select
-from models import ShootingSession, User, Gun
-from schemas.shooting_sessions import ShootingSessionRead, ShootingSessionCreate, ShootingSessionUpdate, MonthlySummary
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import ShootingSession
+from schemas.shooting_sessions import ShootingSessionRead, ShootingSessionCreate, ShootingSessionUpdate, MonthlySummary, AIJobCreated, AIJobRead
 from schemas.pagination import PaginatedResponse
-from database import get_session
+from routers.pagination import set_pagination_headers
+from database import get_async_session
 from routers.auth import role_required
 from services.user_context import UserContext, UserRole
 from services.shooting_sessions_service import ShootingSessionsService
-from services.ai_service import AIService
+from services.ai_job_service import AIJobService, FINISHED_STATUSES, EVENTS_POLL_SECONDS
 from services.rank_service import update_user_rank
 from services.account_service import AccountService
 from services.user_settings_service import UserSettingsService
+from services.currency_service import convert_pln_amounts
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import asyncio
 import logging
 
 try:
-    from services.supabase_service import upload_target_image, get_signed_target_url, delete_target_image, get_target_image_base64
+    from services.supabase_service import upload_target_image, get_signed_target_url, delete_target_image
 except ImportError:
     def upload_target_image(*args, **kwargs):
         raise ValueError("Supabase storage is not configured")
@@ -25,8 +28,6 @@ except ImportError:
         raise ValueError("Supabase storage is not configured")
     def delete_target_image(*args, **kwargs):
         raise ValueError("Supabase storage is not configured")
-    def get_target_image_base64(*args, **kwargs):
-        raise ValueError("Supabase storage is not configured")
 
 logger = logging.getLogger(__name__)
 
@@ -50,13 +51,13 @@ def convert_distance(distance_m: Optional[float], distance_unit: str) -> tuple[O
         return round(distance_m, 2), "m"
 
 
-async def create_session_read(session_obj: ShootingSession, db_session: Session, user: UserContext) -> ShootingSessionRead:
-    """Tworzy ShootingSessionRead z konwersją jednostek dystansu"""
-    # Pobierz ustawienia użytkownika
-    user_settings = await UserSettingsService.get_settings(db_session, user)
-    distance_unit = user_settings.distance_unit or "m"
-    
-    # Konwertuj dystans
+def build_session_read(
+    session_obj: ShootingSession,
+    distance_unit: str,
+    converted_cost: Optional[float] = None,
+    currency: Optional[str] = None
+) -> ShootingSessionRead:
+    """Buduje ShootingSessionRead dla znanej jednostki dystansu i przeliczonego kosztu - bez zapytań do bazy"""
     distance, unit = convert_distance(session_obj.distance_m, distance_unit)
     
     return ShootingSessionRead(
@@ -77,8 +78,32 @@ async def create_session_read(session_obj: ShootingSession, db_session: Session,
         ai_comment=session_obj.ai_comment,
         session_type=session_obj.session_type if hasattr(session_obj, 'session_type') else 'standard',
         target_image_path=session_obj.target_image_path if hasattr(session_obj, 'target_image_path') else None,
-        user_id=session_obj.user_id
+        user_id=session_obj.user_id,
+        converted_cost=converted_cost,
+        currency=currency
+    )
+
+
+async def create_session_read(session_obj: ShootingSession, db_session: AsyncSession, user: UserContext) -> ShootingSessionRead:
+    """Tworzy ShootingSessionRead z konwersją jednostek dystansu"""
+    reads = await create_session_reads([session_obj], db_session, user)
+    return reads[0]
+
+
+async def create_session_reads(sessions: List[ShootingSession], db_session: AsyncSession, user: UserContext) -> List[ShootingSessionRead]:
+    """
+    Serializuje całą listę sesji: ustawienia użytkownika są pobierane raz na żądanie,
+    a koszty przeliczane na walutę użytkownika jednym przebiegiem wektorowym (kurs z dnia sesji).
+    """
+    if not sessions:
+        return []
+    user_settings = await UserSettingsService.get_settings(db_session, user)
+    distance_unit = user_settings.distance_unit or "m"
+    currency = (user_settings.currency or "pln").upper()
+    converted = await convert_pln_amounts(
+        db_session, [s.cost for s in sessions], currency, days=[s.date for s in sessions]
     )
+    return [build_session_read(s, distance_unit, cost, currency) for s, cost in zip(sessions, converted)]
 
 
 class MonthlySummaryResponse(PaginatedResponse[MonthlySummary]):
@@ -89,19 +114,16 @@ class MonthlySummaryResponse(PaginatedResponse[MonthlySummary]):
 @router.post("/", response_model=Dict[str, Any])
 async def create_shooting_session(
     session_data: ShootingSessionCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     result = await ShootingSessionsService.create_shooting_session(session, user, session_data)
     
     # ⚡ Aktualizacja rangi - po commit sesji strzeleckiej
     try:
-        def _ensure_user_and_update_rank(db_session: Session):
-            db_user = AccountService.ensure_user_exists(db_session, user)
-            return update_user_rank(db_user, db_session)
-        
         logger.info(f"[RANK] Aktualizacja rangi dla użytkownika {user.user_id} po utworzeniu sesji. Sesja: shots={result['session'].shots}, hits={result['session'].hits}, accuracy={result['session'].accuracy_percent}")
-        updated_rank = await asyncio.to_thread(lambda: _ensure_user_and_update_rank(session))
+        db_user = await AccountService.ensure_user_exists(session, user)
+        updated_rank = await update_user_rank(db_user, session)
         logger.info(f"[RANK] Zaktualizowana ranga: {updated_rank}")
     except Exception as e:
         logger.error(f"[RANK] Błąd podczas aktualizacji rangi: {str(e)}", exc_info=True)
@@ -131,38 +153,45 @@ async def create_shooting_session(
 @router.get("/", response_model=list[ShootingSessionRead])
 @router.get("", response_model=list[ShootingSessionRead])
 async def get_all_sessions(
-    session: Session = Depends(get_session),
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin])),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
     search: Optional[str] = Query(default=None, min_length=1),
     gun_id: Optional[str] = Query(default=None),
     date_from: Optional[str] = Query(default=None),
-    date_to: Optional[str] = Query(default=None)
+    date_to: Optional[str] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    include_total: bool = Query(default=True)
 ):
     try:
         result = await ShootingSessionsService.get_all_sessions(
-            session, user, limit, offset, search, gun_id, date_from, date_to
+            session, user, limit, offset, search, gun_id, date_from, date_to, cursor, include_total
         )
+        set_pagination_headers(response, result)
         sessions = result.get("items", [])
-        return [
-            await create_session_read(s, session, user)
-            for s in sessions
-        ]
+        return await create_session_reads(sessions, session, user)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Błąd podczas pobierania sesji: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Błąd podczas pobierania sesji: {str(e)}")
 
 @router.get("/summary", response_model=MonthlySummaryResponse)
 async def get_monthly_summary(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin])),
     limit: int = Query(12, ge=1, le=120),
     offset: int = Query(0, ge=0),
-    search: Optional[str] = Query(default=None, min_length=1)
+    search: Optional[str] = Query(default=None, min_length=1),
+    gun_id: Optional[str] = Query(default=None),
+    ammo_id: Optional[str] = Query(default=None)
 ):
     try:
-        result = await ShootingSessionsService.get_monthly_summary(session, user, limit, offset, search)
+        result = await ShootingSessionsService.get_monthly_summary(
+            session, user, limit, offset, search, gun_id=gun_id, ammo_id=ammo_id
+        )
         return {
             "total": result.get("total", 0),
             "items": result.get("items", []),
@@ -174,164 +203,77 @@ async def get_monthly_summary(
         raise HTTPException(status_code=500, detail=f"Błąd podczas pobierania podsumowania: {str(e)}")
 
 
-@router.post("/{session_id}/generate-ai-comment", response_model=Dict[str, Any])
+@router.post("/{session_id}/generate-ai-comment", response_model=AIJobCreated, status_code=202)
 async def generate_ai_comment(
     session_id: str,
-    session: Session = Depends(get_session),
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.user, UserRole.admin]))
 ):
     """
-    Generuje komentarz AI dla sesji strzeleckiej.
+    Zleca wygenerowanie komentarza AI dla sesji strzeleckiej i od razu zwraca identyfikator zlecenia.
     Wymaga: dystans, liczba strzałów, oraz (opcjonalnie) zdjęcie tarczy lub liczba trafień.
-    
-    Przypadek A: brak trafień + zdjęcie -> Vision liczy trafienia i analizuje
-    Przypadek B: trafienia + zdjęcie -> Vision tylko analizuje jakościowo
-    Przypadek C: trafienia bez zdjęcia -> tylko tekstowa analiza
+    Wynik: GET /api/shooting-sessions/ai-jobs/{job_id} lub strumień SSE .../events (pełne adresy w odpowiedzi).
     """
-    if user.is_guest:
-        raise HTTPException(status_code=403, detail="Goście nie mogą generować komentarzy AI")
-    
-    # Pobierz sesję
-    ss = session.get(ShootingSession, session_id)
-    if not ss:
-        raise HTTPException(status_code=404, detail="Sesja nie została znaleziona")
-    
-    if user.role != UserRole.admin:
-        if ss.user_id != user.user_id:
-            raise HTTPException(status_code=404, detail="Sesja nie została znaleziona")
-    
-    # Wymagane: dystans i liczba strzałów
-    if not ss.distance_m or not ss.shots or ss.shots == 0:
-        raise HTTPException(
-            status_code=400, 
-            detail="Sesja musi zawierać dystans i liczbę strzałów, aby wygenerować komentarz AI"
-        )
-    
-    # Pobierz broń
-    gun = session.get(Gun, ss.gun_id)
-    if not gun:
-        raise HTTPException(status_code=404, detail="Broń nie została znaleziona")
-    
-    # Pobierz skill_level użytkownika
-    def _get_skill_level(db_session: Session):
-        query_user = select(User).where(User.user_id == user.user_id)
-        user_record = db_session.exec(query_user).first()
-        return user_record.skill_level if user_record else "beginner"
-    
-    skill_level = await asyncio.to_thread(_get_skill_level, session)
-    
-    # Pobierz język użytkownika
-    user_settings = await UserSettingsService.get_settings(session, user)
-    user_language = user_settings.language or "pl"
-    
-    # Sprawdź czy jest zdjęcie tarczy
-    target_image_base64 = None
-    if ss.target_image_path:
-        try:
-            logger.info(f"Pobieranie zdjęcia tarczy: {ss.target_image_path}")
-            target_image_base64 = await asyncio.to_thread(get_target_image_base64, ss.target_image_path)
-            logger.info(f"Zdjęcie tarczy pobrane pomyślnie, rozmiar base64: {len(target_image_base64) if target_image_base64 else 0}")
-        except Exception as e:
-            logger.warning(f"Nie udało się pobrać zdjęcia tarczy: {str(e)}", exc_info=True)
-            target_image_base64 = None
-    
-    # Określ przypadek
-    has_hits = ss.hits is not None
-    has_image = target_image_base64 is not None
-    
-    logger.info(f"Analiza AI - has_hits: {has_hits}, has_image: {has_image}, distance_m: {ss.distance_m}, shots: {ss.shots}")
-    
-    try:
-        if has_image:
-            # Przypadek A lub B: użyj Vision
-            logger.info(f"Wywołanie Vision API dla sesji {session_id}")
-            vision_result = await AIService.analyze_target_with_vision(
-                gun=gun,
-                distance_m=ss.distance_m,
-                shots=ss.shots,
-                hits=ss.hits if has_hits else None,
-                target_image_base64=target_image_base64,
-                skill_level=skill_level,
-                language=user_language
-            )
-            
-            if vision_result:
-                logger.info(f"Vision API zwróciło wynik: hits={vision_result.get('hits')}, accuracy={vision_result.get('accuracy')}")
-                # Przypadek A: Vision policzyło trafienia
-                if not has_hits:
-                    ss.hits = vision_result["hits"]
-                    ss.accuracy_percent = vision_result["accuracy"]
-                
-                ss.ai_comment = vision_result["comment"]
-                session.add(ss)
-                await asyncio.to_thread(session.commit)
-                await asyncio.to_thread(session.refresh, ss)
-                
-                return {
-                    "ai_comment": vision_result["comment"],
-                    "hits": vision_result.get("hits"),
-                    "accuracy": vision_result.get("accuracy")
-                }
-            else:
-                logger.warning(f"Vision API zwróciło None dla sesji {session_id}")
-                # Vision nie zadziałało - sprawdź przyczynę
-                if not has_hits:
-                    # Sprawdź czy problem jest z kluczem API
-                    if not settings.openai_api_key:
-                        raise HTTPException(
-                            status_code=400,
-                            detail="Brak klucza OpenAI API. Skonfiguruj OPENAI_API_KEY w zmiennych środowiskowych."
-                        )
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Nie udało się policzyć trafień ze zdjęcia. Sprawdź czy zdjęcie jest poprawne lub podaj liczbę trafień ręcznie."
-                    )
-        
-        # Przypadek C lub fallback: zwykła analiza tekstowa
-        if not has_hits:
-            raise HTTPException(
-                status_code=400,
-                detail="Podaj liczbę trafień lub dodaj zdjęcie tarczy, aby wygenerować komentarz AI"
-            )
-        
-        if not ss.accuracy_percent:
-            ss.accuracy_percent = (ss.hits / ss.shots * 100) if ss.shots > 0 else 0
-        
-        ai_comment = await AIService.generate_comment(
-            gun=gun,
-            distance_m=ss.distance_m,
-            hits=ss.hits,
-            shots=ss.shots,
-            accuracy=ss.accuracy_percent,
-            skill_level=skill_level,
-            language=user_language
-        )
-        
-        # Sprawdź czy komentarz zawiera błąd
-        if ai_comment.startswith("Błąd podczas generowania komentarza") or ai_comment.startswith("Brak klucza API"):
-            raise HTTPException(status_code=500, detail=ai_comment)
-        
-        # Zapisz komentarz w sesji
-        ss.ai_comment = ai_comment
-        session.add(ss)
-        await asyncio.to_thread(session.commit)
-        await asyncio.to_thread(session.refresh, ss)
-        
-        return {"ai_comment": ai_comment}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Błąd podczas generowania komentarza AI: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Błąd podczas generowania komentarza AI: {str(e)}")
+    job = await AIJobService.enqueue(session, user, session_id)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": str(request.url_for("get_ai_job", job_id=job.id)),
+        "events_url": str(request.url_for("stream_ai_job", job_id=job.id))
+    }
+
+
+@router.get("/ai-jobs/{job_id}", response_model=AIJobRead)
+async def get_ai_job(
+    job_id: str,
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(role_required([UserRole.user, UserRole.admin]))
+):
+    job = await AIJobService.get_job(session, user, job_id)
+    return AIJobService.to_read(job)
+
+
+@router.get("/ai-jobs/{job_id}/events")
+async def stream_ai_job(
+    job_id: str,
+    session: AsyncSession = Depends(get_async_session),
+    user: UserContext = Depends(role_required([UserRole.user, UserRole.admin]))
+):
+    """
+    Server-Sent Events: zdarzenie `status` z bieżącym stanem zlecenia, po zakończeniu `done` lub `failed`.
+    Zlecenie wykonywane w innym procesie jest odpytywane co EVENTS_POLL_SECONDS.
+    """
+    job = await AIJobService.get_job(session, user, job_id)
+
+    async def events():
+        current = job
+        while True:
+            payload = AIJobRead(**AIJobService.to_read(current)).model_dump_json()
+            event = current.status if current.status in FINISHED_STATUSES else "status"
+            yield f"event: {event}\ndata: {payload}\n\n"
+            if current.status in FINISHED_STATUSES:
+                return
+            if not await AIJobService.wait(job_id, EVENTS_POLL_SECONDS):
+                yield ": keep-alive\n\n"
+            current = await AIJobService.reload(job_id)
+            if current is None:
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/{session_id}", response_model=ShootingSessionRead)
 async def get_shooting_session(
     session_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
-    ss = session.get(ShootingSession, session_id)
+    ss = await session.get(ShootingSession, session_id)
     if not ss:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -346,7 +288,7 @@ async def get_shooting_session(
 async def update_session(
     session_id: str,
     session_data: ShootingSessionUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     result = await ShootingSessionsService.update_shooting_session(session, session_id, user, session_data)
@@ -354,12 +296,9 @@ async def update_session(
     
     # ⚡ Aktualizacja rangi - po aktualizacji sesji
     try:
-        def _ensure_user_and_update_rank(db_session: Session):
-            db_user = AccountService.ensure_user_exists(db_session, user)
-            return update_user_rank(db_user, db_session)
-        
         logger.info(f"[RANK] Aktualizacja rangi dla użytkownika {user.user_id} po aktualizacji sesji")
-        updated_rank = await asyncio.to_thread(lambda: _ensure_user_and_update_rank(session))
+        db_user = await AccountService.ensure_user_exists(session, user)
+        updated_rank = await update_user_rank(db_user, session)
         logger.info(f"[RANK] Zaktualizowana ranga: {updated_rank}")
     except Exception as e:
         logger.error(f"[RANK] Błąd podczas aktualizacji rangi: {str(e)}", exc_info=True)
@@ -389,19 +328,16 @@ async def update_session(
 @router.delete("/{session_id}", response_model=Dict[str, str])
 async def delete_session(
     session_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     result = await ShootingSessionsService.delete_shooting_session(session, session_id, user)
     
     # ⚡ Aktualizacja rangi - po usunięciu sesji
     try:
-        def _ensure_user_and_update_rank(db_session: Session):
-            db_user = AccountService.ensure_user_exists(db_session, user)
-            return update_user_rank(db_user, db_session)
-        
         logger.info(f"[RANK] Aktualizacja rangi dla użytkownika {user.user_id} po usunięciu sesji")
-        updated_rank = await asyncio.to_thread(lambda: _ensure_user_and_update_rank(session))
+        db_user = await AccountService.ensure_user_exists(session, user)
+        updated_rank = await update_user_rank(db_user, session)
         logger.info(f"[RANK] Zaktualizowana ranga: {updated_rank}")
     except Exception as e:
         logger.error(f"[RANK] Błąd podczas aktualizacji rangi: {str(e)}", exc_info=True)
@@ -413,7 +349,7 @@ async def delete_session(
 async def upload_target_image_endpoint(
     session_id: str,
     file: UploadFile = File(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.user, UserRole.admin]))
 ):
     """
@@ -426,7 +362,7 @@ async def upload_target_image_endpoint(
     if not file.content_type or not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Plik musi być obrazem")
     
-    ss = session.get(ShootingSession, session_id)
+    ss = await session.get(ShootingSession, session_id)
     if not ss:
         raise HTTPException(status_code=404, detail="Sesja nie została znaleziona")
     
@@ -458,8 +394,8 @@ async def upload_target_image_endpoint(
         
         ss.target_image_path = image_path
         session.add(ss)
-        await asyncio.to_thread(session.commit)
-        await asyncio.to_thread(session.refresh, ss)
+        await session.commit()
+        await session.refresh(ss)
         
         return {"image_path": image_path}
     except ValueError as e:
@@ -471,7 +407,7 @@ async def upload_target_image_endpoint(
 @router.get("/{session_id}/target-image")
 async def get_target_image(
     session_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.guest, UserRole.user, UserRole.admin]))
 ):
     """
@@ -480,7 +416,7 @@ async def get_target_image(
     Only the owner of the session can see the image.
     """
     try:
-        ss = session.get(ShootingSession, session_id)
+        ss = await session.get(ShootingSession, session_id)
         if not ss:
             return {"url": None}
         
@@ -505,7 +441,7 @@ async def get_target_image(
 @router.delete("/{session_id}/target-image")
 async def delete_target_image_endpoint(
     session_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: UserContext = Depends(role_required([UserRole.user, UserRole.admin]))
 ):
     """
@@ -515,7 +451,7 @@ async def delete_target_image_endpoint(
     if user.is_guest:
         raise HTTPException(status_code=403, detail="Goście nie mogą usuwać zdjęć")
     
-    ss = session.get(ShootingSession, session_id)
+    ss = await session.get(ShootingSession, session_id)
     if not ss:
         raise HTTPException(status_code=404, detail="Sesja nie została znaleziona")
     
@@ -530,7 +466,7 @@ async def delete_target_image_endpoint(
         await asyncio.to_thread(delete_target_image, ss.target_image_path)
         ss.target_image_path = None
         session.add(ss)
-        await asyncio.to_thread(session.commit)
+        await session.commit()
         return {"message": "Zdjęcie tarczy zostało usunięte"}
     except ValueError as e:
         raise HTTPException(status_code=503, detail="Usługa przechowywania zdjęć nie jest dostępna.")
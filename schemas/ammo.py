@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from pydantic import BaseModel, Field, ConfigDict
 from models import AmmoType, AmmoCategory
 
@@ -20,12 +20,28 @@ class AmmoRead(AmmoCreate):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AmmoForecastRead(BaseModel):
+    ammo_id: str
+    ammo_name: str
+    units_in_package: int
+    daily_rate: float
+    days_until_empty: Optional[int] = None
+    reorder_suggested: bool
+    suggested_quantity: int
+    low_stock_alert: bool
 
 
+class AmmoValueRead(BaseModel):
+    ammo_id: str
+    ammo_name: str
+    units_in_package: int
+    price_per_unit: float
+    value_pln: float
+    value: Optional[float] = None  # W walucie użytkownika
 
 
-
-
-
-
-
+class AmmoInventoryValueRead(BaseModel):
+    currency: str
+    total_value_pln: float
+    total_value: Optional[float] = None
+    items: List[AmmoValueRead]
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date as Date
-from typing import Optional
+from typing import Optional, List
+
+MAX_BATCH_CONVERSIONS = 5000
 
 
 class CurrencyRateRead(BaseModel):
@@ -17,3 +19,22 @@ class CurrencyRateCreate(BaseModel):
     rate: float
     date: Date
 
+
+class CurrencyConversionItem(BaseModel):
+    amount: float
+    from_currency: str = Field(min_length=3, max_length=3)
+    to_currency: str = Field(min_length=3, max_length=3)
+    on_date: Optional[Date] = None  # kurs z tego dnia zamiast najnowszego
+
+
+class CurrencyConversionBatchRequest(BaseModel):
+    items: List[CurrencyConversionItem] = Field(max_length=MAX_BATCH_CONVERSIONS)
+
+
+class CurrencyConversionResult(CurrencyConversionItem):
+    converted_amount: Optional[float] = None
+    error: Optional[str] = None
+
+
+class CurrencyConversionBatchResponse(BaseModel):
+    results: List[CurrencyConversionResult]
@@ -29,3 +29,12 @@ class GunRead(GunCreate):
 
 
 
+
+
+class GunRoundsRead(BaseModel):
+    gun_id: str
+    lifetime_rounds: int
+    rounds_since_maintenance: int
+    last_maintenance_date: Optional[date] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -31,4 +31,18 @@ class MaintenanceWithGun(MaintenanceRead):
     gun_name: Optional[str] = None
 
 
+class MaintenanceDueRead(BaseModel):
+    gun_id: str
+    gun_name: str
+    rounds_since_last: int
+    rounds_limit: int
+    days_since_last: int
+    days_limit: int
+    rounds_exceeded: bool
+    days_exceeded: bool
+    evaluated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 
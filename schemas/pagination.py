@@ -1,4 +1,4 @@
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 from pydantic.generics import GenericModel
 
 
@@ -6,6 +6,7 @@ T = TypeVar("T")
 
 
 class PaginatedResponse(GenericModel, Generic[T]):
-    total: int
+    total: Optional[int] = None
     items: List[T]
-
+    has_more: bool = False
+    next_cursor: Optional[str] = None
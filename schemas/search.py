@@ -0,0 +1,17 @@
+from datetime import date as Date
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+
+class SearchHit(BaseModel):
+    type: Literal["gun", "ammo", "session"]
+    id: str
+    title: str
+    snippet: Optional[str] = None
+    score: float
+    date: Optional[Date] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    items: List[SearchHit]
@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 from pydantic import BaseModel, Field, ConfigDict
 
 
@@ -48,6 +48,8 @@ class ShootingSessionRead(BaseModel):
     session_type: Optional[str] = Field(default='standard', max_length=20)
     target_image_path: Optional[str] = None
     user_id: Optional[str] = None
+    converted_cost: Optional[float] = None  # Koszt w walucie użytkownika (kurs z dnia sesji)
+    currency: Optional[str] = None  # Waluta użytkownika
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -56,6 +58,8 @@ class MonthlySummary(BaseModel):
     month: str
     total_cost: float
     total_shots: int
+    total_cost_converted: Optional[float] = None  # Koszt w walucie użytkownika (kurs z końca miesiąca)
+    currency: Optional[str] = None
 
 
 
@@ -69,3 +73,22 @@ class MonthlySummary(BaseModel):
 
 
 
+
+
+class AIJobCreated(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    events_url: str
+
+
+class AIJobRead(BaseModel):
+    id: str
+    session_id: str
+    status: str  # queued / running / done / failed
+    result: Optional[Dict[str, Any]] = None  # {"ai_comment", opcjonalnie "hits", "accuracy"}
+    error: Optional[str] = None
+    error_status: Optional[int] = None  # kod HTTP, który zwróciłby synchroniczny endpoint
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
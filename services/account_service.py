@@ -1,4 +1,5 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Dict, Any, Optional
 import asyncio
 from fastapi import HTTPException
@@ -6,17 +7,22 @@ from supabase import Client
 from models import Gun, Ammo, ShootingSession, Attachment, Maintenance, UserSettings, User
 from services.user_context import UserContext, calculate_guest_expiration
 from services.error_handler import ErrorHandler
+from services.session_summary_service import SessionSummaryService
+from services.accuracy_histogram_service import AccuracyHistogramService
+from services.gun_round_counter_service import GunRoundCounterService
+from services.maintenance_due_service import MaintenanceDueService
+from services.user_settings_service import UserSettingsService
 
 
 class AccountService:
     @staticmethod
-    def ensure_user_exists(session: Session, user: UserContext) -> User:
+    async def ensure_user_exists(session: AsyncSession, user: UserContext) -> User:
         """
         Zapewnia, że użytkownik istnieje w tabeli users.
         Tworzy go, jeśli nie istnieje.
         """
         query = select(User).where(User.user_id == user.user_id)
-        user_record = session.exec(query).first()
+        user_record = (await session.exec(query)).first()
         if not user_record:
             user_record = User(
                 user_id=user.user_id,
@@ -26,11 +32,11 @@ class AccountService:
             if user.is_guest:
                 user_record.expires_at = calculate_guest_expiration()
             session.add(user_record)
-            session.commit()
-            session.refresh(user_record)
+            await session.commit()
+            await session.refresh(user_record)
         return user_record
     @staticmethod
-    async def change_password(session: Session, user: UserContext, supabase: Client, access_token: str, old_password: str, new_password: str) -> Dict[str, str]:
+    async def change_password(session: AsyncSession, user: UserContext, supabase: Client, access_token: str, old_password: str, new_password: str) -> Dict[str, str]:
         if not supabase:
             raise HTTPException(status_code=503, detail="Authentication service not available")
         try:
@@ -55,7 +61,7 @@ class AccountService:
             raise ErrorHandler.handle_supabase_error(e, "change_password")
 
     @staticmethod
-    async def change_email(session: Session, user: UserContext, supabase: Client, access_token: str, new_email: str) -> Dict[str, str]:
+    async def change_email(session: AsyncSession, user: UserContext, supabase: Client, access_token: str, new_email: str) -> Dict[str, str]:
         if not supabase:
             raise HTTPException(status_code=503, detail="Authentication service not available")
         try:
@@ -80,29 +86,27 @@ class AccountService:
             raise ErrorHandler.handle_supabase_error(e, "change_email")
 
     @staticmethod
-    async def update_skill_level(session: Session, user: UserContext, skill_level: str) -> Dict[str, str]:
-        def _update_skill_level(db_session: Session):
-            query_user = select(User).where(User.user_id == user.user_id)
-            user_record = db_session.exec(query_user).first()
-            if not user_record:
-                user_record = User(user_id=user.user_id, skill_level=skill_level)
-                if user.is_guest:
-                    from datetime import datetime
-                    from services.user_context import calculate_guest_expiration
-                    user_record.expires_at = calculate_guest_expiration()
-                db_session.add(user_record)
-            else:
-                user_record.skill_level = skill_level
-                if user.is_guest:
-                    from datetime import datetime
-                    from services.user_context import calculate_guest_expiration
-                    user_record.expires_at = calculate_guest_expiration()
-            db_session.commit()
-        await asyncio.to_thread(_update_skill_level, session)
+    async def update_skill_level(session: AsyncSession, user: UserContext, skill_level: str) -> Dict[str, str]:
+        query_user = select(User).where(User.user_id == user.user_id)
+        user_record = (await session.exec(query_user)).first()
+        if not user_record:
+            user_record = User(user_id=user.user_id, skill_level=skill_level)
+            if user.is_guest:
+                from datetime import datetime
+                from services.user_context import calculate_guest_expiration
+                user_record.expires_at = calculate_guest_expiration()
+            session.add(user_record)
+        else:
+            user_record.skill_level = skill_level
+            if user.is_guest:
+                from datetime import datetime
+                from services.user_context import calculate_guest_expiration
+                user_record.expires_at = calculate_guest_expiration()
+        await session.commit()
         return {"message": "Poziom zaawansowania został zaktualizowany", "skill_level": skill_level}
 
     @staticmethod
-    async def delete_account(session: Session, user: UserContext, supabase: Optional[Client], access_token: str, password: str) -> Dict[str, str]:
+    async def delete_account(session: AsyncSession, user: UserContext, supabase: Optional[Client], access_token: str, password: str) -> Dict[str, str]:
         if user.is_guest:
             raise HTTPException(status_code=403, detail="Goście nie mogą usuwać kont")
         if not supabase:
@@ -131,37 +135,40 @@ class AccountService:
         except Exception as e:
             raise HTTPException(status_code=401, detail="Nieprawidłowe hasło")
         user_id = user.user_id
-        def _delete_user_data(db_session: Session):
-            query_guns = select(Gun).where(Gun.user_id == user_id)
-            guns = db_session.exec(query_guns).all()
-            for gun in guns:
-                query_attachments = select(Attachment).where(Attachment.gun_id == gun.id)
-                attachments = db_session.exec(query_attachments).all()
-                for attachment in attachments:
-                    db_session.delete(attachment)
-                query_maintenance = select(Maintenance).where(Maintenance.gun_id == gun.id)
-                maintenance_list = db_session.exec(query_maintenance).all()
-                for maintenance in maintenance_list:
-                    db_session.delete(maintenance)
-                db_session.delete(gun)
-            query_ammo = select(Ammo).where(Ammo.user_id == user_id)
-            ammo_list = db_session.exec(query_ammo).all()
-            for ammo in ammo_list:
-                db_session.delete(ammo)
-            query_sessions = select(ShootingSession).where(ShootingSession.user_id == user_id)
-            sessions = db_session.exec(query_sessions).all()
-            for session_item in sessions:
-                db_session.delete(session_item)
-            query_settings = select(UserSettings).where(UserSettings.user_id == user_id)
-            settings = db_session.exec(query_settings).first()
-            if settings:
-                db_session.delete(settings)
-            query_user = select(User).where(User.user_id == user_id)
-            user_record = db_session.exec(query_user).first()
-            if user_record:
-                db_session.delete(user_record)
-            db_session.commit()
-        await asyncio.to_thread(_delete_user_data, session)
+        query_guns = select(Gun).where(Gun.user_id == user_id)
+        guns = (await session.exec(query_guns)).all()
+        for gun in guns:
+            query_attachments = select(Attachment).where(Attachment.gun_id == gun.id)
+            attachments = (await session.exec(query_attachments)).all()
+            for attachment in attachments:
+                await session.delete(attachment)
+            query_maintenance = select(Maintenance).where(Maintenance.gun_id == gun.id)
+            maintenance_list = (await session.exec(query_maintenance)).all()
+            for maintenance in maintenance_list:
+                await session.delete(maintenance)
+            await session.delete(gun)
+        query_ammo = select(Ammo).where(Ammo.user_id == user_id)
+        ammo_list = (await session.exec(query_ammo)).all()
+        for ammo in ammo_list:
+            await session.delete(ammo)
+        query_sessions = select(ShootingSession).where(ShootingSession.user_id == user_id)
+        sessions = (await session.exec(query_sessions)).all()
+        for session_item in sessions:
+            await session.delete(session_item)
+        await SessionSummaryService.delete_for(session, user_id=user_id)
+        await AccuracyHistogramService.invalidate(session, user_id)
+        await GunRoundCounterService.delete_for(session, user_id=user_id)
+        await MaintenanceDueService.clear(session, user_id=user_id)
+        query_settings = select(UserSettings).where(UserSettings.user_id == user_id)
+        settings = (await session.exec(query_settings)).first()
+        if settings:
+            await session.delete(settings)
+        query_user = select(User).where(User.user_id == user_id)
+        user_record = (await session.exec(query_user)).first()
+        if user_record:
+            await session.delete(user_record)
+        await session.commit()
+        UserSettingsService.invalidate_cache(user_id)
         if supabase:
             try:
                 await asyncio.to_thread(supabase.auth.admin.delete_user, user_id)
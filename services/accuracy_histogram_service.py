@@ -0,0 +1,174 @@
+from sqlmodel import Session, select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, List, Dict
+import math
+import logging
+from models import ShootingSession, AccuracyHistogram, HISTOGRAM_BUCKETS
+from services.dialect import upsert_insert
+
+logger = logging.getLogger(__name__)
+
+
+def accuracy_bucket(accuracy_percent: Optional[float], hits: Optional[int], shots: Optional[int]) -> Optional[int]:
+    """
+    Koszyk histogramu (pełne procenty celności) albo None, jeśli sesja nie ma celności.
+    Progi rang są całkowite, więc accuracy >= próg  <=>  floor(accuracy) >= próg.
+    """
+    accuracy = accuracy_percent
+    # Legacy: brak accuracy, ale są hits + shots → policz
+    if accuracy is None and hits is not None and shots is not None and shots > 0:
+        accuracy = round((hits / shots) * 100, 2)
+    if accuracy is None or accuracy < 0 or accuracy > 100:
+        return None
+    return int(math.floor(accuracy))
+
+
+def session_accuracy_bucket(ss: ShootingSession) -> Optional[int]:
+    return accuracy_bucket(ss.accuracy_percent, ss.hits, ss.shots)
+
+
+class AccuracyHistogramService:
+    @staticmethod
+    async def _lock_row(session: AsyncSession, user_id: str) -> AccuracyHistogram:
+        """
+        Wiersz histogramu zablokowany do końca transakcji (SELECT ... FOR UPDATE), a gdy go brak - pusty.
+        Równoległe zapisy sesji tego samego użytkownika czekają na siebie zamiast nadpisywać listę koszyków.
+        """
+        insert = upsert_insert(session)
+        if insert is not None:
+            await session.exec(
+                insert(AccuracyHistogram)
+                .values(user_id=user_id, buckets=[0] * HISTOGRAM_BUCKETS)
+                .on_conflict_do_nothing(index_elements=["user_id"])
+            )
+        query = (
+            select(AccuracyHistogram)
+            .where(AccuracyHistogram.user_id == user_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        row = (await session.exec(query)).first()
+        if row is None:
+            row = AccuracyHistogram(user_id=user_id)
+        return row
+
+    @staticmethod
+    async def _apply_counts(session: AsyncSession, user_id: str, counts: Dict[int, int]) -> None:
+        counts = {bucket: delta for bucket, delta in counts.items() if delta}
+        if not counts:
+            return
+        row = await AccuracyHistogramService._lock_row(session, user_id)
+        buckets = list(row.buckets)
+        for bucket, delta in counts.items():
+            # Bez obcinania do zera - ujemny koszyk oznacza rozjazd, który naprawia rebuild
+            buckets[bucket] += delta
+        # Nowa lista - JSON bez MutableList nie śledzi zmian w miejscu
+        row.buckets = buckets
+        session.add(row)
+
+    @staticmethod
+    async def apply_delta(session: AsyncSession, user_id: str, bucket: Optional[int], sign: int) -> None:
+        """Dodaje/odejmuje sesję w histogramie (brak wiersza = pusty histogram). Nie robi commit."""
+        if bucket is None:
+            return
+        await AccuracyHistogramService._apply_counts(session, user_id, {bucket: sign})
+
+    @staticmethod
+    async def replace(session: AsyncSession, user_id: str, old_bucket: Optional[int], new_bucket: Optional[int]) -> None:
+        if old_bucket == new_bucket:
+            return
+        counts: Dict[int, int] = {}
+        if old_bucket is not None:
+            counts[old_bucket] = counts.get(old_bucket, 0) - 1
+        if new_bucket is not None:
+            counts[new_bucket] = counts.get(new_bucket, 0) + 1
+        await AccuracyHistogramService._apply_counts(session, user_id, counts)
+
+    @staticmethod
+    async def _count_sessions(session: AsyncSession, *filters) -> Dict[int, int]:
+        query = select(ShootingSession.accuracy_percent, ShootingSession.hits, ShootingSession.shots).where(*filters)
+        counts: Dict[int, int] = {}
+        for accuracy_percent, hits, shots in (await session.exec(query)).all():
+            bucket = accuracy_bucket(accuracy_percent, hits, shots)
+            if bucket is not None:
+                counts[bucket] = counts.get(bucket, 0) + 1
+        return counts
+
+    @staticmethod
+    async def remove_sessions(
+        session: AsyncSession,
+        user_id: str,
+        gun_id: Optional[str] = None,
+        ammo_id: Optional[str] = None
+    ) -> None:
+        """
+        Odejmuje sesje, które znikną kaskadowo z bronią lub amunicją. Nie robi commit.
+        Trzeba wywołać przed usunięciem broni/amunicji.
+        """
+        filters = [ShootingSession.user_id == user_id]
+        if gun_id:
+            filters.append(ShootingSession.gun_id == gun_id)
+        if ammo_id:
+            filters.append(ShootingSession.ammo_id == ammo_id)
+        counts = await AccuracyHistogramService._count_sessions(session, *filters)
+        await AccuracyHistogramService._apply_counts(session, user_id, {bucket: -count for bucket, count in counts.items()})
+
+    @staticmethod
+    async def invalidate(session: AsyncSession, user_id: str) -> None:
+        """Usuwa histogram razem z kontem użytkownika. Nie robi commit."""
+        await session.exec(delete(AccuracyHistogram).where(AccuracyHistogram.user_id == user_id))
+
+    @staticmethod
+    def _build_buckets(session: Session, user_id: str) -> List[int]:
+        buckets = [0] * HISTOGRAM_BUCKETS
+        query = select(
+            ShootingSession.accuracy_percent,
+            ShootingSession.hits,
+            ShootingSession.shots
+        ).where(ShootingSession.user_id == user_id)
+        for accuracy_percent, hits, shots in session.exec(query).all():
+            bucket = accuracy_bucket(accuracy_percent, hits, shots)
+            if bucket is not None:
+                buckets[bucket] += 1
+        return buckets
+
+    @staticmethod
+    def rebuild(session: Session, user_id: str) -> AccuracyHistogram:
+        """Synchroniczne przeliczenie z sesji - skrypt rebuild_accuracy_histograms.py."""
+        row = session.get(AccuracyHistogram, user_id)
+        if not row:
+            row = AccuracyHistogram(user_id=user_id)
+        row.buckets = AccuracyHistogramService._build_buckets(session, user_id)
+        session.add(row)
+        session.commit()
+        session.refresh(row)
+        return row
+
+    @staticmethod
+    def rebuild_all(session: Session) -> int:
+        """Przebudowuje histogramy wszystkich użytkowników posiadających sesje."""
+        user_ids = session.exec(select(ShootingSession.user_id).distinct()).all()
+        for user_id in user_ids:
+            AccuracyHistogramService.rebuild(session, user_id)
+        logger.info(f"[RANK] Przebudowano histogramy celności dla {len(user_ids)} użytkowników")
+        return len(user_ids)
+
+    @staticmethod
+    async def get_buckets(session: AsyncSession, user_id: str) -> List[int]:
+        """Koszyki z tabeli; bez wiersza (dane sprzed migracji) liczone z sesji - odczyt niczego nie zapisuje."""
+        row = await session.get(AccuracyHistogram, user_id)
+        if row:
+            return list(row.buckets)
+        buckets = [0] * HISTOGRAM_BUCKETS
+        for bucket, count in (await AccuracyHistogramService._count_sessions(
+            session, ShootingSession.user_id == user_id
+        )).items():
+            buckets[bucket] = count
+        return buckets
+
+    @staticmethod
+    async def count_at_least(session: AsyncSession, user_id: str, threshold: int) -> int:
+        """Liczba sesji z celnością >= threshold - suma sufiksowa histogramu."""
+        buckets = await AccuracyHistogramService.get_buckets(session, user_id)
+        threshold = max(0, min(HISTOGRAM_BUCKETS, threshold))
+        return sum(buckets[threshold:])
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlmodel import select, delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func
+from models import AICommentCache
+from services.dialect import upsert_insert
+from services.ttl_cache import TTLCache
+from settings import settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_VERSION = 1  # zmiana treści promptu = nowa wersja, stare wpisy przestają pasować
+ACCURACY_BUCKET_PERCENT = 5
+
+# Warstwa w procesie: odcisk -> komentarz. Trafienie nie dotyka bazy ani modelu.
+_memory_cache = TTLCache(app_settings.ai_comment_cache_size, app_settings.ai_comment_cache_ttl_seconds)
+# Czas ostatniego przycięcia tabeli w tym procesie (time.monotonic)
+_last_prune = {"at": float("-inf")}
+
+
+class AICommentCacheMetrics:
+    """Liczniki trafień i chybień cache komentarzy AI (wspólne dla wątków)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.memory_hits = self.db_hits = self.misses = self.stores = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(_memory_cache),
+            }
+
+
+metrics = AICommentCacheMetrics()
+
+
+def accuracy_bucket(accuracy: Optional[float]) -> int:
+    """Dolna granica przedziału celności (co ACCURACY_BUCKET_PERCENT punktów procentowych)."""
+    value = min(100.0, max(0.0, float(accuracy or 0.0)))
+    return int(value // ACCURACY_BUCKET_PERCENT) * ACCURACY_BUCKET_PERCENT
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def comment_fingerprint(
+    model: str,
+    gun_type: Optional[str],
+    caliber: Optional[str],
+    distance_m: float,
+    hits: int,
+    shots: int,
+    accuracy: float,
+    skill_level: Optional[str],
+    language: Optional[str]
+) -> str:
+    """Odcisk sha256 znormalizowanych danych promptu - klucz cache komentarza."""
+    payload = {
+        "v": FINGERPRINT_VERSION,
+        "model": model,
+        "gun_type": _normalize(gun_type),
+        "caliber": _normalize(caliber).replace(" ", ""),
+        "distance_m": round(float(distance_m), 1),
+        "hits": int(hits),
+        "shots": int(shots),
+        "accuracy": accuracy_bucket(accuracy),
+        "skill_level": _normalize(skill_level) or "beginner",
+        "language": _normalize(language) or "pl",
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class AICommentCacheService:
+    @staticmethod
+    async def get(session: Optional[AsyncSession], fingerprint: str) -> Optional[str]:
+        """
+        Komentarz z cache: najpierw LRU w procesie, potem tabela ai_comment_cache (jeśli podano sesję).
+        Nie robi commit sesji wywołującego.
+        """
+        comment = _memory_cache.get(fingerprint)
+        if comment is not None:
+            metrics.incr("memory_hits")
+            return comment
+
+        if session is not None:
+            now = datetime.utcnow()
+            query = select(AICommentCache).where(
+                AICommentCache.fingerprint == fingerprint,
+                AICommentCache.expires_at > now
+            )
+            row = (await session.exec(query)).first()
+            if row is not None:
+                comment = row.comment
+                _memory_cache.put(fingerprint, comment, expires_at=row.expires_at.replace(tzinfo=timezone.utc).timestamp())
+                # Bez commit - licznik trafień zapisze się razem z transakcją wywołującego
+                await session.exec(
+                    update(AICommentCache)
+                    .where(AICommentCache.fingerprint == fingerprint)
+                    .values(hit_count=AICommentCache.hit_count + 1, last_used_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                metrics.incr("db_hits")
+                return comment
+
+        metrics.incr("misses")
+        return None
+
+    @staticmethod
+    async def put(session: Optional[AsyncSession], fingerprint: str, comment: str, language: str) -> None:
+        """
+        Zapisuje komentarz w obu warstwach; w tabeli jednym INSERT ... ON CONFLICT.
+        Przycinanie do limitu (COUNT na całej tabeli) najwyżej raz na AI_COMMENT_CACHE_PRUNE_SECONDS.
+        """
+        _memory_cache.put(fingerprint, comment)
+        metrics.incr("stores")
+        if session is None:
+            return
+
+        now = datetime.utcnow()
+        values = {
+            "fingerprint": fingerprint,
+            "comment": comment,
+            "language": language or "pl",
+            "hit_count": 0,
+            "created_at": now,
+            "last_used_at": now,
+            "expires_at": now + timedelta(seconds=app_settings.ai_comment_cache_ttl_seconds),
+        }
+        insert = upsert_insert(session)
+        if insert is not None:
+            stmt = insert(AICommentCache).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["fingerprint"],
+                set_={key: stmt.excluded[key] for key in ("comment", "language", "last_used_at", "expires_at")}
+            )
+            await session.exec(stmt)
+        else:
+            existing = await session.get(AICommentCache, fingerprint)
+            if existing:
+                for key in ("comment", "language", "last_used_at", "expires_at"):
+                    setattr(existing, key, values[key])
+                session.add(existing)
+            else:
+                session.add(AICommentCache(**values))
+        if time.monotonic() - _last_prune["at"] >= app_settings.ai_comment_cache_prune_seconds:
+            _last_prune["at"] = time.monotonic()
+            await AICommentCacheService.prune(session, now)
+        await session.commit()
+
+    @staticmethod
+    async def prune(session: AsyncSession, now: Optional[datetime] = None) -> None:
+        """Usuwa wygasłe wpisy i najdawniej używane ponad AI_COMMENT_CACHE_MAX_ROWS. Nie robi commit."""
+        now = now or datetime.utcnow()
+        await session.exec(delete(AICommentCache).where(AICommentCache.expires_at <= now))
+        max_rows = app_settings.ai_comment_cache_max_rows
+        if max_rows <= 0:
+            return
+        count = (await session.exec(select(func.count()).select_from(AICommentCache))).one()
+        if count <= max_rows:
+            return
+        oldest = (
+            select(AICommentCache.fingerprint)
+            .order_by(AICommentCache.last_used_at, AICommentCache.fingerprint)
+            .limit(count - max_rows)
+        )
+        await session.exec(delete(AICommentCache).where(AICommentCache.fingerprint.in_(oldest)))
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        return metrics.snapshot()
+
+    @staticmethod
+    def clear_memory() -> None:
+        _memory_cache.clear()
+        metrics.reset()
+        _last_prune["at"] = float("-inf")
@@ -0,0 +1,354 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import AIJob, ShootingSession, Gun, User
+from services.ai_service import AIService
+from services.accuracy_histogram_service import AccuracyHistogramService, session_accuracy_bucket
+from services.rank_service import update_user_rank
+from services.exceptions import NotFoundError, BadRequestError, ForbiddenError
+from services.user_context import UserContext, UserRole
+from services.user_settings_service import UserSettingsService
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("done", "failed")
+EVENTS_POLL_SECONDS = 5  # SSE: co tyle sekund stan z bazy (zlecenie mogło trafić do innego procesu)
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+# Powiadomienia o zakończeniu zlecenia dla oczekujących w tym procesie (SSE); każdy oczekujący ma własne zdarzenie
+_waiters: Dict[str, Set[asyncio.Event]] = {}
+
+
+def _session_factory() -> Callable[[], AsyncSession]:
+    from database import async_session_maker
+    return async_session_maker
+
+
+class AIJobFullError(HTTPException):
+    def __init__(self, detail: str = "Kolejka analiz AI jest pełna, spróbuj ponownie za chwilę"):
+        super().__init__(status_code=503, detail=detail)
+
+
+class AIJobService:
+    @staticmethod
+    async def _get_owned_session(session: AsyncSession, session_id: str, user: UserContext) -> ShootingSession:
+        ss = await session.get(ShootingSession, session_id)
+        if not ss or (user.role != UserRole.admin and ss.user_id != user.user_id):
+            raise NotFoundError("Sesja nie została znaleziona")
+        return ss
+
+    @staticmethod
+    def _validate(ss: ShootingSession) -> None:
+        # Wymagane: dystans i liczba strzałów
+        if not ss.distance_m or not ss.shots or ss.shots == 0:
+            raise BadRequestError("Sesja musi zawierać dystans i liczbę strzałów, aby wygenerować komentarz AI")
+
+    @staticmethod
+    def _ensure_workers() -> asyncio.Queue:
+        """Kolejka i pula workerów tworzone przy pierwszym zleceniu (lub przy starcie aplikacji)."""
+        global _queue
+        if _queue is None:
+            _queue = asyncio.Queue(maxsize=max(1, settings.ai_job_queue_size))
+            for index in range(max(1, settings.ai_job_workers)):
+                _workers.append(asyncio.create_task(AIJobService._worker(index)))
+        return _queue
+
+    @staticmethod
+    async def enqueue(session: AsyncSession, user: UserContext, session_id: str) -> AIJob:
+        """Sprawdza sesję, zapisuje zlecenie i od razu wraca - analiza wykonuje się w tle."""
+        if user.is_guest:
+            raise ForbiddenError("Goście nie mogą generować komentarzy AI")
+        ss = await AIJobService._get_owned_session(session, session_id, user)
+        AIJobService._validate(ss)
+
+        queue = AIJobService._ensure_workers()
+        if queue.full():
+            raise AIJobFullError()
+        job = AIJob(session_id=ss.id, user_id=user.user_id, role=user.role.value)
+        session.add(job)
+        await session.commit()
+        await session.refresh(job)
+        try:
+            queue.put_nowait(job.id)
+        except asyncio.QueueFull:
+            # Równoległe zlecenia zapełniły kolejkę w trakcie commit - zapisane zlecenie nie może zostać "queued"
+            error = AIJobFullError()
+            job.status = "failed"
+            job.error, job.error_status = error.detail, error.status_code
+            job.finished_at = datetime.utcnow()
+            session.add(job)
+            await session.commit()
+            raise error
+        logger.info(f"[AI] Zlecenie {job.id} dla sesji {ss.id} w kolejce ({queue.qsize()} oczekujących)")
+        return job
+
+    @staticmethod
+    async def get_job(session: AsyncSession, user: UserContext, job_id: str) -> AIJob:
+        job = await session.get(AIJob, job_id)
+        if not job or (user.role != UserRole.admin and job.user_id != user.user_id):
+            raise NotFoundError("Zlecenie nie zostało znalezione")
+        return job
+
+    @staticmethod
+    async def reload(job_id: str) -> Optional[AIJob]:
+        """Świeży stan zlecenia we własnej sesji - strumień SSE żyje dłużej niż sesja żądania."""
+        async with _session_factory()() as session:
+            return await session.get(AIJob, job_id)
+
+    @staticmethod
+    def to_read(job: AIJob) -> Dict[str, Any]:
+        return {
+            "id": job.id,
+            "session_id": job.session_id,
+            "status": job.status,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+            "error_status": job.error_status,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at
+        }
+
+    @staticmethod
+    async def wait(job_id: str, timeout: float) -> bool:
+        """
+        Czeka na zakończenie zlecenia w tym procesie; False po upływie `timeout`.
+        Stan jest sprawdzany ponownie po rejestracji - zakończenie tuż przed nią nie czeka pełnego `timeout`.
+        """
+        event = asyncio.Event()
+        _waiters.setdefault(job_id, set()).add(event)
+        try:
+            job = await AIJobService.reload(job_id)
+            if job is None or job.status in FINISHED_STATUSES:
+                return True
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            events = _waiters.get(job_id)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del _waiters[job_id]
+
+    @staticmethod
+    def _notify(job_id: str) -> None:
+        for event in _waiters.pop(job_id, ()):
+            event.set()
+
+    @staticmethod
+    async def _worker(index: int) -> None:
+        while True:
+            job_id = await _queue.get()
+            try:
+                await AIJobService.run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[AI] Worker {index}: błąd zlecenia {job_id}: {e}", exc_info=True)
+            finally:
+                _queue.task_done()
+
+    @staticmethod
+    async def run_job(job_id: str) -> None:
+        """Wykonuje zlecenie we własnej sesji bazy i zapisuje wynik lub błąd; zlecenie już przejęte jest pomijane."""
+        async with _session_factory()() as session:
+            # Atomowe przejęcie - to samo zlecenie w kolejkach kilku procesów wykona tylko jeden
+            claimed = await session.exec(
+                update(AIJob)
+                .where(AIJob.id == job_id, AIJob.status == "queued")
+                .values(status="running", started_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            if claimed.rowcount == 0:
+                return
+            job = await session.get(AIJob, job_id)
+            if job is None:
+                return
+
+            try:
+                result = await AIJobService._generate(session, job)
+                job.status = "done"
+                job.result = json.dumps(result, ensure_ascii=False)
+            except Exception as e:
+                await session.rollback()
+                job = await session.get(AIJob, job_id)
+                if job is None:
+                    return
+                job.status = "failed"
+                if isinstance(e, HTTPException):
+                    job.error, job.error_status = str(e.detail), e.status_code
+                else:
+                    logger.error(f"[AI] Błąd podczas generowania komentarza AI: {e}", exc_info=True)
+                    job.error, job.error_status = f"Błąd podczas generowania komentarza AI: {e}", 500
+            job.finished_at = datetime.utcnow()
+            session.add(job)
+            await session.commit()
+        AIJobService._notify(job_id)
+
+    @staticmethod
+    async def _load_target_image(path: str) -> Optional[str]:
+        try:
+            from services.supabase_service import get_target_image_base64
+        except ImportError:
+            return None
+        try:
+            logger.info(f"Pobieranie zdjęcia tarczy: {path}")
+            return await asyncio.to_thread(get_target_image_base64, path)
+        except Exception as e:
+            logger.warning(f"Nie udało się pobrać zdjęcia tarczy: {str(e)}", exc_info=True)
+            return None
+
+    @staticmethod
+    async def _generate(session: AsyncSession, job: AIJob) -> Dict[str, Any]:
+        """
+        Komentarz AI dla sesji:
+        Przypadek A: brak trafień + zdjęcie -> Vision liczy trafienia i analizuje
+        Przypadek B: trafienia + zdjęcie -> Vision tylko analizuje jakościowo
+        Przypadek C: trafienia bez zdjęcia -> tylko tekstowa analiza
+        """
+        user = UserContext(user_id=job.user_id, role=UserRole(job.role))
+        ss = await AIJobService._get_owned_session(session, job.session_id, user)
+        AIJobService._validate(ss)
+
+        gun = await session.get(Gun, ss.gun_id)
+        if not gun:
+            raise NotFoundError("Broń nie została znaleziona")
+
+        user_record = (await session.exec(select(User).where(User.user_id == user.user_id))).first()
+        skill_level = user_record.skill_level if user_record else "beginner"
+        user_settings = await UserSettingsService.get_settings(session, user)
+        user_language = user_settings.language or "pl"
+
+        # Koszyk histogramu celności sprzed zmian - Vision może ustawić trafienia i celność
+        old_bucket = session_accuracy_bucket(ss)
+        target_image_base64 = await AIJobService._load_target_image(ss.target_image_path) if ss.target_image_path else None
+        has_hits = ss.hits is not None
+
+        if target_image_base64 is not None:
+            logger.info(f"Wywołanie Vision API dla sesji {ss.id}")
+            vision_result = await AIService.analyze_target_with_vision(
+                gun=gun,
+                distance_m=ss.distance_m,
+                shots=ss.shots,
+                hits=ss.hits if has_hits else None,
+                target_image_base64=target_image_base64,
+                skill_level=skill_level,
+                language=user_language
+            )
+            if vision_result:
+                if not has_hits:
+                    ss.hits = vision_result["hits"]
+                    ss.accuracy_percent = vision_result["accuracy"]
+                ss.ai_comment = vision_result["comment"]
+                await AIJobService._save_session(session, ss, old_bucket)
+                return {
+                    "ai_comment": vision_result["comment"],
+                    "hits": vision_result.get("hits"),
+                    "accuracy": vision_result.get("accuracy")
+                }
+            logger.warning(f"Vision API zwróciło None dla sesji {ss.id}")
+            if not has_hits:
+                if not settings.openai_api_key:
+                    raise BadRequestError("Brak klucza OpenAI API. Skonfiguruj OPENAI_API_KEY w zmiennych środowiskowych.")
+                raise BadRequestError(
+                    "Nie udało się policzyć trafień ze zdjęcia. Sprawdź czy zdjęcie jest poprawne lub podaj liczbę trafień ręcznie."
+                )
+
+        # Przypadek C lub fallback: zwykła analiza tekstowa
+        if not has_hits:
+            raise BadRequestError("Podaj liczbę trafień lub dodaj zdjęcie tarczy, aby wygenerować komentarz AI")
+
+        if not ss.accuracy_percent:
+            ss.accuracy_percent = (ss.hits / ss.shots * 100) if ss.shots > 0 else 0
+
+        ai_comment = await AIService.generate_comment(
+            gun=gun,
+            distance_m=ss.distance_m,
+            hits=ss.hits,
+            shots=ss.shots,
+            accuracy=ss.accuracy_percent,
+            skill_level=skill_level,
+            language=user_language,
+            session=session
+        )
+        if ai_comment.startswith("Błąd podczas generowania komentarza") or ai_comment.startswith("Brak klucza API"):
+            raise HTTPException(status_code=500, detail=ai_comment)
+
+        ss.ai_comment = ai_comment
+        await AIJobService._save_session(session, ss, old_bucket)
+        return {"ai_comment": ai_comment}
+
+    @staticmethod
+    async def _save_session(session: AsyncSession, ss: ShootingSession, old_bucket: Optional[int]) -> None:
+        """
+        Zapisuje wynik analizy w sesji razem ze zmianą histogramu celności (jak przy edycji sesji),
+        a po zmianie koszyka przelicza rangę właściciela.
+        """
+        new_bucket = session_accuracy_bucket(ss)
+        session.add(ss)
+        await AccuracyHistogramService.replace(session, ss.user_id, old_bucket, new_bucket)
+        await session.commit()
+        if new_bucket == old_bucket:
+            return
+        try:
+            owner = (await session.exec(select(User).where(User.user_id == ss.user_id))).first()
+            if owner:
+                await update_user_rank(owner, session)
+        except Exception as e:
+            logger.error(f"[RANK] Błąd podczas aktualizacji rangi po analizie AI: {e}", exc_info=True)
+
+    @staticmethod
+    async def resume_pending() -> int:
+        """
+        Po restarcie: zlecenia czekające i przerwane wracają do kolejki (najstarsze pierwsze).
+        Uruchamiane w każdym workerze, więc `running` wraca do kolejki tylko po AI_JOB_STALE_SECONDS
+        (i tylko w procesie, którego UPDATE je przestawił), a `queued` przejmuje atomowo pierwszy wolny worker.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.ai_job_stale_seconds)
+        async with _session_factory()() as session:
+            stale_ids = (await session.exec(
+                select(AIJob.id).where(
+                    AIJob.status == "running",
+                    or_(AIJob.started_at.is_(None), AIJob.started_at < stale_before)
+                )
+            )).all()
+            for job_id in stale_ids:
+                await session.exec(
+                    update(AIJob)
+                    .where(
+                        AIJob.id == job_id,
+                        AIJob.status == "running",
+                        or_(AIJob.started_at.is_(None), AIJob.started_at < stale_before)
+                    )
+                    .values(status="queued", started_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+            job_ids = (await session.exec(
+                select(AIJob.id).where(AIJob.status == "queued").order_by(AIJob.created_at)
+            )).all()
+        queue = AIJobService._ensure_workers()
+        for job_id in job_ids:
+            await queue.put(job_id)
+        return len(job_ids)
+
+    @staticmethod
+    async def stop_workers() -> None:
+        global _queue
+        workers = list(_workers)
+        _workers.clear()
+        _queue = None
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
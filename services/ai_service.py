@@ -2,13 +2,59 @@ import json
 import asyncio
 import logging
 from typing import Optional, Dict, Any
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
+from sqlmodel.ext.asyncio.session import AsyncSession
 from settings import settings
 from models import Gun
 from services.error_handler import ErrorHandler
+from services.ai_comment_cache_service import AICommentCacheService, comment_fingerprint
 
 logger = logging.getLogger(__name__)
 
+COMMENT_MODEL = "gpt-4o-mini"
+
+# Długo żyjący klient per klucz API - połączenia keep-alive zamiast nowego TLS przy każdym komentarzu
+_clients: Dict[str, AsyncOpenAI] = {}
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_client(api_key: str) -> AsyncOpenAI:
+    client = _clients.get(api_key)
+    if client is None or client.is_closed():
+        timeout = httpx.Timeout(settings.openai_read_timeout_seconds, connect=settings.openai_connect_timeout_seconds)
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=settings.openai_base_url,
+            timeout=timeout,
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.openai_max_connections,
+                    max_keepalive_connections=settings.openai_max_connections
+                )
+            )
+        )
+        _clients[api_key] = client
+    return client
+
+
+def _concurrency() -> asyncio.Semaphore:
+    """Ogranicza liczbę równoległych wywołań OpenAI w procesie (OPENAI_MAX_CONCURRENCY)."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, settings.openai_max_concurrency))
+    return _semaphore
+
+
+async def close_ai_clients() -> None:
+    global _semaphore
+    clients = list(_clients.values())
+    _clients.clear()
+    _semaphore = None
+    for client in clients:
+        await client.close()
+
 
 class AIService:
 
@@ -99,7 +145,7 @@ class AIService:
             logger.warning(f"Brak wymaganych danych: distance_m={distance_m}, shots={shots}")
             return None
 
-        client = OpenAI(api_key=api_key)
+        client = _get_client(api_key)
 
        
         gun_info = gun.name
@@ -216,39 +262,40 @@ FORMAT:
 """
 
        
-        def _call_vision():
-            return client.chat.completions.create(
-                model="gpt-4o",
-                max_tokens=900,         # stabilne
-                temperature=0.2,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Return ONLY clean JSON. "
-                            "Never add explanations, headers or comments."
-                        ) if language == "en" else (
-                            "Zwracaj TYLKO czysty JSON. "
-                            "Nigdy nie dodawaj wyjaśnień, nagłówków ani komentarzy."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{target_image_base64}"
+        async def _call_vision():
+            async with _concurrency():
+                return await client.chat.completions.create(
+                    model="gpt-4o",
+                    max_tokens=900,         # stabilne
+                    temperature=0.2,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": (
+                                "Return ONLY clean JSON. "
+                                "Never add explanations, headers or comments."
+                            ) if language == "en" else (
+                                "Zwracaj TYLKO czysty JSON. "
+                                "Nigdy nie dodawaj wyjaśnień, nagłówków ani komentarzy."
+                            )
+                        },
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:image/jpeg;base64,{target_image_base64}"
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ]
-            )
+                            ]
+                        }
+                    ]
+                )
 
         try:
-            response = await asyncio.to_thread(_call_vision)
+            response = await _call_vision()
             raw = response.choices[0].message.content.strip()
 
             logger.debug(f"VISION RAW: {raw[:200]}...")
@@ -293,28 +340,38 @@ FORMAT:
         accuracy: float,
         skill_level: str = "beginner",
         language: str = "pl",
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        session: Optional[AsyncSession] = None
     ) -> str:
         """
         Generuje komentarz AI dla sesji strzeleckiej bez zdjęcia.
-        Używa modelu gpt-4o-mini.
+        Używa modelu gpt-4o-mini. Komentarze są cache'owane po odcisku danych promptu
+        (LRU w procesie, a z `session` także tabela ai_comment_cache).
         """
         logger.info(f"generate_comment wywołane: gun={gun.name}, distance_m={distance_m}, hits={hits}, shots={shots}, accuracy={accuracy}, skill_level={skill_level}")
+        language = language or "pl"
+        fingerprint = comment_fingerprint(
+            COMMENT_MODEL, gun.type, gun.caliber, distance_m, hits, shots, accuracy, skill_level, language
+        )
+        cached = await AICommentCacheService.get(session, fingerprint)
+        if cached is not None:
+            return cached
+
         api_key = api_key or settings.openai_api_key
         logger.info(f"API key dostępny: {bool(api_key)}, długość: {len(api_key) if api_key else 0}")
         if not api_key or len(api_key) < 10:
             logger.error("Brak lub nieprawidłowy klucz API")
             return "Brak klucza API OpenAI. Skonfiguruj OPENAI_API_KEY w zmiennych środowiskowych."
 
-        client = OpenAI(api_key=api_key)
+        client = _get_client(api_key)
 
-        gun_info = gun.name
+        # Tylko dane z odcisku (bez nazwy broni) - komentarz z cache pasuje do każdej sesji o tych danych
+        gun_parts = []
         if gun.type:
-            gun_info += f", typ: {gun.type}"
+            gun_parts.append(f"typ: {gun.type}" if language != "en" else f"type: {gun.type}")
         if gun.caliber:
-            gun_info += f", kaliber: {gun.caliber}"
-
-        language = language or "pl"
+            gun_parts.append(f"kaliber: {gun.caliber}" if language != "en" else f"caliber: {gun.caliber}")
+        gun_info = ", ".join(gun_parts) or ("unknown" if language == "en" else "nieznana")
         
         if language == "en":
             prompt = f"""
@@ -359,37 +416,37 @@ ZADANIA:
 Zwróć TYLKO komentarz, bez dodatkowych nagłówków ani formatowania.
 """
 
-        def _call_api():
+        async def _call_api():
             try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    max_tokens=300,
-                    temperature=0.7,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": (
-                                "You are a shooting expert. You give short, constructive comments in English."
-                                if language == "en"
-                                else "Jesteś ekspertem strzeleckim. Dajesz krótkie, konstruktywne komentarze po polsku."
-                            )
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ]
-                )
+                async with _concurrency():
+                    response = await client.chat.completions.create(
+                        model=COMMENT_MODEL,
+                        max_tokens=300,
+                        temperature=0.7,
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": (
+                                    "You are a shooting expert. You give short, constructive comments in English."
+                                    if language == "en"
+                                    else "Jesteś ekspertem strzeleckim. Dajesz krótkie, konstruktywne komentarze po polsku."
+                                )
+                            },
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ]
+                    )
                 return response.choices[0].message.content.strip()
             except Exception as e:
                 logger.error(f"OpenAI API error: {e}", exc_info=True)
                 raise
 
         try:
-            comment = await asyncio.to_thread(_call_api)
+            comment = await _call_api()
             if not comment or len(comment) < 10:
                 return "Błąd podczas generowania komentarza: odpowiedź z API jest pusta lub zbyt krótka."
-            return comment
         except Exception as e:
             logger.error(f"Błąd podczas generowania komentarza: {e}", exc_info=True)
             error_msg = str(e)
@@ -399,3 +456,12 @@ Zwróć TYLKO komentarz, bez dodatkowych nagłówków ani formatowania.
                 return "Błąd podczas generowania komentarza: nieprawidłowy klucz API OpenAI."
             else:
                 return f"Błąd podczas generowania komentarza: {error_msg}"
+
+        try:
+            await AICommentCacheService.put(session, fingerprint, comment, language)
+        except Exception as e:
+            # Cache jest tylko optymalizacją - błąd zapisu nie może zgubić komentarza
+            logger.warning(f"Nie udało się zapisać komentarza AI w cache: {e}")
+            if session is not None:
+                await session.rollback()
+        return comment
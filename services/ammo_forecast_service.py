@@ -0,0 +1,119 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Dict, Any, Optional
+from datetime import date, timedelta
+from sqlalchemy import func
+import math
+import logging
+import numpy as np
+from models import Ammo, ShootingSession
+from services.user_context import UserContext, UserRole
+from services.user_settings_service import UserSettingsService
+from services.ttl_cache import TTLCache
+from settings import settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+FORECAST_WINDOW_DAYS = 180  # historia brana pod uwagę przy tempie zużycia
+HALF_LIFE_DAYS = 30  # po tylu dniach waga dnia spada o połowę
+MIN_HISTORY_DAYS = 14  # krótsza historia jest rozkładana na tyle dni, żeby jedna sesja nie zawyżała tempa
+REORDER_LEAD_DAYS = 14  # sugeruj zakup, gdy zapas skończy się wcześniej
+REORDER_COVER_DAYS = 60  # sugerowany zakup wystarcza na tyle dni
+
+# Tempo zużycia (strzały/dzień) per amunicja, z datą wyliczenia - wagi zależą od dzisiejszej daty.
+# Unieważniany przy zapisie sesji danej amunicji; TTL ogranicza nieaktualność między procesami.
+_rate_cache = TTLCache(app_settings.ammo_forecast_cache_size, app_settings.ammo_forecast_cache_ttl_seconds)
+
+_ages = np.arange(FORECAST_WINDOW_DAYS)
+_weights = np.power(0.5, _ages / HALF_LIFE_DAYS)
+_cumulative_weights = np.cumsum(_weights)
+
+
+def consumption_rates(ammo_ids: List[str], rows: List[tuple], today: date) -> Dict[str, float]:
+    """
+    Wykładniczo ważona średnia strzałów na dzień dla wielu amunicji naraz.
+    `rows` to (ammo_id, dzień, strzały) z ostatnich FORECAST_WINDOW_DAYS dni.
+    """
+    if not ammo_ids:
+        return {}
+    index = {ammo_id: i for i, ammo_id in enumerate(ammo_ids)}
+    daily = np.zeros((len(ammo_ids), FORECAST_WINDOW_DAYS))
+    rows = [row for row in rows if row[0] in index and 0 <= (today - row[1]).days < FORECAST_WINDOW_DAYS]
+    if rows:
+        row_idx = np.fromiter((index[ammo_id] for ammo_id, _, _ in rows), dtype=np.intp, count=len(rows))
+        age_idx = np.fromiter(((today - day).days for _, day, _ in rows), dtype=np.intp, count=len(rows))
+        shots = np.fromiter((float(value or 0) for _, _, value in rows), dtype=float, count=len(rows))
+        np.add.at(daily, (row_idx, age_idx), shots)
+
+    # Wagi normalizowane tylko po dniach od pierwszego użycia (nie mniej niż MIN_HISTORY_DAYS)
+    used = daily > 0
+    first_age = np.where(used.any(axis=1), FORECAST_WINDOW_DAYS - 1 - np.argmax(used[:, ::-1], axis=1), 0)
+    span = np.clip(first_age, MIN_HISTORY_DAYS - 1, FORECAST_WINDOW_DAYS - 1)
+    rates = (daily @ _weights) / _cumulative_weights[span]
+    return {ammo_id: float(rates[i]) for ammo_id, i in index.items()}
+
+
+class AmmoForecastService:
+    @staticmethod
+    def invalidate(*ammo_ids: Optional[str]) -> None:
+        for ammo_id in ammo_ids:
+            if ammo_id:
+                _rate_cache.invalidate(ammo_id)
+
+    @staticmethod
+    async def _load_rates(session: AsyncSession, ammo_ids: List[str], today: date) -> Dict[str, float]:
+        """Tempo z cache, a brakujące - jednym zgrupowanym zapytaniem i jednym przebiegiem NumPy."""
+        rates: Dict[str, float] = {}
+        missing = []
+        for ammo_id in ammo_ids:
+            cached = _rate_cache.get(ammo_id)
+            if cached is not None and cached[0] == today:
+                rates[ammo_id] = cached[1]
+            else:
+                missing.append(ammo_id)
+        if not missing:
+            return rates
+
+        since = today - timedelta(days=FORECAST_WINDOW_DAYS - 1)
+        query = (
+            select(ShootingSession.ammo_id, ShootingSession.date, func.sum(ShootingSession.shots))
+            .where(ShootingSession.ammo_id.in_(missing), ShootingSession.date >= since)
+            .group_by(ShootingSession.ammo_id, ShootingSession.date)
+        )
+        computed = consumption_rates(missing, (await session.exec(query)).all(), today)
+        for ammo_id, rate in computed.items():
+            _rate_cache.put(ammo_id, (today, rate))
+        rates.update(computed)
+        return rates
+
+    @staticmethod
+    def _forecast(ammo: Ammo, rate: float, alerts_enabled: bool) -> Dict[str, Any]:
+        units = ammo.units_in_package or 0
+        rate = round(rate, 6)  # szum zmiennoprzecinkowy nie może zaniżać liczby dni
+        days_until_empty = math.floor(units / rate) if rate > 0 else None
+        reorder_suggested = days_until_empty is not None and days_until_empty <= REORDER_LEAD_DAYS
+        suggested_quantity = max(0, math.ceil(rate * REORDER_COVER_DAYS) - units) if reorder_suggested else 0
+        return {
+            "ammo_id": ammo.id,
+            "ammo_name": ammo.name,
+            "units_in_package": units,
+            "daily_rate": round(rate, 2),
+            "days_until_empty": days_until_empty,
+            "reorder_suggested": reorder_suggested,
+            "suggested_quantity": suggested_quantity,
+            "low_stock_alert": reorder_suggested and alerts_enabled
+        }
+
+    @staticmethod
+    async def get_forecasts(session: AsyncSession, user: UserContext) -> List[Dict[str, Any]]:
+        query = select(Ammo)
+        if user.role != UserRole.admin:
+            query = query.where(Ammo.user_id == user.user_id)
+        ammo_list = (await session.exec(query.order_by(Ammo.name, Ammo.id))).all()
+        settings = await UserSettingsService.get_settings(session, user)
+
+        rates = await AmmoForecastService._load_rates(session, [ammo.id for ammo in ammo_list], date.today())
+        return [
+            AmmoForecastService._forecast(ammo, rates.get(ammo.id, 0.0), settings.low_ammo_notifications_enabled)
+            for ammo in ammo_list
+        ]
@@ -1,13 +1,23 @@
-from sqlmodel import Session, select
-from typing import Optional
-from sqlalchemy import or_, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, Dict, Any
 from models import Ammo, AmmoUpdate
 from schemas.ammo import AmmoCreate
 from services.user_context import UserContext, UserRole
 from services.exceptions import NotFoundError, BadRequestError
+from services.pagination import paginate
+from services.search_service import search_condition
+from services.session_summary_service import SessionSummaryService
+from services.accuracy_histogram_service import AccuracyHistogramService
+from services.gun_round_counter_service import GunRoundCounterService
+from services.ammo_forecast_service import AmmoForecastService
+from services.user_settings_service import UserSettingsService
+from services.currency_service import convert_pln_amounts
 
 
 class AmmoService:
+    LIST_ORDER = ((Ammo.name, False), (Ammo.id, False))
+
     @staticmethod
     def _query_for_user(user: UserContext):
         query = select(Ammo)
@@ -20,65 +30,106 @@ class AmmoService:
     def _apply_search(query, search: Optional[str]):
         if not search:
             return query
-        pattern = f"%{search.lower()}%"
-        return query.where(
-            or_(
-                func.lower(Ammo.name).like(pattern),
-                func.lower(func.coalesce(Ammo.caliber, "")).like(pattern)
-            )
-        )
+        condition = search_condition(Ammo.search_text, search)
+        if condition is None:
+            return query
+        return query.where(condition)
 
     @staticmethod
-    def _get_single_ammo(session: Session, ammo_id: str, user: UserContext) -> Ammo:
+    async def _get_single_ammo(session: AsyncSession, ammo_id: str, user: UserContext) -> Ammo:
         query = AmmoService._query_for_user(user).where(Ammo.id == ammo_id)
-        ammo = session.exec(query).first()
+        ammo = (await session.exec(query)).first()
         if not ammo:
             raise NotFoundError("Amunicja nie została znaleziona")
         return ammo
 
     @staticmethod
-    def get_all_ammo(session: Session, user: UserContext, limit: int, offset: int, search: Optional[str]) -> dict:
+    async def get_all_ammo(
+        session: AsyncSession,
+        user: UserContext,
+        limit: int,
+        offset: int,
+        search: Optional[str],
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> dict:
         base_query = AmmoService._query_for_user(user)
         filtered_query = AmmoService._apply_search(base_query, search)
-        count_query = filtered_query.with_only_columns(func.count(Ammo.id)).order_by(None)
+        return await paginate(
+            session,
+            filtered_query,
+            AmmoService.LIST_ORDER,
+            limit,
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total
+        )
 
-        total = session.exec(count_query).one()
-        items = session.exec(filtered_query.offset(offset).limit(limit)).all()
-        return {"total": total, "items": items}
+    @staticmethod
+    async def get_ammo_by_id(session: AsyncSession, ammo_id: str, user: UserContext) -> Ammo:
+        return await AmmoService._get_single_ammo(session, ammo_id, user)
 
     @staticmethod
-    def get_ammo_by_id(session: Session, ammo_id: str, user: UserContext) -> Ammo:
-        return AmmoService._get_single_ammo(session, ammo_id, user)
+    async def get_inventory_value(session: AsyncSession, user: UserContext) -> Dict[str, Any]:
+        """Wartość zapasu amunicji w PLN i w walucie użytkownika (najnowszy kurs, jedno przeliczenie wektorowe)."""
+        query = AmmoService._query_for_user(user).order_by(Ammo.name, Ammo.id)
+        ammo_list = (await session.exec(query)).all()
+        user_settings = await UserSettingsService.get_settings(session, user)
+        currency = (user_settings.currency or "pln").upper()
+
+        values_pln = [round((ammo.units_in_package or 0) * (ammo.price_per_unit or 0.0), 2) for ammo in ammo_list]
+        total_pln = round(sum(values_pln), 2)
+        converted = await convert_pln_amounts(session, [*values_pln, total_pln], currency)
+        return {
+            "currency": currency,
+            "total_value_pln": total_pln,
+            "total_value": converted[-1],
+            "items": [
+                {
+                    "ammo_id": ammo.id,
+                    "ammo_name": ammo.name,
+                    "units_in_package": ammo.units_in_package or 0,
+                    "price_per_unit": ammo.price_per_unit,
+                    "value_pln": value_pln,
+                    "value": value
+                }
+                for ammo, value_pln, value in zip(ammo_list, values_pln, converted)
+            ]
+        }
 
     @staticmethod
-    def create_ammo(session: Session, ammo_data: AmmoCreate, user: UserContext) -> Ammo:
+    async def create_ammo(session: AsyncSession, ammo_data: AmmoCreate, user: UserContext) -> Ammo:
         payload = ammo_data.model_dump()
         ammo = Ammo(**payload, user_id=user.user_id)
         session.add(ammo)
-        session.commit()
-        session.refresh(ammo)
+        await session.commit()
+        await session.refresh(ammo)
         return ammo
 
     @staticmethod
-    def update_ammo(session: Session, ammo_id: str, ammo_data: AmmoUpdate, user: UserContext) -> Ammo:
-        ammo = AmmoService._get_single_ammo(session, ammo_id, user)
+    async def update_ammo(session: AsyncSession, ammo_id: str, ammo_data: AmmoUpdate, user: UserContext) -> Ammo:
+        ammo = await AmmoService._get_single_ammo(session, ammo_id, user)
         ammo_dict = ammo_data.model_dump(exclude_unset=True)
         for key, value in ammo_dict.items():
             setattr(ammo, key, value)
         session.add(ammo)
-        session.commit()
-        session.refresh(ammo)
+        await session.commit()
+        await session.refresh(ammo)
         return ammo
 
     @staticmethod
-    def delete_ammo(session: Session, ammo_id: str, user: UserContext) -> dict:
-        ammo = AmmoService._get_single_ammo(session, ammo_id, user)
+    async def delete_ammo(session: AsyncSession, ammo_id: str, user: UserContext) -> dict:
+        ammo = await AmmoService._get_single_ammo(session, ammo_id, user)
         try:
-            session.delete(ammo)
-            session.commit()
+            await SessionSummaryService.delete_for(session, user_id=ammo.user_id, ammo_id=ammo.id)
+            await AccuracyHistogramService.remove_sessions(session, ammo.user_id, ammo_id=ammo.id)
+            await GunRoundCounterService.remove_sessions(session, ammo.id)
+            await session.delete(ammo)
+            await session.commit()
+            AmmoForecastService.invalidate(ammo.id)
             return {"message": f"Amunicja o ID {ammo_id} została usunięta"}
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             error_msg = str(e).lower()
             if "foreign key" in error_msg or "integrity" in error_msg:
                 raise BadRequestError(
@@ -87,13 +138,13 @@ class AmmoService:
             raise BadRequestError(f"Błąd podczas usuwania amunicji: {str(e)}")
 
     @staticmethod
-    def add_ammo_quantity(session: Session, ammo_id: str, amount: int, user: UserContext) -> Ammo:
-        ammo = AmmoService._get_single_ammo(session, ammo_id, user)
+    async def add_ammo_quantity(session: AsyncSession, ammo_id: str, amount: int, user: UserContext) -> Ammo:
+        ammo = await AmmoService._get_single_ammo(session, ammo_id, user)
         current = ammo.units_in_package or 0
         ammo.units_in_package = current + amount
         session.add(ammo)
-        session.commit()
-        session.refresh(ammo)
+        await session.commit()
+        await session.refresh(ammo)
         return ammo
 
 
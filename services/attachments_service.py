@@ -1,4 +1,5 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 from models import Attachment, Gun, AttachmentType
 from services.user_context import UserContext, UserRole
@@ -90,15 +91,15 @@ class AttachmentsService:
         return query
 
     @staticmethod
-    def list_for_gun(session: Session, user: UserContext, gun_id: str) -> List[Attachment]:
-        GunService._get_single_gun(session, gun_id, user)
+    async def list_for_gun(session: AsyncSession, user: UserContext, gun_id: str) -> List[Attachment]:
+        await GunService._get_single_gun(session, gun_id, user)
         query = AttachmentsService._query_for_user(user, gun_id)
-        attachments = session.exec(query).all()
+        attachments = (await session.exec(query)).all()
         return list(attachments)
 
     @staticmethod
-    def create_attachment(session: Session, user: UserContext, gun_id: str, data: dict) -> Attachment:
-        gun = GunService._get_single_gun(session, gun_id, user)
+    async def create_attachment(session: AsyncSession, user: UserContext, gun_id: str, data: dict) -> Attachment:
+        gun = await GunService._get_single_gun(session, gun_id, user)
         attachment_type = AttachmentType(data.get("type"))
         
         # Walidacja: sprawdź czy typ dodatku jest dozwolony dla typu broni
@@ -134,29 +135,29 @@ class AttachmentsService:
             ergonomics=ergonomics
         )
         session.add(attachment)
-        session.commit()
-        session.refresh(attachment)
+        await session.commit()
+        await session.refresh(attachment)
         return attachment
 
     @staticmethod
-    def _get_single_attachment(session: Session, attachment_id: str, user: UserContext) -> Attachment:
+    async def _get_single_attachment(session: AsyncSession, attachment_id: str, user: UserContext) -> Attachment:
         query = select(Attachment).where(Attachment.id == attachment_id)
         if user.role != UserRole.admin:
             query = query.where(Attachment.user_id == user.user_id)
-        attachment = session.exec(query).first()
+        attachment = (await session.exec(query)).first()
         if not attachment:
             raise NotFoundError("Załącznik nie został znaleziony")
         return attachment
 
     @staticmethod
-    def get_attachment_by_id(session: Session, user: UserContext, attachment_id: str) -> Attachment:
-        return AttachmentsService._get_single_attachment(session, attachment_id, user)
+    async def get_attachment_by_id(session: AsyncSession, user: UserContext, attachment_id: str) -> Attachment:
+        return await AttachmentsService._get_single_attachment(session, attachment_id, user)
 
     @staticmethod
-    def delete_attachment(session: Session, user: UserContext, attachment_id: str) -> dict:
-        attachment = AttachmentsService._get_single_attachment(session, attachment_id, user)
-        session.delete(attachment)
-        session.commit()
+    async def delete_attachment(session: AsyncSession, user: UserContext, attachment_id: str) -> dict:
+        attachment = await AttachmentsService._get_single_attachment(session, attachment_id, user)
+        await session.delete(attachment)
+        await session.commit()
         return {"message": f"Załącznik o ID {attachment_id} został usunięty"}
 
 
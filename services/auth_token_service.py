@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import jwt
+from jwt import PyJWKClient
+
+from services.exceptions import UnauthorizedError
+from services.ttl_cache import TTLCache
+from services.user_context import UserContext, resolve_role
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Algorytmy kluczy asymetrycznych publikowanych przez Supabase w JWKS
+JWKS_ALGORITHMS = ["RS256", "ES256"]
+
+
+class TokenCache(TTLCache):
+    """Cache rozwiązanych tokenów; kluczem jest skrót tokena, a wpis nigdy nie przeżywa `exp`."""
+
+    @staticmethod
+    def _key(token: str) -> str:
+        # W pamięci trzymamy tylko skrót tokena
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[UserContext]:
+        return super().get(self._key(token))
+
+    def put(self, token: str, user: UserContext, token_exp: Optional[float]) -> None:
+        super().put(self._key(token), user, token_exp)
+
+    def invalidate(self, token: str) -> None:
+        super().invalidate(self._key(token))
+
+
+token_cache = TokenCache(settings.auth_token_cache_size, settings.auth_token_cache_ttl_seconds)
+
+_jwks_client: Optional[PyJWKClient] = None
+# kid -> (klucz, czas pobrania); trafiają tu tylko klucze z opublikowanego JWKS, nie kid z tokenów
+_signing_keys: Dict[str, Tuple[object, float]] = {}
+_jwks_refresh = {"at": 0.0, "failed": False}
+
+
+def _jwks_url() -> Optional[str]:
+    url = settings.supabase_url
+    if not url or url == "https://your-project-id.supabase.co":
+        return None
+    return f"{url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+
+def _get_jwks_client() -> Optional[PyJWKClient]:
+    global _jwks_client
+    if _jwks_client is None:
+        url = _jwks_url()
+        if not url:
+            return None
+        _jwks_client = PyJWKClient(url, cache_jwk_set=True, lifespan=settings.auth_jwks_cache_seconds, timeout=5)
+    return _jwks_client
+
+
+def _store_signing_keys(client: PyJWKClient) -> None:
+    fetched_at = time.time()
+    for signing_key in client.get_signing_keys(refresh=True):
+        if signing_key.key_id:
+            _signing_keys[signing_key.key_id] = (signing_key.key, fetched_at)
+
+
+async def _get_signing_key(kid: str):
+    """
+    Klucz publiczny z JWKS. Cały zestaw kluczy jest pobierany (poza pętlą zdarzeń) najwyżej raz
+    na AUTH_JWKS_MIN_REFRESH_SECONDS - nieznany `kid` po odświeżeniu jest odrzucany bez kolejnego żądania.
+    """
+    now = time.time()
+    cached = _signing_keys.get(kid)
+    if cached and now - cached[1] < settings.auth_jwks_cache_seconds:
+        return cached[0]
+    client = _get_jwks_client()
+    if client is None:
+        return None
+
+    if now - _jwks_refresh["at"] < settings.auth_jwks_min_refresh_seconds:
+        if cached:
+            return cached[0]
+        if _jwks_refresh["failed"]:
+            # JWKS był niedostępny - token sprawdzi Auth API
+            return None
+        raise jwt.PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+
+    # Znacznik przed pobraniem - równoległe żądania z nieznanym kid nie wywołają kolejnych pobrań
+    _jwks_refresh.update(at=now, failed=False)
+    try:
+        await asyncio.to_thread(_store_signing_keys, client)
+    except jwt.PyJWKClientConnectionError:
+        _jwks_refresh["failed"] = True
+        if cached:
+            return cached[0]
+        raise
+    cached = _signing_keys.get(kid)
+    if cached is None:
+        raise jwt.PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+    return cached[0]
+
+
+async def verify_token_locally(token: str) -> Optional[dict]:
+    """
+    Weryfikuje podpis i `exp` tokena Supabase bez odpytywania Auth API.
+
+    Zwraca claims albo None, gdy lokalna weryfikacja nie jest możliwa (brak sekretu/JWKS
+    lub JWKS chwilowo niedostępny) - wtedy wywołujący sprawdza token zdalnie.
+    """
+    options = {"require": ["exp", "sub"]}
+    audience = settings.supabase_jwt_audience
+    try:
+        if settings.supabase_jwt_secret:
+            return jwt.decode(token, settings.supabase_jwt_secret, algorithms=["HS256"], audience=audience, options=options)
+
+        header = jwt.get_unverified_header(token)
+        kid = header.get("kid")
+        if header.get("alg") not in JWKS_ALGORITHMS or not kid:
+            # Token podpisany wspólnym sekretem, którego nie mamy w konfiguracji
+            return None
+        key = await _get_signing_key(kid)
+        if key is None:
+            return None
+        return jwt.decode(token, key, algorithms=JWKS_ALGORITHMS, audience=audience, options=options)
+    except jwt.ExpiredSignatureError:
+        raise UnauthorizedError("Token wygasł")
+    except jwt.PyJWKClientConnectionError as e:
+        logger.warning(f"[AUTH] JWKS niedostępny, weryfikacja zdalna: {e}")
+        return None
+    except (jwt.InvalidTokenError, jwt.PyJWKClientError):
+        raise UnauthorizedError("Nieprawidłowy token")
+
+
+def user_from_claims(claims: dict) -> UserContext:
+    user_metadata = claims.get("user_metadata") or {}
+    email = claims.get("email") or ""
+    username = user_metadata.get("username") or (email.split("@")[0] if email else None)
+    return UserContext(
+        user_id=claims["sub"],
+        email=email or None,
+        username=username,
+        role=resolve_role(user_metadata)
+    )
+
+
+def _unverified_exp(token: str) -> Optional[float]:
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return None
+    return claims.get("exp")
+
+
+async def authenticate_token(token: str, remote_lookup: Callable[[str], Awaitable[UserContext]]) -> UserContext:
+    """
+    Zwraca użytkownika dla tokena: z cache, z lokalnie zweryfikowanych claims
+    lub - gdy lokalna weryfikacja jest niedostępna - przez `remote_lookup`.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    claims = await verify_token_locally(token)
+    if claims is not None:
+        user = user_from_claims(claims)
+        token_cache.put(token, user, claims.get("exp"))
+        return user
+
+    user = await remote_lookup(token)
+    # Podpis sprawdziło Auth API, więc `exp` można odczytać bez weryfikacji
+    token_cache.put(token, user, _unverified_exp(token))
+    return user
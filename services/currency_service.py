@@ -1,123 +1,582 @@
-import requests
+import httpx
+import asyncio
 import logging
-from datetime import date
-from sqlmodel import Session, select
+import time
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from types import MappingProxyType
+import numpy as np
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func, and_
 from models.currency_rate import CurrencyRate
-from typing import Optional
+from services.dialect import upsert_insert
+from typing import Optional, Mapping, Any, Dict, List, Tuple, Iterable, Sequence
+from settings import settings as app_settings
 
 logger = logging.getLogger(__name__)
 
-NBP_API_BASE_URL = "https://api.nbp.pl/api/exchangerates/rates/A"
-
 SUPPORTED_CURRENCIES = ["USD", "EUR", "GBP"]
+UPSERT_BATCH_SIZE = 1000  # wierszy na jedno INSERT (limit parametrów SQLite)
+NBP_MAX_RANGE_DAYS = 93  # NBP zwraca najwyżej tyle dni w jednym zapytaniu o zakres
 
 
-def fetch_currency_rate_from_nbp(code: str) -> Optional[float]:
-    try:
-        url = f"{NBP_API_BASE_URL}/{code}/?format=json"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get("rates") and len(data["rates"]) > 0:
-            rate = data["rates"][0].get("mid")
-            if rate:
-                return float(rate)
+def _as_array(amounts: Sequence[Optional[float]]) -> np.ndarray:
+    return np.fromiter((np.nan if amount is None else amount for amount in amounts), dtype=float, count=len(amounts))
+
+
+def _to_optional_list(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in values.tolist()]
+
+
+@dataclass(frozen=True)
+class RatesSnapshot:
+    """
+    Niezmienny zestaw najnowszych kursów (PLN za jednostkę waluty).
+    Podmieniany w całości przy zapisie kursu - konwersje to odczyty ze słownika bez zapytań do bazy.
+    """
+    rates: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    dates: Mapping[str, date] = field(default_factory=lambda: MappingProxyType({}))
+    loaded_at: float = 0.0
+
+    def rate(self, currency: str) -> Optional[float]:
+        code = currency.upper()
+        if code == "PLN":
+            return 1.0
+        return self.rates.get(code)
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> Optional[float]:
+        if from_currency.upper() == to_currency.upper():
+            return amount
+        from_rate = self.rate(from_currency)
+        to_rate = self.rate(to_currency)
+        if from_rate is None or to_rate is None:
+            return None
+        return amount * from_rate / to_rate
+
+    def convert_many(self, amounts: Sequence[Optional[float]], from_currency: str, to_currency: str) -> List[Optional[float]]:
+        """Przelicza całą listę kwot jednym mnożeniem wektorowym (None zostaje None)."""
+        if from_currency.upper() == to_currency.upper():
+            return list(amounts)
+        from_rate = self.rate(from_currency)
+        to_rate = self.rate(to_currency)
+        if from_rate is None or to_rate is None:
+            return [None] * len(amounts)
+        values = _as_array(amounts) * (from_rate / to_rate)
+        return _to_optional_list(values)
+
+    def with_rate(self, code: str, rate: float, rate_date: date) -> "RatesSnapshot":
+        """Nowy snapshot z kursem - starszy niż obecny dla tej waluty niczego nie zmienia."""
+        code = code.upper()
+        current_date = self.dates.get(code)
+        if current_date is not None and rate_date < current_date:
+            return self
+        return RatesSnapshot(
+            rates=MappingProxyType({**self.rates, code: rate}),
+            dates=MappingProxyType({**self.dates, code: rate_date}),
+            loaded_at=self.loaded_at
+        )
+
+
+_snapshot = RatesSnapshot()
+
+
+def get_rates_snapshot() -> RatesSnapshot:
+    """Bieżący snapshot kursów (bez dostępu do bazy) - dla raportów przeliczających wiele kwot."""
+    return _snapshot
+
+
+def _set_snapshot(snapshot: RatesSnapshot) -> None:
+    global _snapshot
+    # Przypisanie referencji jest atomowe - czytelnicy widzą stary albo nowy snapshot, nigdy pośredni
+    _snapshot = snapshot
+
+
+async def load_rates_snapshot(session: AsyncSession) -> RatesSnapshot:
+    """Wczytuje najnowszy kurs każdej waluty jednym zapytaniem i podmienia snapshot."""
+    latest = (
+        select(CurrencyRate.code, func.max(CurrencyRate.date).label("latest_date"))
+        .group_by(CurrencyRate.code)
+        .subquery("latest_rates")
+    )
+    stmt = select(CurrencyRate).join(
+        latest,
+        and_(CurrencyRate.code == latest.c.code, CurrencyRate.date == latest.c.latest_date)
+    )
+    rows = (await session.exec(stmt)).all()
+    snapshot = RatesSnapshot(
+        rates=MappingProxyType({row.code: row.rate for row in rows}),
+        dates=MappingProxyType({row.code: row.date for row in rows}),
+        loaded_at=time.time()
+    )
+    _set_snapshot(snapshot)
+    return snapshot
+
+
+async def _current_snapshot(session: AsyncSession) -> RatesSnapshot:
+    """Snapshot w procesie; przeładowywany z bazy dopiero po CURRENCY_RATES_REFRESH_SECONDS (kursy z innych procesów)."""
+    snapshot = _snapshot
+    if time.time() - snapshot.loaded_at > app_settings.currency_rates_refresh_seconds:
+        snapshot = await load_rates_snapshot(session)
+    return snapshot
+
+
+@dataclass(frozen=True)
+class RateSeries:
+    """
+    Kursy jednej waluty posortowane po dacie w zwartych tablicach (ordinal daty, kurs).
+    Kurs na dzień to ostatnie notowanie nie późniejsze niż ten dzień - wyszukiwanie binarne.
+    """
+    days: array = field(default_factory=lambda: array("i"))
+    rates: array = field(default_factory=lambda: array("d"))
+
+    @classmethod
+    def from_points(cls, points: Iterable[Tuple[date, float]]) -> "RateSeries":
+        by_day = {day.toordinal(): rate for day, rate in points}
+        ordered = sorted(by_day)
+        return cls(days=array("i", ordered), rates=array("d", (by_day[day] for day in ordered)))
+
+    def rate_on(self, day: date) -> Optional[float]:
+        index = bisect_right(self.days, day.toordinal()) - 1
+        if index < 0:
+            return None
+        return self.rates[index]
+
+    def rates_on(self, ordinals: np.ndarray) -> np.ndarray:
+        """Kursy dla tablicy dni (ordinal) jednym searchsorted; NaN przed pierwszym notowaniem."""
+        days = np.frombuffer(self.days, dtype=np.intc) if len(self.days) else np.empty(0, dtype=np.intc)
+        rates = np.frombuffer(self.rates, dtype=float) if len(self.rates) else np.empty(0)
+        index = np.searchsorted(days, ordinals, side="right") - 1
+        result = np.full(len(ordinals), np.nan)
+        found = index >= 0
+        result[found] = rates[index[found]]
+        return result
+
+    def with_points(self, points: Iterable[Tuple[date, float]]) -> "RateSeries":
+        existing = zip((date.fromordinal(day) for day in self.days), self.rates)
+        return RateSeries.from_points([*existing, *points])
+
+
+@dataclass(frozen=True)
+class RateHistory:
+    """Niezmienna historia kursów wszystkich walut - do przeliczania kwot po kursie z ich daty."""
+    series: Mapping[str, RateSeries] = field(default_factory=lambda: MappingProxyType({}))
+    loaded_at: float = 0.0
+
+    def rate_on(self, currency: str, day: date) -> Optional[float]:
+        code = currency.upper()
+        if code == "PLN":
+            return 1.0
+        series = self.series.get(code)
+        return series.rate_on(day) if series is not None else None
+
+    def convert_on(self, amount: float, from_currency: str, to_currency: str, day: date) -> Optional[float]:
+        if from_currency.upper() == to_currency.upper():
+            return amount
+        from_rate = self.rate_on(from_currency, day)
+        to_rate = self.rate_on(to_currency, day)
+        if from_rate is None or to_rate is None:
+            return None
+        return amount * from_rate / to_rate
+
+    def _rates_on(self, currency: str, ordinals: np.ndarray, fallback: Optional[RatesSnapshot]) -> np.ndarray:
+        code = currency.upper()
+        if code == "PLN":
+            return np.ones(len(ordinals))
+        series = self.series.get(code)
+        rates = series.rates_on(ordinals) if series is not None else np.full(len(ordinals), np.nan)
+        if fallback is not None:
+            latest = fallback.rate(code)
+            if latest is not None:
+                rates = np.where(np.isnan(rates), latest, rates)
+        return rates
+
+    def convert_many(
+        self,
+        amounts: Sequence[Optional[float]],
+        days: Sequence[date],
+        from_currency: str,
+        to_currency: str,
+        fallback: Optional[RatesSnapshot] = None
+    ) -> List[Optional[float]]:
+        """
+        Przelicza wiele kwot, każdą po kursie z jej dnia - jeden przebieg wektorowy na walutę.
+        Dni sprzed historii dostają kurs z `fallback` (najnowszy), jeśli podano.
+        """
+        if from_currency.upper() == to_currency.upper():
+            return list(amounts)
+        ordinals = np.fromiter((day.toordinal() for day in days), dtype=np.intc, count=len(days))
+        factors = self._rates_on(from_currency, ordinals, fallback) / self._rates_on(to_currency, ordinals, fallback)
+        return _to_optional_list(_as_array(amounts) * factors)
+
+    def with_rates(self, rows: Iterable[Tuple[str, float, date]]) -> "RateHistory":
+        points: Dict[str, List[Tuple[date, float]]] = {}
+        for code, rate, rate_date in rows:
+            points.setdefault(code.upper(), []).append((rate_date, rate))
+        if not points:
+            return self
+        series = dict(self.series)
+        for code, code_points in points.items():
+            series[code] = series.get(code, RateSeries()).with_points(code_points)
+        return RateHistory(series=MappingProxyType(series), loaded_at=self.loaded_at)
+
+
+_history = RateHistory()
+
+
+def get_rate_history() -> RateHistory:
+    """Bieżąca historia kursów (bez dostępu do bazy)."""
+    return _history
+
+
+def _set_history(history: RateHistory) -> None:
+    global _history
+    _history = history
+
+
+async def load_rate_history(session: AsyncSession) -> RateHistory:
+    """Wczytuje wszystkie kursy jednym zapytaniem (posortowane po kodzie i dacie) i podmienia historię."""
+    stmt = select(CurrencyRate.code, CurrencyRate.date, CurrencyRate.rate).order_by(CurrencyRate.code, CurrencyRate.date)
+    points: Dict[str, List[Tuple[date, float]]] = {}
+    for code, rate_date, rate in (await session.exec(stmt)).all():
+        points.setdefault(code, []).append((rate_date, rate))
+    history = RateHistory(
+        series=MappingProxyType({code: RateSeries.from_points(code_points) for code, code_points in points.items()}),
+        loaded_at=time.time()
+    )
+    _set_history(history)
+    return history
+
+
+async def _current_history(session: AsyncSession) -> RateHistory:
+    history = _history
+    if time.time() - history.loaded_at > app_settings.currency_rates_refresh_seconds:
+        history = await load_rate_history(session)
+    return history
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Współdzielony klient HTTP z pulą połączeń (keep-alive do API NBP)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=app_settings.nbp_api_base_url,
+            timeout=app_settings.nbp_timeout_seconds,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            headers={"Accept": "application/json"}
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def _get_nbp_json(path: str) -> Optional[Any]:
+    """
+    GET do API NBP z ponawianiem błędów sieci, 429 i 5xx (wykładniczy odstęp).
+    404 oznacza brak notowań (np. święto) - zwraca pustą listę bez ponawiania; None to błąd.
+    """
+    client = _get_http_client()
+    attempts = max(1, app_settings.nbp_max_retries + 1)
+    error: Any = None
+    for attempt in range(attempts):
+        try:
+            response = await client.get(path, params={"format": "json"})
+        except httpx.TransportError as e:
+            error = e
+        else:
+            status = response.status_code
+            if status == 404:
+                return []
+            if status < 400:
+                try:
+                    return response.json()
+                except ValueError as e:
+                    logger.error(f"Error parsing NBP response for {path}: {e}")
+                    return None
+            if status != 429 and status < 500:
+                logger.error(f"NBP request {path} rejected with HTTP {status}")
+                return None
+            error = f"HTTP {status}"
+        if attempt < attempts - 1:
+            await asyncio.sleep(app_settings.nbp_retry_backoff_seconds * (2 ** attempt))
+    logger.error(f"Error fetching {path} from NBP after {attempts} attempts: {error}")
+    return None
+
+
+async def fetch_rates_table_from_nbp() -> Optional[Tuple[date, Dict[str, float]]]:
+    """Bieżąca tabela A - kursy wszystkich walut jednym zapytaniem."""
+    data = await _get_nbp_json("/tables/A/")
+    if not data:
         return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching currency rate for {code} from NBP: {e}")
+    try:
+        table = data[0]
+        rates = {item["code"].upper(): float(item["mid"]) for item in table["rates"] if item.get("mid")}
+        return date.fromisoformat(table["effectiveDate"]), rates
+    except (TypeError, KeyError, IndexError, ValueError) as e:
+        logger.error(f"Error parsing NBP table response: {e}")
         return None
-    except (KeyError, ValueError, TypeError) as e:
-        logger.error(f"Error parsing currency rate response for {code}: {e}")
+
+
+def _parse_tables(data: Any) -> List[Tuple[str, float, date]]:
+    """Tabele A z odpowiedzi NBP -> (kod, kurs, data) dla obsługiwanych walut."""
+    rows = []
+    for table in data or []:
+        rate_date = date.fromisoformat(table["effectiveDate"])
+        for item in table["rates"]:
+            code = item["code"].upper()
+            if code in SUPPORTED_CURRENCIES and item.get("mid"):
+                rows.append((code, float(item["mid"]), rate_date))
+    return rows
+
+
+async def fetch_rates_range_from_nbp(start: date, end: date) -> Optional[List[Tuple[str, float, date]]]:
+    """
+    Kursy tabel A z zakresu dat - zakres dzielony na odcinki po NBP_MAX_RANGE_DAYS dni,
+    każdy odcinek to jedno zapytanie o wszystkie waluty. Odcinki pobierane równolegle przez wspólny klient.
+    Zwraca None, gdy któregoś odcinka nie udało się pobrać.
+    """
+    chunks = []
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(end, chunk_start + timedelta(days=NBP_MAX_RANGE_DAYS - 1))
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+
+    failed = object()
+
+    async def _fetch(chunk: Tuple[date, date]) -> Any:
+        path = f"/tables/A/{chunk[0].isoformat()}/{chunk[1].isoformat()}/"
+        data = await _get_nbp_json(path)
+        if data is None:
+            return failed
+        try:
+            return _parse_tables(data)
+        except (TypeError, KeyError, ValueError) as e:
+            logger.error(f"Error parsing NBP tables {path}: {e}")
+            return failed
+
+    results = await asyncio.gather(*(_fetch(chunk) for chunk in chunks))
+    if any(result is failed for result in results):
         return None
+    return [row for result in results for row in result]
+
 
+async def backfill_currency_rates(session: AsyncSession, start: date, end: Optional[date] = None) -> int:
+    """Pobiera historię kursów z NBP i zapisuje ją jednym upsertem (idempotentne). Zwraca liczbę kursów."""
+    end = end or date.today()
+    if start > end:
+        return 0
+    rows = await fetch_rates_range_from_nbp(start, end)
+    if rows is None:
+        raise RuntimeError(f"Failed to fetch NBP rates for {start} - {end}")
+    await upsert_currency_rates(session, rows)
+    logger.info(f"Backfilled {len(rows)} currency rates from NBP for {start} - {end}")
+    return len(rows)
 
-def get_latest_rate(session: Session, code: str) -> Optional[CurrencyRate]:
+
+async def get_latest_rate(session: AsyncSession, code: str) -> Optional[CurrencyRate]:
     stmt = select(CurrencyRate).where(
         CurrencyRate.code == code.upper()
     ).order_by(CurrencyRate.date.desc())
-    return session.exec(stmt).first()
+    return (await session.exec(stmt)).first()
 
 
-def update_currency_rate(session: Session, code: str, rate: float, rate_date: date) -> CurrencyRate:
-    existing = session.exec(
+async def update_currency_rate(session: AsyncSession, code: str, rate: float, rate_date: date) -> CurrencyRate:
+    existing = (await session.exec(
         select(CurrencyRate).where(
             CurrencyRate.code == code.upper(),
             CurrencyRate.date == rate_date
         )
-    ).first()
+    )).first()
     
     if existing:
         existing.rate = rate
         session.add(existing)
-        session.commit()
-        session.refresh(existing)
+        await session.commit()
+        await session.refresh(existing)
+        _set_snapshot(_snapshot.with_rate(code, rate, rate_date))
+        _set_history(_history.with_rates([(code, rate, rate_date)]))
         return existing
     else:
         new_rate = CurrencyRate(code=code.upper(), rate=rate, date=rate_date)
         session.add(new_rate)
-        session.commit()
-        session.refresh(new_rate)
+        await session.commit()
+        await session.refresh(new_rate)
+        _set_snapshot(_snapshot.with_rate(code, rate, rate_date))
+        _set_history(_history.with_rates([(code, rate, rate_date)]))
         return new_rate
 
 
-def fetch_and_save_currency_rates(session: Session) -> dict:
+async def upsert_currency_rates(session: AsyncSession, rows: List[Tuple[str, float, date]]) -> None:
+    """Zapisuje wiele kursów jednym INSERT ... ON CONFLICT (code, date) DO UPDATE i podmienia snapshot."""
+    if not rows:
+        return
+    values = [{"code": code.upper(), "rate": rate, "date": rate_date} for code, rate, rate_date in rows]
+    insert = upsert_insert(session)
+    if insert is not None:
+        for start in range(0, len(values), UPSERT_BATCH_SIZE):
+            stmt = insert(CurrencyRate).values(values[start:start + UPSERT_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(index_elements=["code", "date"], set_={"rate": stmt.excluded.rate})
+            await session.exec(stmt)
+    else:
+        for value in values:
+            existing = (await session.exec(
+                select(CurrencyRate).where(CurrencyRate.code == value["code"], CurrencyRate.date == value["date"])
+            )).first()
+            if existing:
+                existing.rate = value["rate"]
+                session.add(existing)
+            else:
+                session.add(CurrencyRate(**value))
+    await session.commit()
+
+    snapshot = _snapshot
+    for value in values:
+        snapshot = snapshot.with_rate(value["code"], value["rate"], value["date"])
+    _set_snapshot(snapshot)
+    _set_history(_history.with_rates((value["code"], value["rate"], value["date"]) for value in values))
+
+
+async def fetch_and_save_currency_rates(session: AsyncSession) -> dict:
+    table = await fetch_rates_table_from_nbp()
+    if table is None:
+        logger.warning("Failed to fetch currency rates table from NBP")
+        return {
+            code: {"success": False, "error": f"Failed to fetch rate for {code}"}
+            for code in SUPPORTED_CURRENCIES
+        }
+
+    effective_date, rates = table
+    rows = [(code, rates[code], effective_date) for code in SUPPORTED_CURRENCIES if code in rates]
+    await upsert_currency_rates(session, rows)
+
     results = {}
-    today = date.today()
-    
     for code in SUPPORTED_CURRENCIES:
-        rate_value = fetch_currency_rate_from_nbp(code)
-        if rate_value:
-            currency_rate = update_currency_rate(session, code, rate_value, today)
+        if code in rates:
             results[code] = {
-                "rate": currency_rate.rate,
-                "date": currency_rate.date.isoformat(),
+                "rate": rates[code],
+                "date": effective_date.isoformat(),
                 "success": True
             }
-            logger.info(f"Updated currency rate for {code}: {rate_value} on {today}")
         else:
             results[code] = {
                 "success": False,
                 "error": f"Failed to fetch rate for {code}"
             }
-            logger.warning(f"Failed to fetch currency rate for {code}")
-    
+            logger.warning(f"Currency {code} missing from NBP table {effective_date}")
+    logger.info(f"Updated {len(rows)} currency rates from NBP table {effective_date}")
     return results
 
 
-def convert_currency(session: Session, amount: float, from_currency: str, to_currency: str) -> Optional[float]:
+async def convert_currency(session: AsyncSession, amount: float, from_currency: str, to_currency: str) -> Optional[float]:
     if from_currency == to_currency:
         return amount
-    
-    if from_currency == "pln":
-        rate = get_latest_rate(session, to_currency.upper())
-        if rate:
-            return amount / rate.rate
-        return None
-    
-    if to_currency == "pln":
-        rate = get_latest_rate(session, from_currency.upper())
-        if rate:
-            return amount * rate.rate
-        return None
-    
-    from_rate = get_latest_rate(session, from_currency.upper())
-    to_rate = get_latest_rate(session, to_currency.upper())
-    
-    if from_rate and to_rate:
-        amount_in_pln = amount * from_rate.rate
-        return amount_in_pln / to_rate.rate
-    
-    return None
+    snapshot = await _current_snapshot(session)
+    return snapshot.convert(amount, from_currency, to_currency)
 
 
-def get_currency_rate(session: Session, currency: str) -> Optional[float]:
+async def get_currency_rate(session: AsyncSession, currency: str) -> Optional[float]:
     if currency.lower() == "pln":
         return 1.0
-    
-    rate = get_latest_rate(session, currency.upper())
-    if rate:
-        return rate.rate
-    
-    return None
+    snapshot = await _current_snapshot(session)
+    return snapshot.rate(currency)
+
+
+async def convert_currency_on(
+    session: AsyncSession, amount: float, from_currency: str, to_currency: str, on_date: date
+) -> Optional[float]:
+    """
+    Przelicza po kursie z danego dnia (ostatnie notowanie do tej daty), a dla dnia sprzed historii -
+    po najnowszym kursie; ta sama ścieżka co `convert_batch`.
+    """
+    if from_currency == to_currency:
+        return amount
+    snapshot = await _current_snapshot(session)
+    history = await _current_history(session)
+    return _convert_many(snapshot, history, [amount], [on_date], from_currency, to_currency)[0]
 
+
+async def get_currency_rate_on(session: AsyncSession, currency: str, on_date: date) -> Optional[float]:
+    """Kurs z danego dnia; dzień sprzed historii - najnowszy kurs (jak przy przeliczaniu)."""
+    if currency.lower() == "pln":
+        return 1.0
+    history = await _current_history(session)
+    rate = history.rate_on(currency, on_date)
+    if rate is None:
+        rate = (await _current_snapshot(session)).rate(currency)
+    return rate
+
+
+def _convert_many(
+    snapshot: RatesSnapshot,
+    history: Optional[RateHistory],
+    amounts: Sequence[Optional[float]],
+    days: Optional[Sequence[date]],
+    from_currency: str,
+    to_currency: str
+) -> List[Optional[float]]:
+    """
+    Wspólne przeliczenie wielu kwot: z `days` - po kursie z dnia każdej kwoty, a dni sprzed historii
+    po najnowszym kursie ze snapshotu; bez `days` - po najnowszym kursie. None, gdy kursu brak w obu.
+    """
+    if days is None:
+        return snapshot.convert_many(amounts, from_currency, to_currency)
+    return history.convert_many(amounts, days, from_currency, to_currency, fallback=snapshot)
+
+
+async def convert_pln_amounts(
+    session: AsyncSession,
+    amounts: Sequence[Optional[float]],
+    to_currency: str,
+    days: Optional[Sequence[date]] = None
+) -> List[Optional[float]]:
+    """
+    Przelicza listę kwot w PLN na walutę użytkownika jednym przebiegiem wektorowym.
+    Z `days` - po kursie z dnia każdej kwoty (brak historii: najnowszy kurs); bez - po najnowszym kursie.
+    Wynik zaokrąglony do groszy; None, gdy kursu brak.
+    """
+    if not amounts:
+        return []
+    if to_currency.upper() == "PLN":
+        return list(amounts)
+    snapshot = await _current_snapshot(session)
+    history = await _current_history(session) if days is not None else None
+    converted = _convert_many(snapshot, history, amounts, days, "PLN", to_currency)
+    return [round(value, 2) if value is not None else None for value in converted]
+
+
+async def convert_batch(
+    session: AsyncSession, items: Sequence[Tuple[float, str, str, Optional[date]]]
+) -> List[Optional[float]]:
+    """
+    Przelicza listę (kwota, z waluty, na walutę, dzień lub None) na jednym snapshocie i jednej historii kursów.
+    Pozycje są grupowane po parze walut - każda grupa to jeden przebieg wektorowy. Dzień sprzed historii
+    kursów - najnowszy kurs, jak w `convert_pln_amounts`; None, gdy kursu brak.
+    """
+    if not items:
+        return []
+    snapshot = await _current_snapshot(session)
+    history = await _current_history(session) if any(item[3] is not None for item in items) else None
+
+    groups: Dict[Tuple[str, str, bool], List[int]] = {}
+    for index, (_, from_currency, to_currency, on_date) in enumerate(items):
+        groups.setdefault((from_currency.upper(), to_currency.upper(), on_date is not None), []).append(index)
+
+    results: List[Optional[float]] = [None] * len(items)
+    for (from_currency, to_currency, dated), indexes in groups.items():
+        amounts = [items[index][0] for index in indexes]
+        days = [items[index][3] for index in indexes] if dated else None
+        converted = _convert_many(snapshot, history, amounts, days, from_currency, to_currency)
+        for index, value in zip(indexes, converted):
+            results[index] = value
+    return results
@@ -0,0 +1,29 @@
+from typing import Any, Callable, Optional
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+def upsert_insert(session: AsyncSession) -> Optional[Callable[..., Any]]:
+    """
+    `insert` z obsługą ON CONFLICT dla dialektu sesji (PostgreSQL, SQLite).
+    None dla innych baz - wywołujący zapisuje wtedy wiersz po wierszu.
+    """
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+async def try_advisory_xact_lock(session: AsyncSession, key: int) -> bool:
+    """
+    Blokada doradcza PostgreSQL do końca bieżącej transakcji, bez czekania - False, gdy trzyma ją inny proces.
+    Inne bazy (SQLite - jeden proces aplikacji) zawsze True.
+    """
+    if session.bind.dialect.name != "postgresql":
+        return True
+    result = await session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key})
+    return bool(result.scalar())
@@ -24,3 +24,8 @@ class BadRequestError(HTTPException):
 
 
 
+
+
+class UnauthorizedError(HTTPException):
+    def __init__(self, detail: str = "Unauthorized"):
+        super().__init__(status_code=401, detail=detail)
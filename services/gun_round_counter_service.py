@@ -0,0 +1,350 @@
+from sqlmodel import Session, select, delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import date
+from sqlalchemy import func, case, or_, true
+import logging
+from models import Gun, Maintenance, ShootingSession, GunRoundCounter, GunDailyRounds
+from services.dialect import upsert_insert
+
+logger = logging.getLogger(__name__)
+
+
+class GunRoundCounterService:
+    @staticmethod
+    def _cumulative_query(gun_id: str, day: Optional[date] = None, inclusive: bool = True):
+        """Suma narastająca strzałów broni do dnia `day` (bez dnia - do ostatniego dnia ze strzałami)."""
+        query = select(GunDailyRounds.cumulative_shots).where(GunDailyRounds.gun_id == gun_id)
+        if day is not None:
+            query = query.where(GunDailyRounds.day <= day if inclusive else GunDailyRounds.day < day)
+        return query.order_by(GunDailyRounds.day.desc()).limit(1)
+
+    @staticmethod
+    async def _cumulative_at(session: AsyncSession, gun_id: str, day: Optional[date] = None, inclusive: bool = True) -> int:
+        value = (await session.exec(GunRoundCounterService._cumulative_query(gun_id, day, inclusive))).first()
+        return int(value or 0)
+
+    @staticmethod
+    async def _apply_daily_delta(session: AsyncSession, user_id: str, gun_id: str, day: date, shots: int) -> None:
+        """
+        Zmienia strzały dnia i przesuwa sumy narastające kolejnych dni. Nie robi commit.
+        Każda zmiana to `kolumna = kolumna + delta` w bazie, więc równoległe zapisy nie gubią strzałów.
+        """
+        if shots == 0:
+            return
+        result = await session.exec(
+            update(GunDailyRounds)
+            .where(GunDailyRounds.gun_id == gun_id, GunDailyRounds.day == day)
+            .values(
+                shots=GunDailyRounds.shots + shots,
+                cumulative_shots=GunDailyRounds.cumulative_shots + shots
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            if shots < 0:
+                logger.warning(f"[ROUNDS] Brak dnia {day} broni {gun_id} przy odejmowaniu strzałów")
+                return
+            previous = await GunRoundCounterService._cumulative_at(session, gun_id, day, inclusive=False)
+            values = dict(gun_id=gun_id, day=day, user_id=user_id, shots=shots, cumulative_shots=previous + shots)
+            insert = upsert_insert(session)
+            if insert is None:
+                session.add(GunDailyRounds(**values))
+            else:
+                stmt = insert(GunDailyRounds).values(**values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["gun_id", "day"],
+                    set_={
+                        "shots": GunDailyRounds.shots + stmt.excluded.shots,
+                        "cumulative_shots": GunDailyRounds.cumulative_shots + stmt.excluded.shots,
+                    }
+                )
+                await session.exec(stmt)
+        elif shots < 0:
+            await session.exec(
+                delete(GunDailyRounds)
+                .where(GunDailyRounds.gun_id == gun_id, GunDailyRounds.day == day, GunDailyRounds.shots <= 0)
+                .execution_options(synchronize_session=False)
+            )
+        await session.exec(
+            update(GunDailyRounds)
+            .where(GunDailyRounds.gun_id == gun_id, GunDailyRounds.day > day)
+            .values(cumulative_shots=GunDailyRounds.cumulative_shots + shots)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def rounds_between(session: AsyncSession, gun_id: str, after: Optional[date] = None, until: Optional[date] = None) -> int:
+        """
+        Strzały broni z sesji w dniach (after, until] - dwa odczyty sumy narastającej po indeksie.
+        Brak wierszy dziennych oznacza brak strzałów; pusty przedział (after >= until) - 0.
+        """
+        if after is not None and until is not None and after >= until:
+            return 0
+        end = await GunRoundCounterService._cumulative_at(session, gun_id, until)
+        start = await GunRoundCounterService._cumulative_at(session, gun_id, after) if after is not None else 0
+        return end - start
+
+    @staticmethod
+    def _since_maintenance(day: date, shots):
+        """Sesje z dnia konserwacji i wcześniejsze nie liczą się do strzałów od konserwacji."""
+        return case(
+            (
+                or_(GunRoundCounter.last_maintenance_date.is_(None), GunRoundCounter.last_maintenance_date < day),
+                GunRoundCounter.rounds_since_maintenance + shots
+            ),
+            else_=GunRoundCounter.rounds_since_maintenance
+        )
+
+    @staticmethod
+    async def _last_maintenance_date(session: AsyncSession, gun_id: str) -> Optional[date]:
+        return (await session.exec(select(func.max(Maintenance.date)).where(Maintenance.gun_id == gun_id))).one()
+
+    @staticmethod
+    async def _insert_counter(session: AsyncSession, user_id: str, gun_id: str, day: date, shots: int) -> None:
+        """Tworzy brakujący licznik (ON CONFLICT dolicza strzały, gdy równoległy zapis utworzył go pierwszy)."""
+        last_date = await GunRoundCounterService._last_maintenance_date(session, gun_id)
+        values = dict(
+            gun_id=gun_id,
+            user_id=user_id,
+            lifetime_rounds=shots,
+            rounds_since_maintenance=shots if last_date is None or day > last_date else 0,
+            last_maintenance_date=last_date
+        )
+        insert = upsert_insert(session)
+        if insert is None:
+            session.add(GunRoundCounter(**values))
+            return
+        stmt = insert(GunRoundCounter).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["gun_id"],
+            set_={
+                "lifetime_rounds": GunRoundCounter.lifetime_rounds + stmt.excluded.lifetime_rounds,
+                "rounds_since_maintenance": GunRoundCounterService._since_maintenance(day, stmt.excluded.lifetime_rounds),
+            }
+        )
+        await session.exec(stmt)
+
+    @staticmethod
+    async def apply_delta(session: AsyncSession, snapshot: Dict[str, Any], sign: int) -> None:
+        """
+        Dodaje (sign=1) lub odejmuje (sign=-1) strzały sesji od liczników broni jednym UPDATE. Nie robi commit.
+        Brak licznika przy dodawaniu - wiersz jest tworzony.
+        """
+        shots = sign * (snapshot["shots"] or 0)
+        if shots == 0:
+            return
+        gun_id, day = snapshot["gun_id"], snapshot["date"]
+        result = await session.exec(
+            update(GunRoundCounter)
+            .where(GunRoundCounter.gun_id == gun_id)
+            .values(
+                lifetime_rounds=GunRoundCounter.lifetime_rounds + shots,
+                rounds_since_maintenance=GunRoundCounterService._since_maintenance(day, shots)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            if sign < 0:
+                logger.warning(f"[ROUNDS] Brak licznika broni {gun_id} przy odejmowaniu strzałów")
+            else:
+                await GunRoundCounterService._insert_counter(session, snapshot["user_id"], gun_id, day, shots)
+        await GunRoundCounterService._apply_daily_delta(session, snapshot["user_id"], gun_id, day, shots)
+
+    @staticmethod
+    async def replace(session: AsyncSession, old_snapshot: Dict[str, Any], new_snapshot: Dict[str, Any]) -> None:
+        keys = ("gun_id", "date", "shots")
+        if all(old_snapshot[key] == new_snapshot[key] for key in keys):
+            return
+        await GunRoundCounterService.apply_delta(session, old_snapshot, -1)
+        await session.flush()
+        await GunRoundCounterService.apply_delta(session, new_snapshot, 1)
+
+    @staticmethod
+    def _rounds_after(gun_id: str, last_date: date):
+        """Strzały po dniu `last_date`: łącznie minus suma narastająca do tego dnia (podzapytanie)."""
+        cumulative = GunRoundCounterService._cumulative_query(gun_id, last_date).scalar_subquery()
+        return GunRoundCounter.lifetime_rounds - func.coalesce(cumulative, 0)
+
+    @staticmethod
+    async def reset_after_maintenance(session: AsyncSession, gun_id: str, maintenance_date: date) -> None:
+        """
+        Zeruje licznik od konserwacji po dodaniu nowej - jeden UPDATE. Nie robi commit.
+        Konserwacja wpisana z datą wsteczną przelicza tylko sesje po tej dacie; starsza niż ostatnia nic nie zmienia.
+        """
+        await session.exec(
+            update(GunRoundCounter)
+            .where(
+                GunRoundCounter.gun_id == gun_id,
+                or_(
+                    GunRoundCounter.last_maintenance_date.is_(None),
+                    GunRoundCounter.last_maintenance_date <= maintenance_date
+                )
+            )
+            .values(
+                last_maintenance_date=maintenance_date,
+                rounds_since_maintenance=GunRoundCounterService._rounds_after(gun_id, maintenance_date)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def refresh_maintenance_baseline(session: AsyncSession, gun_id: str) -> None:
+        """Ustala ostatnią konserwację na nowo po edycji lub usunięciu wpisu. Nie robi commit."""
+        last_date = await GunRoundCounterService._last_maintenance_date(session, gun_id)
+        since = GunRoundCounter.lifetime_rounds if last_date is None else GunRoundCounterService._rounds_after(gun_id, last_date)
+        await session.exec(
+            update(GunRoundCounter)
+            .where(GunRoundCounter.gun_id == gun_id)
+            .values(last_maintenance_date=last_date, rounds_since_maintenance=since)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def remove_sessions(session: AsyncSession, ammo_id: str) -> None:
+        """
+        Odejmuje od liczników broni sesje usuwanej amunicji (znikną kaskadowo).
+        Wywołać przed usunięciem sesji. Nie robi commit.
+        """
+        rows = (await session.exec(
+            select(ShootingSession.user_id, ShootingSession.gun_id, ShootingSession.date, func.sum(ShootingSession.shots))
+            .where(ShootingSession.ammo_id == ammo_id)
+            .group_by(ShootingSession.user_id, ShootingSession.gun_id, ShootingSession.date)
+        )).all()
+        for user_id, gun_id, day, shots in rows:
+            await GunRoundCounterService.apply_delta(
+                session, {"user_id": user_id, "gun_id": gun_id, "date": day, "shots": shots}, -1
+            )
+
+    @staticmethod
+    def _delete_statement(model, user_id: Optional[str] = None, gun_id: Optional[str] = None):
+        stmt = delete(model)
+        if user_id:
+            stmt = stmt.where(model.user_id == user_id)
+        if gun_id:
+            stmt = stmt.where(model.gun_id == gun_id)
+        return stmt
+
+    @staticmethod
+    async def delete_for(session: AsyncSession, user_id: Optional[str] = None, gun_id: Optional[str] = None) -> None:
+        """Usuwa liczniki i sumy dzienne po usunięciu broni lub konta (sesje znikają kaskadowo)."""
+        for model in (GunDailyRounds, GunRoundCounter):
+            await session.exec(GunRoundCounterService._delete_statement(model, user_id, gun_id))
+
+    @staticmethod
+    def _daily_series(daily_shots: List[Tuple[date, int]]) -> List[Tuple[date, int, int]]:
+        """(dzień, strzały) posortowane po dniu -> (dzień, strzały, suma narastająca)."""
+        series = []
+        cumulative = 0
+        for day, shots in daily_shots:
+            cumulative += int(shots or 0)
+            series.append((day, int(shots or 0), cumulative))
+        return series
+
+    @staticmethod
+    def _since(series: List[Tuple[date, int, int]], last_date: Optional[date]) -> int:
+        lifetime = series[-1][2] if series else 0
+        if last_date is None:
+            return lifetime
+        before = [cumulative for day, _, cumulative in series if day <= last_date]
+        return lifetime - (before[-1] if before else 0)
+
+    @staticmethod
+    def reconcile(session: Session, user_id: Optional[str] = None) -> int:
+        """
+        Porównuje liczniki i sumy dzienne z sesjami i konserwacjami (zgrupowane agregaty) i poprawia rozbieżności.
+        Zwraca liczbę broni, których dane poprawiono - migracje i skrypty.
+        """
+        guns_query = select(Gun.id, Gun.user_id)
+        if user_id:
+            guns_query = guns_query.where(Gun.user_id == user_id)
+        guns = session.exec(guns_query).all()
+
+        daily_query = (
+            select(ShootingSession.gun_id, ShootingSession.date, func.sum(ShootingSession.shots))
+            .group_by(ShootingSession.gun_id, ShootingSession.date)
+            .order_by(ShootingSession.gun_id, ShootingSession.date)
+        )
+        last_query = select(Maintenance.gun_id, func.max(Maintenance.date)).group_by(Maintenance.gun_id)
+        counters_query = select(GunRoundCounter)
+        stored_daily_query = select(GunDailyRounds).order_by(GunDailyRounds.gun_id, GunDailyRounds.day)
+        if user_id:
+            daily_query = daily_query.where(ShootingSession.user_id == user_id)
+            last_query = last_query.where(Maintenance.user_id == user_id)
+            counters_query = counters_query.where(GunRoundCounter.user_id == user_id)
+            stored_daily_query = stored_daily_query.where(GunDailyRounds.user_id == user_id)
+
+        daily_by_gun: Dict[str, List[Tuple[date, int]]] = {}
+        for gun_id, day, shots in session.exec(daily_query).all():
+            daily_by_gun.setdefault(gun_id, []).append((day, shots))
+        last_dates = dict(session.exec(last_query).all())
+        counters = {row.gun_id: row for row in session.exec(counters_query).all()}
+        stored_daily: Dict[str, List[Tuple[date, int, int]]] = {}
+        for row in session.exec(stored_daily_query).all():
+            stored_daily.setdefault(row.gun_id, []).append((row.day, row.shots, row.cumulative_shots))
+
+        corrected = 0
+        for gun_id, gun_user_id in guns:
+            series = GunRoundCounterService._daily_series(daily_by_gun.get(gun_id, []))
+            last_date = last_dates.get(gun_id)
+            expected = (series[-1][2] if series else 0, GunRoundCounterService._since(series, last_date), last_date)
+            row = counters.pop(gun_id, None)
+            counter_ok = row is not None and (
+                row.lifetime_rounds, row.rounds_since_maintenance, row.last_maintenance_date
+            ) == expected
+            daily_ok = stored_daily.pop(gun_id, []) == series
+            if counter_ok and daily_ok:
+                continue
+            if row:
+                logger.warning(
+                    f"[ROUNDS] Rozbieżność liczników broni {gun_id}: "
+                    f"{row.lifetime_rounds}/{row.rounds_since_maintenance} zamiast {expected[0]}/{expected[1]}"
+                )
+            else:
+                row = GunRoundCounter(gun_id=gun_id, user_id=gun_user_id)
+            row.lifetime_rounds, row.rounds_since_maintenance, row.last_maintenance_date = expected
+            session.add(row)
+            if not daily_ok:
+                session.exec(GunRoundCounterService._delete_statement(GunDailyRounds, gun_id=gun_id))
+                for day, shots, cumulative in series:
+                    session.add(GunDailyRounds(
+                        gun_id=gun_id, day=day, user_id=gun_user_id, shots=shots, cumulative_shots=cumulative
+                    ))
+            corrected += 1
+        # Dane usuniętych broni
+        for orphan in counters.values():
+            session.delete(orphan)
+            corrected += 1
+        for orphan_gun_id in stored_daily:
+            session.exec(GunRoundCounterService._delete_statement(GunDailyRounds, gun_id=orphan_gun_id))
+        session.commit()
+        logger.info(f"[ROUNDS] Uzgodniono liczniki strzałów {len(guns)} broni, poprawiono {corrected}")
+        return corrected
+
+    @staticmethod
+    async def get_counter(session: AsyncSession, gun_id: str) -> Optional[GunRoundCounter]:
+        """
+        Liczniki broni. Bez zapisanego wiersza liczone z sesji i konserwacji bez zapisu -
+        odczyt niczego nie utrwala i nie robi commit.
+        """
+        row = await session.get(GunRoundCounter, gun_id, populate_existing=True)
+        if row:
+            return row
+        gun = await session.get(Gun, gun_id)
+        if not gun:
+            return None
+        last_date = await GunRoundCounterService._last_maintenance_date(session, gun_id)
+        since_filter = ShootingSession.date > last_date if last_date is not None else true()
+        lifetime, since = (await session.exec(
+            select(
+                func.coalesce(func.sum(ShootingSession.shots), 0),
+                func.coalesce(func.sum(case((since_filter, ShootingSession.shots), else_=0)), 0)
+            ).where(ShootingSession.gun_id == gun_id)
+        )).one()
+        return GunRoundCounter(
+            gun_id=gun_id,
+            user_id=gun.user_id,
+            lifetime_rounds=int(lifetime),
+            rounds_since_maintenance=int(since),
+            last_maintenance_date=last_date
+        )
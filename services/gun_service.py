@@ -1,13 +1,21 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
-from sqlalchemy import or_, func
-from models import Gun, GunUpdate
+from models import Gun, GunUpdate, GunRoundCounter
 from schemas.gun import GunCreate
 from services.user_context import UserContext, UserRole
 from services.exceptions import NotFoundError, BadRequestError
+from services.pagination import paginate
+from services.search_service import search_condition
+from services.session_summary_service import SessionSummaryService
+from services.accuracy_histogram_service import AccuracyHistogramService
+from services.gun_round_counter_service import GunRoundCounterService
+from services.maintenance_due_service import MaintenanceDueService
 
 
 class GunService:
+    LIST_ORDER = ((Gun.name, False), (Gun.id, False))
+
     @staticmethod
     def _query_for_user(user: UserContext):
         query = select(Gun)
@@ -20,40 +28,47 @@ class GunService:
     def _apply_search(query, search: Optional[str]):
         if not search:
             return query
-        pattern = f"%{search.lower()}%"
-        return query.where(
-            or_(
-                func.lower(Gun.name).like(pattern),
-                func.lower(func.coalesce(Gun.caliber, "")).like(pattern),
-                func.lower(func.coalesce(Gun.type, "")).like(pattern),
-                func.lower(func.coalesce(Gun.notes, "")).like(pattern),
-            )
-        )
+        condition = search_condition(Gun.search_text, search)
+        if condition is None:
+            return query
+        return query.where(condition)
 
     @staticmethod
-    def _get_single_gun(session: Session, gun_id: str, user: UserContext) -> Gun:
+    async def _get_single_gun(session: AsyncSession, gun_id: str, user: UserContext) -> Gun:
         query = GunService._query_for_user(user).where(Gun.id == gun_id)
-        gun = session.exec(query).first()
+        gun = (await session.exec(query)).first()
         if not gun:
             raise NotFoundError("Broń nie została znaleziona")
         return gun
 
     @staticmethod
-    def get_all_guns(session: Session, user: UserContext, limit: int, offset: int, search: Optional[str]) -> dict:
+    async def get_all_guns(
+        session: AsyncSession,
+        user: UserContext,
+        limit: int,
+        offset: int,
+        search: Optional[str],
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> dict:
         base_query = GunService._query_for_user(user)
         filtered_query = GunService._apply_search(base_query, search)
-        count_query = filtered_query.with_only_columns(func.count(Gun.id)).order_by(None)
-
-        total = session.exec(count_query).one()
-        items = session.exec(filtered_query.offset(offset).limit(limit)).all()
-        return {"total": total, "items": items}
+        return await paginate(
+            session,
+            filtered_query,
+            GunService.LIST_ORDER,
+            limit,
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total
+        )
 
     @staticmethod
-    def get_gun_by_id(session: Session, gun_id: str, user: UserContext) -> Gun:
-        return GunService._get_single_gun(session, gun_id, user)
+    async def get_gun_by_id(session: AsyncSession, gun_id: str, user: UserContext) -> Gun:
+        return await GunService._get_single_gun(session, gun_id, user)
 
     @staticmethod
-    def create_gun(session: Session, gun_data: GunCreate, user: UserContext) -> Gun:
+    async def create_gun(session: AsyncSession, gun_data: GunCreate, user: UserContext) -> Gun:
         from datetime import date
         from services.exceptions import BadRequestError
         payload = gun_data.model_dump(exclude_unset=True)
@@ -70,24 +85,26 @@ class GunService:
                 raise BadRequestError("Data utworzenia broni nie może być w przyszłości")
         gun = Gun(**payload, user_id=user.user_id)
         session.add(gun)
-        session.commit()
-        session.refresh(gun)
+        # Nowa broń nie ma sesji ani konserwacji - liczniki startują od zera
+        session.add(GunRoundCounter(gun_id=gun.id, user_id=gun.user_id))
+        await session.commit()
+        await session.refresh(gun)
         return gun
 
     @staticmethod
-    def update_gun(session: Session, gun_id: str, gun_data: GunUpdate, user: UserContext) -> Gun:
-        gun = GunService._get_single_gun(session, gun_id, user)
+    async def update_gun(session: AsyncSession, gun_id: str, gun_data: GunUpdate, user: UserContext) -> Gun:
+        gun = await GunService._get_single_gun(session, gun_id, user)
         gun_dict = gun_data.model_dump(exclude_unset=True)
         for key, value in gun_dict.items():
             setattr(gun, key, value)
         session.add(gun)
-        session.commit()
-        session.refresh(gun)
+        await session.commit()
+        await session.refresh(gun)
         return gun
 
     @staticmethod
-    async def delete_gun(session: Session, gun_id: str, user: UserContext) -> dict:
-        gun = GunService._get_single_gun(session, gun_id, user)
+    async def delete_gun(session: AsyncSession, gun_id: str, user: UserContext) -> dict:
+        gun = await GunService._get_single_gun(session, gun_id, user)
         
         # Usuń zdjęcie broni z Supabase jeśli istnieje
         if gun.image_path:
@@ -102,11 +119,15 @@ class GunService:
                 logger.warning(f"Nie udało się usunąć zdjęcia broni z Supabase: {str(e)}")
         
         try:
-            session.delete(gun)
-            session.commit()
+            await SessionSummaryService.delete_for(session, user_id=gun.user_id, gun_id=gun.id)
+            await AccuracyHistogramService.remove_sessions(session, gun.user_id, gun_id=gun.id)
+            await GunRoundCounterService.delete_for(session, gun_id=gun.id)
+            await MaintenanceDueService.clear(session, gun_id=gun.id)
+            await session.delete(gun)
+            await session.commit()
             return {"message": f"Broń o ID {gun_id} została usunięta"}
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             error_msg = str(e).lower()
             if "foreign key" in error_msg or "integrity" in error_msg:
                 raise BadRequestError(
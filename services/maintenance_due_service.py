@@ -0,0 +1,110 @@
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, List
+from datetime import date, datetime
+from sqlalchemy import or_
+import asyncio
+import logging
+from models import Gun, UserSettings, MaintenanceDue
+from services.user_context import UserContext, UserRole
+from services.user_settings_service import DEFAULT_SETTINGS
+from services.dialect import try_advisory_xact_lock
+
+logger = logging.getLogger(__name__)
+
+# Klucz blokady doradczej przebiegu w tle - przelicza tylko jeden worker naraz
+EVALUATION_LOCK_KEY = 4_318_001
+
+
+class MaintenanceDueService:
+    @staticmethod
+    def _evaluation_query(user_id: Optional[str] = None):
+        # Import w funkcji - maintenance_service sam czyści tę tabelę przy dodaniu konserwacji
+        from services.maintenance_service import MaintenanceService
+        return (
+            MaintenanceService._gun_status_query(user_id)
+            .add_columns(Gun.user_id, UserSettings.maintenance_rounds_limit, UserSettings.maintenance_days_limit)
+            .outerjoin(UserSettings, UserSettings.user_id == Gun.user_id)
+            .where(or_(
+                UserSettings.maintenance_notifications_enabled.is_(None),
+                UserSettings.maintenance_notifications_enabled.is_(True)
+            ))
+        )
+
+    @staticmethod
+    async def evaluate(session: AsyncSession, user_id: Optional[str] = None) -> int:
+        """
+        Przelicza tabelę maintenance_due: jedno zapytanie o stan wszystkich broni z limitami z ustawień
+        i podmiana wierszy w jednej transakcji. Pomija użytkowników z wyłączonymi powiadomieniami.
+        """
+        from services.maintenance_service import MaintenanceService
+
+        rows = (await session.exec(MaintenanceDueService._evaluation_query(user_id))).all()
+        today = date.today()
+        now = datetime.utcnow()
+        due = []
+        for gun_id, gun_name, created_at, last_date, first_date, rounds_since, owner_id, rounds_limit, days_limit in rows:
+            rounds_limit = rounds_limit or DEFAULT_SETTINGS["maintenance_rounds_limit"]
+            days_limit = days_limit or DEFAULT_SETTINGS["maintenance_days_limit"]
+            days_since = MaintenanceService._days_since(today, last_date, first_date, created_at)
+            rounds_exceeded = rounds_since >= rounds_limit
+            days_exceeded = days_since >= days_limit
+            if not (rounds_exceeded or days_exceeded):
+                continue
+            due.append(MaintenanceDue(
+                gun_id=gun_id,
+                user_id=owner_id,
+                gun_name=gun_name,
+                rounds_since_last=rounds_since,
+                rounds_limit=rounds_limit,
+                days_since_last=days_since,
+                days_limit=days_limit,
+                rounds_exceeded=rounds_exceeded,
+                days_exceeded=days_exceeded,
+                evaluated_at=now
+            ))
+
+        await MaintenanceDueService.clear(session, user_id=user_id)
+        session.add_all(due)
+        await session.commit()
+        logger.info(f"[MAINTENANCE] Przeliczono stan konserwacji {len(rows)} broni, do konserwacji: {len(due)}")
+        return len(due)
+
+    @staticmethod
+    async def clear(session: AsyncSession, user_id: Optional[str] = None, gun_id: Optional[str] = None) -> None:
+        """Usuwa wpisy (np. po dodaniu konserwacji lub usunięciu broni). Nie robi commit."""
+        stmt = delete(MaintenanceDue)
+        if user_id:
+            stmt = stmt.where(MaintenanceDue.user_id == user_id)
+        if gun_id:
+            stmt = stmt.where(MaintenanceDue.gun_id == gun_id)
+        await session.exec(stmt)
+
+    @staticmethod
+    async def list_due(session: AsyncSession, user: UserContext) -> List[MaintenanceDue]:
+        query = select(MaintenanceDue)
+        if user.role != UserRole.admin:
+            query = query.where(MaintenanceDue.user_id == user.user_id)
+        query = query.order_by(MaintenanceDue.gun_name, MaintenanceDue.gun_id)
+        return list((await session.exec(query)).all())
+
+    @staticmethod
+    async def run_periodically(interval_seconds: int) -> None:
+        """
+        Pętla zadania w tle uruchamiana przy starcie aplikacji; błędy jednego przebiegu nie przerywają pętli.
+        Uruchamia się w każdym workerze uvicorn, ale przebieg wykonuje tylko ten, który zdobędzie blokadę
+        doradczą - pozostałe pomijają go do następnego cyklu.
+        """
+        from database import async_session_maker
+        while True:
+            try:
+                async with async_session_maker() as session:
+                    if await try_advisory_xact_lock(session, EVALUATION_LOCK_KEY):
+                        await MaintenanceDueService.evaluate(session)
+                    else:
+                        logger.debug("[MAINTENANCE] Przeliczanie trwa w innym procesie - pomijam przebieg")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Błąd podczas przeliczania stanu konserwacji: {e}", exc_info=True)
+            await asyncio.sleep(interval_seconds)
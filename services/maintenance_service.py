@@ -1,119 +1,151 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import date, datetime
-from sqlalchemy import or_, func, desc
-from models import Maintenance, Gun, ShootingSession
+from sqlalchemy import and_, or_, func, desc
+from models import Maintenance, Gun, ShootingSession, GunRoundCounter
 from services.user_context import UserContext, UserRole
 from services.gun_service import GunService
 from services.exceptions import NotFoundError, BadRequestError
+from services.pagination import paginate, apply_keyset
+from services.gun_round_counter_service import GunRoundCounterService
+from services.user_settings_service import UserSettingsService
+from services.maintenance_due_service import MaintenanceDueService
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class MaintenanceService:
+    LIST_ORDER = ((Maintenance.date, True), (Maintenance.id, True))
+
     @staticmethod
-    def _query_for_user(user: UserContext, gun_id: Optional[str] = None):
-        query = select(Maintenance)
+    def _user_filters(user: UserContext, gun_id: Optional[str] = None) -> list:
+        filters = []
         if gun_id:
-            query = query.where(Maintenance.gun_id == gun_id)
-        if user.role == UserRole.admin:
-            return query
-        query = query.where(Maintenance.user_id == user.user_id)
-        return query
+            filters.append(Maintenance.gun_id == gun_id)
+        if user.role != UserRole.admin:
+            filters.append(Maintenance.user_id == user.user_id)
+        return filters
 
     @staticmethod
-    def _calculate_rounds_since_last(session: Session, user: UserContext, gun_id: str, last_maintenance_date: date, until_date: Optional[date] = None) -> int:
-        try:
-            query_sessions = select(ShootingSession).where(
-                ShootingSession.gun_id == gun_id,
-                ShootingSession.user_id == user.user_id,
-                ShootingSession.date > last_maintenance_date
+    def _query_for_user(user: UserContext, gun_id: Optional[str] = None):
+        return select(Maintenance).where(*MaintenanceService._user_filters(user, gun_id))
+
+    @staticmethod
+    def _list_query(user: UserContext, gun_id: Optional[str] = None):
+        """
+        Konserwacje z nazwą broni i bieżącą liczbą strzałów od ostatniej konserwacji - jedno zapytanie.
+
+        Ostatnia konserwacja każdej broni jest wyznaczana funkcją okna, a strzały po niej
+        jednym zgrupowanym agregatem po sesjach; dla starszych wpisów zostaje zapisana wartość.
+        """
+        filters = MaintenanceService._user_filters(user, gun_id)
+        ranked = (
+            select(
+                Maintenance.id,
+                Maintenance.gun_id,
+                Maintenance.user_id,
+                Maintenance.date,
+                func.row_number().over(
+                    partition_by=Maintenance.gun_id,
+                    order_by=(Maintenance.date.desc(), Maintenance.id.desc())
+                ).label("recency")
+            )
+            .where(*filters)
+            .subquery("ranked_maintenance")
+        )
+        latest_rounds = (
+            select(
+                ranked.c.id.label("maintenance_id"),
+                func.coalesce(func.sum(ShootingSession.shots), 0).label("live_rounds")
             )
-            if until_date:
-                query_sessions = query_sessions.where(ShootingSession.date <= until_date)
-            sessions = session.exec(query_sessions).all()
-            rounds = sum(session_item.shots for session_item in sessions)
-            return rounds
+            .select_from(ranked)
+            .outerjoin(
+                ShootingSession,
+                and_(
+                    ShootingSession.gun_id == ranked.c.gun_id,
+                    ShootingSession.user_id == ranked.c.user_id,
+                    ShootingSession.date > ranked.c.date
+                )
+            )
+            .where(ranked.c.recency == 1)
+            .group_by(ranked.c.id)
+            .subquery("latest_rounds")
+        )
+        gun_join = Gun.id == Maintenance.gun_id
+        if user.role != UserRole.admin:
+            gun_join = and_(gun_join, Gun.user_id == user.user_id)
+        return (
+            select(Maintenance, Gun.name, latest_rounds.c.live_rounds)
+            .outerjoin(Gun, gun_join)
+            .outerjoin(latest_rounds, latest_rounds.c.maintenance_id == Maintenance.id)
+            .where(*filters)
+        )
+
+    @staticmethod
+    def _row_to_dict(maint: Maintenance, gun_name: Optional[str], live_rounds: Optional[int]) -> Dict[str, Any]:
+        maint_dict = {
+            "id": maint.id,
+            "gun_id": maint.gun_id,
+            "user_id": maint.user_id,
+            "date": maint.date,
+            "notes": maint.notes,
+            "rounds_since_last": live_rounds if live_rounds is not None else maint.rounds_since_last,
+            "activities": maint.activities
+        }
+        if gun_name:
+            maint_dict["gun_name"] = gun_name
+        return maint_dict
+
+    @staticmethod
+    async def _calculate_rounds_since_last(session: AsyncSession, gun_id: str, last_maintenance_date: Optional[date], until_date: Optional[date] = None) -> int:
+        try:
+            return await GunRoundCounterService.rounds_between(session, gun_id, last_maintenance_date, until_date)
         except Exception as e:
             logger.warning(f"Błąd podczas obliczania rounds_since_last dla {gun_id}: {e}")
             return 0
 
     @staticmethod
-    def list_all(session: Session, user: UserContext, gun_id: Optional[str] = None) -> List[Maintenance]:
+    async def list_all(
+        session: AsyncSession,
+        user: UserContext,
+        gun_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        page = {"has_more": False, "next_cursor": None}
         try:
-            query = MaintenanceService._query_for_user(user, gun_id).order_by(desc(Maintenance.date))
-            maintenance_list = session.exec(query).all()
-            
-            result = []
-            processed_guns = set()
-            
-            for maint in maintenance_list:
-                try:
-                    maint_dict = {
-                        "id": maint.id,
-                        "gun_id": maint.gun_id,
-                        "user_id": maint.user_id,
-                        "date": maint.date,
-                        "notes": maint.notes,
-                        "rounds_since_last": maint.rounds_since_last,
-                        "activities": maint.activities
-                    }
-                    
-                    gun_query = select(Gun).where(Gun.id == maint.gun_id)
-                    if user.role != UserRole.admin:
-                        gun_query = gun_query.where(Gun.user_id == user.user_id)
-                    gun = session.exec(gun_query).first()
-                    if gun:
-                        maint_dict["gun_name"] = gun.name
-                    
-                    if maint.gun_id not in processed_guns:
-                        try:
-                            query_last = MaintenanceService._query_for_user(user, maint.gun_id).order_by(desc(Maintenance.date)).limit(1)
-                            last_maintenance = session.exec(query_last).first()
-                            if last_maintenance and last_maintenance.id == maint.id:
-                                rounds_since_last = MaintenanceService._calculate_rounds_since_last(
-                                    session, user, maint.gun_id, maint.date, None
-                                )
-                                maint_dict["rounds_since_last"] = rounds_since_last
-                                maint.rounds_since_last = rounds_since_last
-                                session.add(maint)
-                                session.commit()
-                        except Exception as e:
-                            logger.warning(f"Błąd podczas obliczania rounds_since_last dla {maint.gun_id}: {e}")
-                        processed_guns.add(maint.gun_id)
-                    
-                    result.append(maint_dict)
-                except Exception as e:
-                    logger.error(f"Błąd podczas przetwarzania konserwacji {maint.id}: {e}", exc_info=True)
-                    continue
-            
-            return result
+            query = MaintenanceService._list_query(user, gun_id)
+            if limit:
+                page = await paginate(
+                    session, query, MaintenanceService.LIST_ORDER, limit,
+                    cursor=cursor, include_total=False
+                )
+                rows = page["items"]
+            else:
+                rows = (await session.exec(
+                    apply_keyset(query, MaintenanceService.LIST_ORDER, cursor)
+                )).all()
+
+            result = [MaintenanceService._row_to_dict(maint, gun_name, live_rounds) for maint, gun_name, live_rounds in rows]
+            return {"items": result, "has_more": page["has_more"], "next_cursor": page["next_cursor"]}
+        except BadRequestError:
+            raise
         except Exception as e:
             logger.error(f"Błąd podczas pobierania listy konserwacji: {e}", exc_info=True)
-            return []
+            return {"items": [], "has_more": False, "next_cursor": None}
 
     @staticmethod
-    def list_for_gun(session: Session, user: UserContext, gun_id: str) -> List[Maintenance]:
-        GunService._get_single_gun(session, gun_id, user)
-        query = MaintenanceService._query_for_user(user, gun_id).order_by(desc(Maintenance.date))
-        maintenance_list = session.exec(query).all()
-        
-        if maintenance_list:
-            last_maintenance = maintenance_list[0]
-            rounds_since_last = MaintenanceService._calculate_rounds_since_last(
-                session, user, gun_id, last_maintenance.date, None
-            )
-            if last_maintenance.rounds_since_last != rounds_since_last:
-                last_maintenance.rounds_since_last = rounds_since_last
-                session.add(last_maintenance)
-                session.commit()
-        
-        return list(maintenance_list)
+    async def list_for_gun(session: AsyncSession, user: UserContext, gun_id: str) -> List[Dict[str, Any]]:
+        await GunService._get_single_gun(session, gun_id, user)
+        query = MaintenanceService._list_query(user, gun_id).order_by(desc(Maintenance.date), desc(Maintenance.id))
+        rows = (await session.exec(query)).all()
+        return [MaintenanceService._row_to_dict(maint, gun_name, live_rounds) for maint, gun_name, live_rounds in rows]
 
     @staticmethod
-    def create_maintenance(session: Session, user: UserContext, gun_id: str, data: dict) -> Maintenance:
-        GunService._get_single_gun(session, gun_id, user)
+    async def create_maintenance(session: AsyncSession, user: UserContext, gun_id: str, data: dict) -> Maintenance:
+        await GunService._get_single_gun(session, gun_id, user)
         maintenance_date = data.get("date")
         if isinstance(maintenance_date, str):
             maintenance_date = datetime.strptime(maintenance_date, "%Y-%m-%d").date()
@@ -124,16 +156,17 @@ class MaintenanceService:
         
         rounds_since_last = data.get("rounds_since_last", 0)
         if rounds_since_last == 0:
-            query_last = MaintenanceService._query_for_user(user, gun_id).order_by(desc(Maintenance.date)).limit(1)
-            last_maintenance = session.exec(query_last).first()
-            if last_maintenance:
-                rounds_since_last = MaintenanceService._calculate_rounds_since_last(
-                    session, user, gun_id, last_maintenance.date, maintenance_date
-                )
-            else:
-                rounds_since_last = MaintenanceService._calculate_rounds_since_last(
-                    session, user, gun_id, date(1900, 1, 1), maintenance_date
-                )
+            # Poprzednia konserwacja względem nowej - przy dacie wstecznej nie ta najnowsza
+            query_last = (
+                MaintenanceService._query_for_user(user, gun_id)
+                .where(Maintenance.date <= maintenance_date)
+                .order_by(desc(Maintenance.date))
+                .limit(1)
+            )
+            last_maintenance = (await session.exec(query_last)).first()
+            rounds_since_last = await MaintenanceService._calculate_rounds_since_last(
+                session, gun_id, last_maintenance.date if last_maintenance else None, maintenance_date
+            )
         
         maintenance = Maintenance(
             gun_id=gun_id,
@@ -144,23 +177,26 @@ class MaintenanceService:
             activities=data.get("activities")
         )
         session.add(maintenance)
-        session.commit()
-        session.refresh(maintenance)
+        await GunRoundCounterService.reset_after_maintenance(session, gun_id, maintenance_date)
+        await MaintenanceDueService.clear(session, gun_id=gun_id)
+        await session.commit()
+        await session.refresh(maintenance)
         return maintenance
 
     @staticmethod
-    def _get_single_maintenance(session: Session, maintenance_id: str, user: UserContext) -> Maintenance:
+    async def _get_single_maintenance(session: AsyncSession, maintenance_id: str, user: UserContext) -> Maintenance:
         query = select(Maintenance).where(Maintenance.id == maintenance_id)
         if user.role != UserRole.admin:
             query = query.where(Maintenance.user_id == user.user_id)
-        maintenance = session.exec(query).first()
+        maintenance = (await session.exec(query)).first()
         if not maintenance:
             raise NotFoundError("Konserwacja nie została znaleziona")
         return maintenance
 
     @staticmethod
-    def update_maintenance(session: Session, user: UserContext, maintenance_id: str, data: dict) -> Maintenance:
-        maintenance = MaintenanceService._get_single_maintenance(session, maintenance_id, user)
+    async def update_maintenance(session: AsyncSession, user: UserContext, maintenance_id: str, data: dict) -> Maintenance:
+        maintenance = await MaintenanceService._get_single_maintenance(session, maintenance_id, user)
+        date_changed = False
         if "date" in data and data["date"] is not None:
             new_date = data["date"]
             if isinstance(new_date, str):
@@ -173,8 +209,9 @@ class MaintenanceService:
             if new_date and new_date > date.today():
                 raise BadRequestError("Data konserwacji nie może być w przyszłości")
             
-            if new_date:
+            if new_date and new_date != maintenance.date:
                 maintenance.date = new_date
+                date_changed = True
         if "notes" in data:
             maintenance.notes = data.get("notes")
         if "activities" in data:
@@ -182,82 +219,106 @@ class MaintenanceService:
         if "rounds_since_last" in data and data["rounds_since_last"] is not None:
             maintenance.rounds_since_last = data["rounds_since_last"]
         session.add(maintenance)
-        session.commit()
-        session.refresh(maintenance)
+        if date_changed:
+            await GunRoundCounterService.refresh_maintenance_baseline(session, maintenance.gun_id)
+        await session.commit()
+        await session.refresh(maintenance)
         return maintenance
 
     @staticmethod
-    def delete_maintenance(session: Session, user: UserContext, maintenance_id: str) -> dict:
-        maintenance = MaintenanceService._get_single_maintenance(session, maintenance_id, user)
-        session.delete(maintenance)
-        session.commit()
+    async def delete_maintenance(session: AsyncSession, user: UserContext, maintenance_id: str) -> dict:
+        maintenance = await MaintenanceService._get_single_maintenance(session, maintenance_id, user)
+        await session.delete(maintenance)
+        await session.flush()
+        await GunRoundCounterService.refresh_maintenance_baseline(session, maintenance.gun_id)
+        await session.commit()
         return {"message": f"Konserwacja o ID {maintenance_id} została usunięta"}
 
     @staticmethod
-    def update_last_maintenance_rounds(session: Session, user: UserContext, gun_id: str) -> None:
-        query_last = MaintenanceService._query_for_user(user, gun_id).order_by(desc(Maintenance.date)).limit(1)
-        last_maintenance = session.exec(query_last).first()
-        if last_maintenance:
-            rounds_since_last = MaintenanceService._calculate_rounds_since_last(
-                session, user, gun_id, last_maintenance.date, None
+    def _gun_status_query(user_id: Optional[str] = None):
+        """
+        Stan konserwacji każdej broni jednym zapytaniem: data ostatniej konserwacji, data pierwszej sesji
+        i strzały od konserwacji z liczników (bez licznika - z sesji). Zgrupowane podzapytania działają
+        tak samo w PostgreSQL i SQLite; odczyt niczego nie przebudowuje.
+        """
+        last_maintenance = (
+            select(Maintenance.gun_id, func.max(Maintenance.date).label("last_date"))
+            .group_by(Maintenance.gun_id)
+            .subquery("last_maintenance")
+        )
+        first_session = (
+            select(ShootingSession.gun_id, func.min(ShootingSession.date).label("first_date"))
+            .group_by(ShootingSession.gun_id)
+            .subquery("first_session")
+        )
+        # Broń bez wiersza licznika: suma strzałów sesji po ostatniej konserwacji (skorelowane podzapytanie)
+        sessions_since = (
+            select(func.coalesce(func.sum(ShootingSession.shots), 0))
+            .where(
+                ShootingSession.gun_id == Gun.id,
+                or_(last_maintenance.c.last_date.is_(None), ShootingSession.date > last_maintenance.c.last_date)
             )
-            last_maintenance.rounds_since_last = rounds_since_last
-            session.add(last_maintenance)
-            session.commit()
+            .correlate(Gun, last_maintenance)
+            .scalar_subquery()
+        )
+        query = (
+            select(
+                Gun.id,
+                Gun.name,
+                Gun.created_at,
+                last_maintenance.c.last_date,
+                first_session.c.first_date,
+                func.coalesce(GunRoundCounter.rounds_since_maintenance, sessions_since).label("rounds_since")
+            )
+            .outerjoin(last_maintenance, last_maintenance.c.gun_id == Gun.id)
+            .outerjoin(first_session, first_session.c.gun_id == Gun.id)
+            .outerjoin(GunRoundCounter, GunRoundCounter.gun_id == Gun.id)
+        )
+        if user_id:
+            query = query.where(Gun.user_id == user_id)
+        return query
 
     @staticmethod
-    def get_statistics(session: Session, user: UserContext) -> Dict[str, Any]:
+    def _days_since(today: date, last_date: Optional[date], first_date: Optional[date], created_at: Optional[date]) -> int:
+        # Bez konserwacji liczymy od pierwszej sesji, a bez sesji - od daty utworzenia broni
+        reference = last_date or first_date or created_at
+        return (today - reference).days if reference else 0
+
+    @staticmethod
+    async def get_statistics(session: AsyncSession, user: UserContext) -> Dict[str, Any]:
         try:
-            query_guns = select(Gun)
-            if user.role != UserRole.admin:
-                query_guns = query_guns.where(Gun.user_id == user.user_id)
-            guns = session.exec(query_guns).all()
-            
+            user_id = None if user.role == UserRole.admin else user.user_id
+            rows = (await session.exec(MaintenanceService._gun_status_query(user_id))).all()
+            settings = await UserSettingsService.get_settings(session, user)
+            rounds_limit = settings.maintenance_rounds_limit
+            days_limit = settings.maintenance_days_limit
+
             today = date.today()
             gun_stats = []
             longest_without = None
             max_days = 0
-            
-            for gun in guns:
-                try:
-                    query_last = MaintenanceService._query_for_user(user, gun.id).order_by(desc(Maintenance.date)).limit(1)
-                    last_maintenance = session.exec(query_last).first()
-                    
-                    if last_maintenance:
-                        days_since = (today - last_maintenance.date).days
-                    else:
-                        query_first_session = select(ShootingSession).where(
-                            ShootingSession.gun_id == gun.id,
-                            ShootingSession.user_id == user.user_id
-                        ).order_by(ShootingSession.date).limit(1)
-                        first_session = session.exec(query_first_session).first()
-                        
-                        if first_session:
-                            days_since = (today - first_session.date).days
-                        else:
-                            # Użyj daty utworzenia broni jako fallback
-                            if gun.created_at:
-                                days_since = (today - gun.created_at).days
-                            else:
-                                days_since = 0
-                    
-                    gun_stats.append({
-                        "gun_id": gun.id,
-                        "gun_name": gun.name,
-                        "days_since_last": days_since
-                    })
-                    
-                    if days_since is not None and days_since > max_days:
-                        max_days = days_since
-                        longest_without = {
-                            "gun_id": gun.id,
-                            "gun_name": gun.name,
-                            "days_since": days_since
-                        }
-                except Exception as e:
-                    logger.warning(f"Błąd podczas przetwarzania statystyk dla broni {gun.id}: {e}")
-                    continue
-            
+
+            for gun_id, gun_name, created_at, last_date, first_date, rounds_since in rows:
+                days_since = MaintenanceService._days_since(today, last_date, first_date, created_at)
+
+                gun_stats.append({
+                    "gun_id": gun_id,
+                    "gun_name": gun_name,
+                    "days_since_last": days_since,
+                    "days_limit": days_limit,
+                    "rounds_since_last": rounds_since,
+                    "rounds_limit": rounds_limit,
+                    "maintenance_due": days_since >= days_limit or rounds_since >= rounds_limit
+                })
+
+                if days_since > max_days:
+                    max_days = days_since
+                    longest_without = {
+                        "gun_id": gun_id,
+                        "gun_name": gun_name,
+                        "days_since": days_since
+                    }
+
             return {
                 "longest_without_maintenance": longest_without,
                 "guns_status": gun_stats
@@ -268,6 +329,3 @@ class MaintenanceService:
                 "longest_without_maintenance": None,
                 "guns_status": []
             }
-
-
-
@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_, func
+from sqlalchemy.engine import Row
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from services.exceptions import BadRequestError
+
+
+# Kolumna sortowania: (kolumna, malejąco?)
+SortKey = Tuple[Any, bool]
+
+
+def _serialize_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _deserialize_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if python_type is date and isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Koduje wartości klucza sortowania ostatniego elementu strony w nieprzezroczysty kursor."""
+    payload = json.dumps([_serialize_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order: Sequence[SortKey]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if not isinstance(values, list) or len(values) != len(order):
+            raise ValueError("cursor length mismatch")
+        return [_deserialize_value(column, value) for (column, _), value in zip(order, values)]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise BadRequestError("Nieprawidłowy kursor paginacji")
+
+
+def _keyset_condition(order: Sequence[SortKey], values: Sequence[Any]):
+    """
+    Buduje warunek "(a, b) > (x, y)" z uwzględnieniem kierunku sortowania.
+    Rozpisany na OR/AND, żeby działał tak samo w SQLite i PostgreSQL.
+    """
+    conditions = []
+    for i, (column, descending) in enumerate(order):
+        equal_prefix = [order[j][0] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*equal_prefix, step))
+    return or_(*conditions)
+
+
+def apply_keyset(query, order: Sequence[SortKey], cursor: Optional[str]):
+    if cursor:
+        values = decode_cursor(cursor, order)
+        query = query.where(_keyset_condition(order, values))
+    return query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+
+
+def _cursor_for(item: Any, order: Sequence[SortKey]) -> str:
+    # Przy zapytaniach z dodatkowymi kolumnami encja jest pierwszym elementem wiersza
+    if isinstance(item, Row):
+        item = item[0]
+    return encode_cursor([getattr(item, column.key) for column, _ in order])
+
+
+async def count_rows(session: AsyncSession, query) -> int:
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return (await session.exec(count_query)).one()
+
+
+def _total_column(query):
+    """Licznik wszystkich pasujących wierszy jako podzapytanie skalarne - liczony w tym samym SELECT co strona."""
+    return (
+        select(func.count())
+        .select_from(query.order_by(None).subquery())
+        .scalar_subquery()
+        .label("total_count")
+    )
+
+
+async def paginate(
+    session: AsyncSession,
+    query,
+    order: Sequence[SortKey],
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+) -> Dict[str, Any]:
+    """
+    Wspólna paginacja list.
+
+    - z `cursor` strona jest wyznaczana warunkiem keyset (koszt nie rośnie z numerem strony),
+    - bez `cursor` działa klasyczny `offset` (zgodność wsteczna),
+    - `total` jest liczony podzapytaniem w tym samym zapytaniu co strona,
+    - `include_total=False` pomija liczenie i zwraca tylko `has_more`.
+    """
+    page_query = apply_keyset(query, order, cursor)
+    if not cursor and offset:
+        page_query = page_query.offset(offset)
+    page_query = page_query.limit(limit + 1)
+
+    total = None
+    if include_total:
+        # session.execute zwraca pełne wiersze (encja + licznik), session.exec tylko pierwszą kolumnę
+        rows = (await session.execute(page_query.add_columns(_total_column(query)))).all()
+        items_page = [row[0] for row in rows]
+        if rows:
+            total = rows[0][1]
+        elif cursor or offset:
+            total = await count_rows(session, query)
+        else:
+            total = 0
+    else:
+        items_page = list((await session.exec(page_query)).all())
+
+    has_more = len(items_page) > limit
+    items = items_page[:limit]
+    next_cursor = _cursor_for(items[-1], order) if has_more and items else None
+
+    return {
+        "total": total,
+        "items": items,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    }
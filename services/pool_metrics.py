@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Oczekiwanie na połączenie dłuższe niż próg jest logowane jako ostrzeżenie
+SLOW_CHECKOUT_WARNING_MS = 1000.0
+
+
+class PoolMetrics:
+    """Liczniki puli połączeń jednego silnika (wspólne dla wątków i pętli zdarzeń)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def _incr(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def record_wait(self, wait_ms: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        if wait_ms >= SLOW_CHECKOUT_WARNING_MS:
+            logger.warning(f"[DB] {self.name}: oczekiwanie na połączenie z puli trwało {wait_ms:.0f} ms")
+
+    def record_timeout(self) -> None:
+        self._incr("timeouts")
+        logger.error(f"[DB] {self.name}: brak wolnego połączenia w puli (timeout)")
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "pool_class": type(pool).__name__,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_count": self.wait_count,
+                "wait_avg_ms": round(self.wait_total_ms / self.wait_count, 2) if self.wait_count else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 2),
+            }
+        # Bieżący stan dostępny tylko dla pul kolejkowych (NullPool/StaticPool nie trzymają połączeń)
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, attr, None)
+            if callable(method):
+                data[attr] = method()
+        return data
+
+
+class _TimedCheckoutMixin:
+    """Mierzy czas oczekiwania na połączenie z puli (łącznie z otwarciem nowego połączenia)."""
+
+    metrics: PoolMetrics = None
+
+    def recreate(self):
+        # engine.dispose() tworzy nową pulę - liczniki przechodzą dalej
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics:
+                self.metrics.record_timeout()
+            raise
+        finally:
+            if self.metrics:
+                self.metrics.record_wait((time.perf_counter() - start) * 1000.0)
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_registry: Dict[str, Any] = {}
+
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """Podpina liczniki pod zdarzenia puli silnika (sync lub async) i rejestruje go pod nazwą."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    metrics = PoolMetrics(name)
+    pool = sync_engine.pool
+    if isinstance(pool, _TimedCheckoutMixin):
+        pool.metrics = metrics
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics._incr("connects")
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics._incr("checkouts")
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics._incr("checkins")
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics._incr("invalidations")
+        if exception is not None:
+            logger.warning(f"[DB] {name}: unieważniono połączenie: {exception}")
+
+    _registry[name] = (sync_engine, metrics)
+    return metrics
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: metrics.snapshot(sync_engine.pool) for name, (sync_engine, metrics) in _registry.items()}
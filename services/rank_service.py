@@ -4,10 +4,10 @@ from typing import Optional, Dict, Any
 from datetime import datetime
 import logging
 
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import User, ShootingSession
-from services.shooting_sessions_service import SessionCalculationService
+from models import User
+from services.accuracy_histogram_service import AccuracyHistogramService
 
 logger = logging.getLogger(__name__)
 
@@ -53,7 +53,7 @@ def _get_required_accuracy(skill_level: str) -> int:
     return ACCURACY_REQUIREMENTS.get(skill_level or "beginner", 75)
 
 
-def count_passed_sessions(user: User, db: Session) -> int:
+async def count_passed_sessions(user: User, db: AsyncSession) -> int:
     """
     Liczy ile sesji użytkownika spełnia wymagania rangi.
 
@@ -62,47 +62,21 @@ def count_passed_sessions(user: User, db: Session) -> int:
     - jeśli accuracy_percent jest ustawione → używa go,
     - jeśli brak accuracy_percent, ale są hits + shots → liczy accuracy,
     - sesja liczy się, jeśli accuracy >= wymagany próg dla skill_level.
+
+    Liczenie odbywa się na histogramie celności (`accuracy_histograms`) utrzymywanym
+    przy zapisie sesji - wynik to suma koszyków od progu w górę, bez skanowania sesji.
+    Zmiana skill_level zmienia tylko próg.
     """
     if not user or not user.user_id:
         logger.error("[RANK] Brak użytkownika lub user_id")
         return 0
     
     required_accuracy = _get_required_accuracy(user.skill_level)
-    logger.info(f"[RANK] Liczenie zaliczonych sesji dla użytkownika {user.user_id}, skill_level={user.skill_level}, wymagana celność={required_accuracy}%")
-
-    stmt = (
-        select(ShootingSession)
-        .where(ShootingSession.user_id == user.user_id)
-    )
-    sessions = db.exec(stmt).all()
-    logger.info(f"[RANK] Znaleziono {len(sessions)} sesji dla użytkownika {user.user_id}")
-
-    passed_count = 0
-
-    for s in sessions:
-        accuracy = s.accuracy_percent
-
-        # Legacy / bezpieczeństwo: jeśli accuracy brak, a są hits + shots → policz
-        if accuracy is None:
-            if s.hits is not None and s.shots is not None and s.shots > 0:
-                accuracy = SessionCalculationService.calculate_accuracy(s.hits, s.shots)
-                logger.debug(f"[RANK] Sesja {s.id}: obliczono accuracy={accuracy}% z hits={s.hits}, shots={s.shots}")
-
-        if accuracy is not None:
-            # Walidacja: accuracy powinno być między 0 a 100
-            if accuracy < 0 or accuracy > 100:
-                logger.warning(f"[RANK] Sesja {s.id}: nieprawidłowa wartość accuracy={accuracy}%, pomijana")
-                continue
-            
-            logger.debug(f"[RANK] Sesja {s.id}: accuracy={accuracy}%, wymagana={required_accuracy}%, zaliczona={accuracy >= required_accuracy}")
-            if accuracy >= required_accuracy:
-                passed_count += 1
-        else:
-            logger.debug(f"[RANK] Sesja {s.id}: brak accuracy (hits={s.hits}, shots={s.shots}), pomijana")
+    passed_count = await AccuracyHistogramService.count_at_least(db, user.user_id, required_accuracy)
 
     # Upewnij się, że wynik nie jest ujemny
     passed_count = max(0, passed_count)
-    logger.info(f"[RANK] Użytkownik {user.user_id}: {passed_count} zaliczonych sesji z {len(sessions)} wszystkich")
+    logger.info(f"[RANK] Użytkownik {user.user_id}: {passed_count} zaliczonych sesji (skill_level={user.skill_level}, wymagana celność={required_accuracy}%)")
     return passed_count
 
 
@@ -147,7 +121,7 @@ def is_valid_rank_name(rank_name: str) -> bool:
     return _find_rank_index_by_name(rank_name) >= 0
 
 
-def update_user_rank(user: User, db: Session) -> str:
+async def update_user_rank(user: User, db: AsyncSession) -> str:
     """
     Przelicza liczbę zaliczonych sesji, wyznacza rangę i zapisuje ją w user.rank,
     jeśli się zmieniła. Zwraca aktualną nazwę rangi.
@@ -156,7 +130,7 @@ def update_user_rank(user: User, db: Session) -> str:
         logger.error("[RANK] Brak użytkownika w update_user_rank")
         return "Nowicjusz"
     
-    passed = count_passed_sessions(user, db)
+    passed = await count_passed_sessions(user, db)
     new_rank = get_rank_name(passed)
 
     # Walidacja: sprawdź czy nowa ranga jest poprawna
@@ -171,8 +145,8 @@ def update_user_rank(user: User, db: Session) -> str:
         logger.warning(f"[RANK] Użytkownik {user.user_id}: niepoprawna ranga w bazie '{user.rank}', koryguję na '{new_rank}'")
         user.rank = new_rank
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     elif user.rank != new_rank:
         logger.info(
             f"[RANK] Użytkownik {user.user_id}: zmiana rangi "
@@ -180,13 +154,13 @@ def update_user_rank(user: User, db: Session) -> str:
         )
         user.rank = new_rank
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
     return user.rank
 
 
-def get_rank_info(user: User, db: Session) -> Dict[str, Any]:
+async def get_rank_info(user: User, db: AsyncSession) -> Dict[str, Any]:
     """
     Zwraca pełne info o randze użytkownika, w tym:
     - rank: aktualna nazwa rangi
@@ -212,7 +186,7 @@ def get_rank_info(user: User, db: Session) -> Dict[str, Any]:
             "is_max_rank": False,
         }
     
-    passed = count_passed_sessions(user, db)
+    passed = await count_passed_sessions(user, db)
     current_rank_name = get_rank_name(passed)
     current_index = _find_rank_index_by_name(current_rank_name)
 
@@ -260,13 +234,13 @@ def get_rank_info(user: User, db: Session) -> Dict[str, Any]:
     }
 
 
-def get_rank_info_by_user_id(user_id: str, db: Session) -> Dict[str, Any]:
+async def get_rank_info_by_user_id(user_id: str, db: AsyncSession) -> Dict[str, Any]:
     """
     Wygodny helper: pobiera usera po user_id i zwraca get_rank_info.
     Możesz tego używać np. w endpointzie /me/rank.
     """
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
     if not user:
         raise ValueError(f"User {user_id} not found")
 
-    return get_rank_info(user, db)
+    return await get_rank_info(user, db)
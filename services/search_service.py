@@ -0,0 +1,139 @@
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Dict, List, Optional
+from sqlalchemy import case, func, literal
+import logging
+from models import Gun, Ammo, ShootingSession, SEARCH_TEXT_FIELDS, normalize_search_text
+from models.search_text import build_search_text
+from services.user_context import UserContext, UserRole
+
+logger = logging.getLogger(__name__)
+
+
+def escape_like(term: str) -> str:
+    """Fraza jako literał we wzorcu LIKE (z `escape="\\"`) - `%` i `_` nie działają jak wieloznaczniki."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_pattern(search: Optional[str]) -> Optional[str]:
+    """Wzorzec LIKE dla znormalizowanej kolumny `search_text` (None gdy fraza jest pusta)."""
+    term = normalize_search_text(search)
+    if not term:
+        return None
+    return f"%{escape_like(term)}%"
+
+
+def search_condition(column, search: Optional[str]):
+    pattern = search_pattern(search)
+    if pattern is None:
+        return None
+    return column.like(pattern, escape="\\")
+
+
+def rebuild_search_text(session: Session, batch_size: int = 500) -> int:
+    """Przelicza `search_text` dla wszystkich rekordów (np. po dodaniu kolumny)."""
+    updated = 0
+    for model, fields in SEARCH_TEXT_FIELDS.items():
+        offset = 0
+        while True:
+            rows = session.exec(select(model).order_by(model.id).offset(offset).limit(batch_size)).all()
+            if not rows:
+                break
+            for row in rows:
+                row.search_text = build_search_text(getattr(row, name, None) for name in fields)
+                session.add(row)
+            session.commit()
+            updated += len(rows)
+            offset += batch_size
+    logger.info(f"Przeliczono search_text dla {updated} rekordów")
+    return updated
+
+
+class SearchService:
+    @staticmethod
+    def _score(session: AsyncSession, column, term: str):
+        """
+        PostgreSQL: podobieństwo trigramowe (pg_trgm).
+        SQLite (dev): dopasowanie od początku tekstu przed dopasowaniem w środku.
+        """
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            return func.similarity(column, term)
+        return case((column.like(f"{escape_like(term)}%", escape="\\"), literal(1.0)), else_=literal(0.5))
+
+    @staticmethod
+    def _scoped(query, model, user: UserContext):
+        if user.role == UserRole.admin:
+            return query
+        return query.where(model.user_id == user.user_id)
+
+    @staticmethod
+    def _snippet(text: Optional[str], length: int = 160) -> Optional[str]:
+        if not text:
+            return None
+        return text if len(text) <= length else text[:length].rstrip() + "…"
+
+    @staticmethod
+    async def search(session: AsyncSession, user: UserContext, query_text: str, limit: int = 20) -> Dict[str, Any]:
+        term = normalize_search_text(query_text)
+        if not term:
+            return {"query": query_text, "items": []}
+
+        hits: List[Dict[str, Any]] = []
+
+        score = SearchService._score(session, Gun.search_text, term).label("score")
+        gun_query = SearchService._scoped(select(Gun.id, Gun.name, Gun.caliber, Gun.notes, score), Gun, user)
+        gun_query = gun_query.where(search_condition(Gun.search_text, query_text)).order_by(score.desc()).limit(limit)
+        for row in (await session.execute(gun_query)).all():
+            hits.append({
+                "type": "gun",
+                "id": row.id,
+                "title": row.name,
+                "snippet": SearchService._snippet(row.notes) or row.caliber,
+                "score": float(row.score),
+            })
+
+        score = SearchService._score(session, Ammo.search_text, term).label("score")
+        ammo_query = SearchService._scoped(select(Ammo.id, Ammo.name, Ammo.caliber, score), Ammo, user)
+        ammo_query = ammo_query.where(search_condition(Ammo.search_text, query_text)).order_by(score.desc()).limit(limit)
+        for row in (await session.execute(ammo_query)).all():
+            hits.append({
+                "type": "ammo",
+                "id": row.id,
+                "title": row.name,
+                "snippet": row.caliber,
+                "score": float(row.score),
+            })
+
+        score = SearchService._score(session, ShootingSession.search_text, term).label("score")
+        session_query = SearchService._scoped(
+            select(
+                ShootingSession.id,
+                ShootingSession.date,
+                ShootingSession.notes,
+                ShootingSession.ai_comment,
+                Gun.name.label("gun_name"),
+                score,
+            ).join(Gun, ShootingSession.gun_id == Gun.id),
+            ShootingSession,
+            user,
+        )
+        session_query = (
+            session_query
+            .where(search_condition(ShootingSession.search_text, query_text))
+            .order_by(score.desc(), ShootingSession.date.desc())
+            .limit(limit)
+        )
+        for row in (await session.execute(session_query)).all():
+            notes_match = term in normalize_search_text(row.notes)
+            hits.append({
+                "type": "session",
+                "id": row.id,
+                "title": f"{row.date.isoformat()} – {row.gun_name}",
+                "snippet": SearchService._snippet(row.notes if notes_match or not row.ai_comment else row.ai_comment),
+                "score": float(row.score),
+                "date": row.date,
+            })
+
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return {"query": query_text, "items": hits[:limit]}
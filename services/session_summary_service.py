@@ -0,0 +1,204 @@
+from sqlmodel import Session, select, delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, Dict, Any
+from uuid import uuid4
+from sqlalchemy import func, extract
+import logging
+from models import ShootingSession, MonthlySessionSummary
+from services.dialect import upsert_insert
+from services.user_context import UserContext, UserRole
+
+logger = logging.getLogger(__name__)
+
+
+def session_snapshot(ss: ShootingSession) -> Dict[str, Any]:
+    """Wartości sesji istotne dla podsumowań - zapamiętywane przed edycją, żeby odjąć starą wersję."""
+    return {
+        "user_id": ss.user_id,
+        "date": ss.date,
+        "gun_id": ss.gun_id,
+        "ammo_id": ss.ammo_id,
+        "cost": ss.cost,
+        "shots": ss.shots,
+    }
+
+
+class SessionSummaryService:
+    @staticmethod
+    def _key_filters(snapshot: Dict[str, Any], month: str) -> list:
+        return [
+            MonthlySessionSummary.user_id == snapshot["user_id"],
+            MonthlySessionSummary.month == month,
+            MonthlySessionSummary.gun_id == snapshot["gun_id"],
+            MonthlySessionSummary.ammo_id == snapshot["ammo_id"]
+        ]
+
+    @staticmethod
+    async def apply_delta(session: AsyncSession, snapshot: Dict[str, Any], sign: int) -> None:
+        """
+        Dodaje (sign=1) lub odejmuje (sign=-1) sesję od miesięcznego podsumowania.
+        Zmiana liczona w bazie (`kolumna = kolumna + delta`), więc równoległe zapisy nie gubią sum.
+        Nie robi commit - zmiana trafia do bazy razem z zapisem samej sesji.
+        """
+        month = snapshot["date"].strftime("%Y-%m")
+        cost = sign * float(snapshot["cost"] or 0.0)
+        shots = sign * (snapshot["shots"] or 0)
+        filters = SessionSummaryService._key_filters(snapshot, month)
+
+        insert = upsert_insert(session) if sign > 0 else None
+        if insert is not None:
+            stmt = insert(MonthlySessionSummary).values(
+                id=str(uuid4()),
+                user_id=snapshot["user_id"],
+                month=month,
+                gun_id=snapshot["gun_id"],
+                ammo_id=snapshot["ammo_id"],
+                total_cost=cost,
+                total_shots=shots,
+                session_count=1
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "month", "gun_id", "ammo_id"],
+                set_={
+                    "total_cost": MonthlySessionSummary.total_cost + stmt.excluded.total_cost,
+                    "total_shots": MonthlySessionSummary.total_shots + stmt.excluded.total_shots,
+                    "session_count": MonthlySessionSummary.session_count + stmt.excluded.session_count,
+                }
+            )
+            await session.exec(stmt)
+            return
+
+        result = await session.exec(
+            update(MonthlySessionSummary)
+            .where(*filters)
+            .values(
+                total_cost=MonthlySessionSummary.total_cost + cost,
+                total_shots=MonthlySessionSummary.total_shots + shots,
+                session_count=MonthlySessionSummary.session_count + sign
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            if sign < 0:
+                logger.warning(f"Brak podsumowania {month} dla {snapshot['user_id']} przy odejmowaniu sesji")
+                return
+            session.add(MonthlySessionSummary(
+                user_id=snapshot["user_id"],
+                month=month,
+                gun_id=snapshot["gun_id"],
+                ammo_id=snapshot["ammo_id"],
+                total_cost=cost,
+                total_shots=shots,
+                session_count=1
+            ))
+            return
+        if sign < 0:
+            await session.exec(
+                delete(MonthlySessionSummary)
+                .where(*filters, MonthlySessionSummary.session_count <= 0)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    async def replace(session: AsyncSession, old_snapshot: Dict[str, Any], new_snapshot: Dict[str, Any]) -> None:
+        if old_snapshot == new_snapshot:
+            return
+        await SessionSummaryService.apply_delta(session, old_snapshot, -1)
+        await session.flush()
+        await SessionSummaryService.apply_delta(session, new_snapshot, 1)
+
+    @staticmethod
+    def _delete_statement(
+        user_id: Optional[str] = None,
+        gun_id: Optional[str] = None,
+        ammo_id: Optional[str] = None
+    ):
+        stmt = delete(MonthlySessionSummary)
+        if user_id:
+            stmt = stmt.where(MonthlySessionSummary.user_id == user_id)
+        if gun_id:
+            stmt = stmt.where(MonthlySessionSummary.gun_id == gun_id)
+        if ammo_id:
+            stmt = stmt.where(MonthlySessionSummary.ammo_id == ammo_id)
+        return stmt
+
+    @staticmethod
+    async def delete_for(
+        session: AsyncSession,
+        user_id: Optional[str] = None,
+        gun_id: Optional[str] = None,
+        ammo_id: Optional[str] = None
+    ) -> None:
+        """Usuwa podsumowania po usunięciu broni/amunicji/konta (sesje znikają kaskadowo)."""
+        await session.exec(SessionSummaryService._delete_statement(user_id, gun_id, ammo_id))
+
+    @staticmethod
+    async def get_summary(
+        session: AsyncSession,
+        user: UserContext,
+        limit: int,
+        offset: int,
+        search: Optional[str],
+        gun_id: Optional[str] = None,
+        ammo_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        query = select(
+            MonthlySessionSummary.month,
+            func.sum(MonthlySessionSummary.total_cost),
+            func.sum(MonthlySessionSummary.total_shots)
+        )
+        if user.role != UserRole.admin:
+            query = query.where(MonthlySessionSummary.user_id == user.user_id)
+        if gun_id:
+            query = query.where(MonthlySessionSummary.gun_id == gun_id)
+        if ammo_id:
+            query = query.where(MonthlySessionSummary.ammo_id == ammo_id)
+        if search:
+            query = query.where(MonthlySessionSummary.month.like(f"%{search.lower()}%"))
+        query = query.group_by(MonthlySessionSummary.month).order_by(MonthlySessionSummary.month)
+
+        summary = [
+            {
+                "month": month,
+                "total_cost": round(float(total_cost or 0.0), 2),
+                "total_shots": int(total_shots or 0)
+            }
+            for month, total_cost, total_shots in (await session.exec(query)).all()
+        ]
+        return {"total": len(summary), "items": summary[offset:offset + limit]}
+
+    @staticmethod
+    def rebuild(session: Session, user_id: Optional[str] = None) -> int:
+        """Jednorazowe przeliczenie podsumowań z tabeli sesji (backfill, synchroniczne - migracje i skrypty)."""
+        session.exec(SessionSummaryService._delete_statement(user_id=user_id))
+
+        year = extract("year", ShootingSession.date)
+        month = extract("month", ShootingSession.date)
+        query = select(
+            ShootingSession.user_id,
+            ShootingSession.gun_id,
+            ShootingSession.ammo_id,
+            year,
+            month,
+            func.sum(func.coalesce(ShootingSession.cost, 0.0)),
+            func.sum(ShootingSession.shots),
+            func.count(ShootingSession.id)
+        ).group_by(ShootingSession.user_id, ShootingSession.gun_id, ShootingSession.ammo_id, year, month)
+        if user_id:
+            query = query.where(ShootingSession.user_id == user_id)
+
+        created = 0
+        for row_user_id, row_gun_id, row_ammo_id, row_year, row_month, cost, shots, count in session.exec(query).all():
+            session.add(MonthlySessionSummary(
+                user_id=row_user_id,
+                month=f"{int(row_year):04d}-{int(row_month):02d}",
+                gun_id=row_gun_id,
+                ammo_id=row_ammo_id,
+                total_cost=round(float(cost or 0.0), 2),
+                total_shots=int(shots or 0),
+                session_count=int(count)
+            ))
+            created += 1
+        session.commit()
+        logger.info(f"Przeliczono {created} miesięcznych podsumowań sesji")
+        return created
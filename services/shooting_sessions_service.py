@@ -1,17 +1,31 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional, List, Dict, Any, Union
 from datetime import date, datetime
-from collections import defaultdict
 from sqlalchemy import or_, func, cast, String, not_
 from fastapi import HTTPException
 from models import ShootingSession, Ammo, Gun, AmmoCategory
 import logging
 from services.user_context import UserContext, UserRole
-from services.maintenance_service import MaintenanceService
+from services.pagination import paginate
+from services.search_service import search_condition
+from services.session_summary_service import SessionSummaryService, session_snapshot
+from services.accuracy_histogram_service import AccuracyHistogramService, session_accuracy_bucket
+from services.gun_round_counter_service import GunRoundCounterService
+from services.ammo_forecast_service import AmmoForecastService
+from services.user_settings_service import UserSettingsService
+from services.currency_service import convert_pln_amounts
+import calendar
 
 logger = logging.getLogger(__name__)
 
 
+def _month_end(month: str) -> date:
+    """Ostatni dzień miesiąca w formacie RRRR-MM."""
+    year, month_number = (int(part) for part in month.split("-"))
+    return date(year, month_number, calendar.monthrange(year, month_number)[1])
+
+
 class SessionValidationService:
     @staticmethod
     def validate_ammo_gun_compatibility(ammo: Ammo, gun: Gun) -> bool:
@@ -154,6 +168,8 @@ class SessionCalculationService:
 
 
 class ShootingSessionsService:
+    LIST_ORDER = ((ShootingSession.date, True), (ShootingSession.id, True))
+
     @staticmethod
     def _query_for_user(model, user: UserContext):
         query = select(model)
@@ -167,17 +183,14 @@ class ShootingSessionsService:
         if not search:
             return query
         try:
-            pattern = f"%{search.lower()}%"
-            query = query.join(Gun, model.gun_id == Gun.id).join(Ammo, model.ammo_id == Ammo.id)
             conditions = [
-                func.lower(Gun.name).like(pattern),
-                func.lower(Ammo.name).like(pattern),
-                cast(model.date, String).like(pattern)
+                search_condition(model.search_text, search),
+                search_condition(Gun.search_text, search),
+                search_condition(Ammo.search_text, search),
             ]
-            if hasattr(model, "notes"):
-                conditions.append(func.lower(func.coalesce(model.notes, "")).like(pattern))
-            if hasattr(model, "ai_comment"):
-                conditions.append(func.lower(func.coalesce(model.ai_comment, "")).like(pattern))
+            if conditions[0] is None:
+                return query
+            query = query.join(Gun, model.gun_id == Gun.id).join(Ammo, model.ammo_id == Ammo.id)
             return query.where(or_(*conditions))
         except Exception as e:
             logger.error(f"Błąd podczas aplikowania search: {e}", exc_info=True)
@@ -185,106 +198,82 @@ class ShootingSessionsService:
             return query
 
     @staticmethod
-    def _get_gun(session: Session, gun_id: str, user: UserContext) -> Optional[Gun]:
+    async def _get_gun(session: AsyncSession, gun_id: str, user: UserContext) -> Optional[Gun]:
         query = select(Gun).where(Gun.id == gun_id)
         if user.role != UserRole.admin:
             query = query.where(Gun.user_id == user.user_id)
-        return session.exec(query).first()
+        return (await session.exec(query)).first()
 
     @staticmethod
-    def _get_ammo(session: Session, ammo_id: str, user: UserContext) -> Optional[Ammo]:
+    async def _get_ammo(session: AsyncSession, ammo_id: str, user: UserContext) -> Optional[Ammo]:
         query = select(Ammo).where(Ammo.id == ammo_id)
         if user.role != UserRole.admin:
             query = query.where(Ammo.user_id == user.user_id)
-        return session.exec(query).first()
+        return (await session.exec(query)).first()
 
     @staticmethod
-    async def get_all_sessions(
-        session: Session,
-        user: UserContext,
-        limit: int,
-        offset: int,
-        search: Optional[str],
+    def _apply_session_filters(
+        query,
         gun_id: Optional[str] = None,
         date_from: Optional[str] = None,
         date_to: Optional[str] = None
-    ) -> Dict[str, Any]:
-        base_query = ShootingSessionsService._query_for_user(ShootingSession, user)
-        
+    ):
         if gun_id:
-            base_query = base_query.where(ShootingSession.gun_id == gun_id)
-        
+            query = query.where(ShootingSession.gun_id == gun_id)
+
         if date_from:
             try:
                 date_from_parsed = datetime.strptime(date_from, "%Y-%m-%d").date()
-                base_query = base_query.where(ShootingSession.date >= date_from_parsed)
+                query = query.where(ShootingSession.date >= date_from_parsed)
             except ValueError:
                 pass
-        
+
         if date_to:
             try:
                 date_to_parsed = datetime.strptime(date_to, "%Y-%m-%d").date()
-                base_query = base_query.where(ShootingSession.date <= date_to_parsed)
+                query = query.where(ShootingSession.date <= date_to_parsed)
             except ValueError:
                 pass
+
+        return query
+
+    @staticmethod
+    async def get_all_sessions(
+        session: AsyncSession,
+        user: UserContext,
+        limit: int,
+        offset: int,
+        search: Optional[str],
+        gun_id: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> Dict[str, Any]:
+        base_query = ShootingSessionsService._query_for_user(ShootingSession, user)
+        base_query = ShootingSessionsService._apply_session_filters(base_query, gun_id, date_from, date_to)
         
         query = ShootingSessionsService._apply_session_search(base_query, ShootingSession, search)
         
-        # Dla SQLite, gdy mamy join (search), liczymy przez wykonanie query
-        if search:
-            # Gdy jest search, query ma join - wykonaj query i policz w Pythonie
-            try:
-                all_items = session.exec(query).all()
-                total = len(all_items)
-                items = sorted(all_items, key=lambda x: x.date, reverse=True)[offset:offset + limit]
-            except Exception as e:
-                logger.error(f"Błąd podczas wykonywania zapytania z search: {e}", exc_info=True)
-                return {"total": 0, "items": []}
-        else:
-            # Gdy nie ma search, użyj prostego count (dla kompatybilności z SQLite)
-            count_query = select(func.count(ShootingSession.id))
-            if user.role != UserRole.admin:
-                count_query = count_query.where(ShootingSession.user_id == user.user_id)
-            if gun_id:
-                count_query = count_query.where(ShootingSession.gun_id == gun_id)
-            if date_from:
-                try:
-                    date_from_parsed = datetime.strptime(date_from, "%Y-%m-%d").date()
-                    count_query = count_query.where(ShootingSession.date >= date_from_parsed)
-                except ValueError:
-                    pass
-            if date_to:
-                try:
-                    date_to_parsed = datetime.strptime(date_to, "%Y-%m-%d").date()
-                    count_query = count_query.where(ShootingSession.date <= date_to_parsed)
-                except ValueError:
-                    pass
-            try:
-                total = session.exec(count_query).one()
-            except Exception as e:
-                logger.error(f"Błąd podczas liczenia sesji: {e}", exc_info=True)
-                total = 0
-            
-            items = session.exec(
-                query.order_by(ShootingSession.date.desc())
-                     .offset(offset)
-                     .limit(limit)
-            ).all()
-
-        return {
-            "total": total,
-            "items": items
-        }
+        return await paginate(
+            session,
+            query,
+            ShootingSessionsService.LIST_ORDER,
+            limit,
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total
+        )
 
     @staticmethod
     async def create_shooting_session(
-        session: Session,
+        session: AsyncSession,
         user: UserContext,
         data: Any
     ) -> Dict[str, Any]:
         parsed_date = SessionCalculationService.parse_date(data.date, allow_future=False)
-        gun = ShootingSessionsService._get_gun(session, data.gun_id, user)
-        ammo = ShootingSessionsService._get_ammo(session, data.ammo_id, user)
+        gun = await ShootingSessionsService._get_gun(session, data.gun_id, user)
+        ammo = await ShootingSessionsService._get_ammo(session, data.ammo_id, user)
         
         hits = data.hits if data.hits is not None else None
         SessionValidationService.validate_session_data(gun, ammo, data.shots, hits)
@@ -327,9 +316,12 @@ class ShootingSessionsService:
         session.add(new_session)
         session.add(ammo)
         session.add(gun)
-        session.commit()
-        session.refresh(new_session)
-        MaintenanceService.update_last_maintenance_rounds(session, user, data.gun_id)
+        await SessionSummaryService.apply_delta(session, session_snapshot(new_session), 1)
+        await AccuracyHistogramService.apply_delta(session, new_session.user_id, session_accuracy_bucket(new_session), 1)
+        await GunRoundCounterService.apply_delta(session, session_snapshot(new_session), 1)
+        await session.commit()
+        AmmoForecastService.invalidate(new_session.ammo_id)
+        await session.refresh(new_session)
         
         return {
             "session": new_session,
@@ -338,52 +330,36 @@ class ShootingSessionsService:
 
     @staticmethod
     async def get_monthly_summary(
-        session: Session,
+        session: AsyncSession,
         user: UserContext,
         limit: int,
         offset: int,
-        search: Optional[str]
+        search: Optional[str],
+        gun_id: Optional[str] = None,
+        ammo_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        query = ShootingSessionsService._query_for_user(ShootingSession, user)
-
-        sessions = session.exec(query).all()
-        if not sessions:
-            return {"total": 0, "items": []}
-
-        cost_summary = defaultdict(float)
-        shot_summary = defaultdict(int)
-
-        for session_data in sessions:
-            month_key = session_data.date.strftime("%Y-%m")
-            if session_data.cost:
-                cost_summary[month_key] += float(session_data.cost)
-            shot_summary[month_key] += session_data.shots
-
-        summary = [
-            {
-                "month": month,
-                "total_cost": round(cost_summary[month], 2),
-                "total_shots": shot_summary[month]
-            }
-            for month in sorted(cost_summary.keys())
-        ]
-
-        if search:
-            lowered = search.lower()
-            summary = [item for item in summary if lowered in item["month"].lower()]
-
-        total = len(summary)
-        items = summary[offset:offset + limit]
-        return {"total": total, "items": items}
+        # Odczyt z tabeli miesięcznych podsumowań utrzymywanej przy zapisie sesji
+        result = await SessionSummaryService.get_summary(session, user, limit, offset, search, gun_id, ammo_id)
+        items = result["items"]
+        user_settings = await UserSettingsService.get_settings(session, user)
+        currency = (user_settings.currency or "pln").upper()
+        # Suma miesiąca po kursie z jego ostatniego dnia (bieżący miesiąc - z dzisiaj)
+        today = date.today()
+        month_ends = [min(today, _month_end(item["month"])) for item in items]
+        converted = await convert_pln_amounts(session, [item["total_cost"] for item in items], currency, days=month_ends)
+        for item, total in zip(items, converted):
+            item["total_cost_converted"] = total
+            item["currency"] = currency
+        return result
 
     @staticmethod
     async def update_shooting_session(
-        session: Session,
+        session: AsyncSession,
         session_id: str,
         user: UserContext,
         data: Any
     ) -> Dict[str, Any]:
-        ss = session.get(ShootingSession, session_id)
+        ss = await session.get(ShootingSession, session_id)
         if not ss:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -396,6 +372,8 @@ class ShootingSessionsService:
         if not update_dict:
             return {"session": ss, "remaining_ammo": None}
 
+        old_snapshot = session_snapshot(ss)
+        old_bucket = session_accuracy_bucket(ss)
         old_shots = ss.shots
         old_ammo_id = ss.ammo_id
         old_gun_id = ss.gun_id
@@ -426,8 +404,8 @@ class ShootingSessionsService:
         new_hits = update_dict.get("hits", ss.hits)
 
         if "gun_id" in update_dict or "ammo_id" in update_dict or "shots" in update_dict or "hits" in update_dict:
-            gun = ShootingSessionsService._get_gun(session, new_gun_id, user)
-            ammo = ShootingSessionsService._get_ammo(session, new_ammo_id, user)
+            gun = await ShootingSessionsService._get_gun(session, new_gun_id, user)
+            ammo = await ShootingSessionsService._get_ammo(session, new_ammo_id, user)
             
             if not gun:
                 raise HTTPException(status_code=404, detail="Broń nie została znaleziona")
@@ -454,7 +432,7 @@ class ShootingSessionsService:
                     )
                 
                 if ammo_changed:
-                    old_ammo = ShootingSessionsService._get_ammo(session, old_ammo_id, user)
+                    old_ammo = await ShootingSessionsService._get_ammo(session, old_ammo_id, user)
                     if old_ammo and old_ammo.units_in_package is not None:
                         old_ammo.units_in_package += old_shots
                         session.add(old_ammo)
@@ -520,15 +498,15 @@ class ShootingSessionsService:
 
         if "cost" not in update_dict and ("shots" in update_dict or "ammo_id" in update_dict):
             if "ammo_id" in update_dict:
-                ammo = ShootingSessionsService._get_ammo(session, update_dict["ammo_id"], user)
+                ammo = await ShootingSessionsService._get_ammo(session, update_dict["ammo_id"], user)
             else:
-                ammo = ShootingSessionsService._get_ammo(session, new_ammo_id, user)
+                ammo = await ShootingSessionsService._get_ammo(session, new_ammo_id, user)
             if ammo:
                 final_shots = update_dict.get("shots", ss.shots)
                 old_cost = ss.cost if ss.cost else 0.0
                 old_ammo_cost = 0.0
                 if ss.ammo_id and ss.shots:
-                    old_ammo = ShootingSessionsService._get_ammo(session, ss.ammo_id, user)
+                    old_ammo = await ShootingSessionsService._get_ammo(session, ss.ammo_id, user)
                     if old_ammo:
                         old_ammo_cost = old_ammo.price_per_unit * ss.shots
                 fixed_cost = max(0.0, old_cost - old_ammo_cost)
@@ -539,12 +517,17 @@ class ShootingSessionsService:
             setattr(ss, key, value)
 
         session.add(ss)
-        session.commit()
-        session.refresh(ss)
+        await SessionSummaryService.replace(session, old_snapshot, session_snapshot(ss))
+        await AccuracyHistogramService.replace(session, ss.user_id, old_bucket, session_accuracy_bucket(ss))
+        await GunRoundCounterService.replace(session, old_snapshot, session_snapshot(ss))
+        await session.commit()
+        if old_snapshot != session_snapshot(ss):
+            AmmoForecastService.invalidate(old_ammo_id, ss.ammo_id)
+        await session.refresh(ss)
 
         remaining_ammo = None
         if new_ammo_id != old_ammo_id or new_shots != old_shots:
-            final_ammo = ShootingSessionsService._get_ammo(session, new_ammo_id, user)
+            final_ammo = await ShootingSessionsService._get_ammo(session, new_ammo_id, user)
             if final_ammo:
                 remaining_ammo = final_ammo.units_in_package
 
@@ -554,8 +537,8 @@ class ShootingSessionsService:
         }
 
     @staticmethod
-    async def delete_shooting_session(session: Session, session_id: str, user: UserContext) -> Dict[str, str]:
-        ss = session.get(ShootingSession, session_id)
+    async def delete_shooting_session(session: AsyncSession, session_id: str, user: UserContext) -> Dict[str, str]:
+        ss = await session.get(ShootingSession, session_id)
         if not ss:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -575,8 +558,12 @@ class ShootingSessionsService:
                 logger = logging.getLogger(__name__)
                 logger.warning(f"Nie udało się usunąć zdjęcia tarczy z Supabase: {str(e)}")
 
-        session.delete(ss)
-        session.commit()
+        await SessionSummaryService.apply_delta(session, session_snapshot(ss), -1)
+        await AccuracyHistogramService.apply_delta(session, ss.user_id, session_accuracy_bucket(ss), -1)
+        await GunRoundCounterService.apply_delta(session, session_snapshot(ss), -1)
+        await session.delete(ss)
+        await session.commit()
+        AmmoForecastService.invalidate(ss.ammo_id)
 
         return {"message": "Session deleted"}
 
@@ -16,6 +16,8 @@ class UserContext(BaseModel):
     role: UserRole
     is_guest: bool = False
     expires_at: Optional[datetime] = None
+    email: Optional[str] = None
+    username: Optional[str] = None
 
     @field_validator('expires_at', mode='before')
     @classmethod
@@ -26,6 +28,18 @@ class UserContext(BaseModel):
         return v
 
 
+def resolve_role(metadata: Optional[dict]) -> UserRole:
+    if not metadata:
+        return UserRole.user
+    value = metadata.get("role")
+    if not value:
+        return UserRole.user
+    try:
+        return UserRole(value)
+    except ValueError:
+        return UserRole.user
+
+
 def calculate_guest_expiration() -> datetime:
     ttl_hours = settings.guest_session_ttl_hours or 24
     return datetime.utcnow() + timedelta(hours=ttl_hours)
@@ -1,131 +1,86 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional, Dict, Any
-import asyncio
-from datetime import datetime
-from sqlalchemy import or_
-from fastapi import HTTPException
 from models import UserSettings
-from services.user_context import UserContext, UserRole
+from services.user_context import UserContext
+from services.ttl_cache import TTLCache
+from settings import settings as app_settings
+
+# Wartości przyjmowane, gdy użytkownik nie ma jeszcze wiersza albo kolumna jest pusta
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    "ai_mode": "off",
+    "theme": "dark",
+    "distance_unit": "m",
+    "maintenance_rounds_limit": 500,
+    "maintenance_days_limit": 90,
+    "maintenance_notifications_enabled": True,
+    "low_ammo_notifications_enabled": True,
+    "ai_analysis_intensity": "normalna",
+    "ai_auto_comments": False,
+    "language": "pl",
+    "currency": "pln",
+}
+
+# Zapisane wartości ustawień per użytkownik (pusty słownik = brak wiersza w bazie).
+# Unieważniany przy zapisie; TTL ogranicza nieaktualność między procesami.
+_settings_cache = TTLCache(app_settings.user_settings_cache_size, app_settings.user_settings_cache_ttl_seconds)
 
 
 class UserSettingsService:
     @staticmethod
-    async def get_settings(session: Session, user: UserContext) -> UserSettings:
-        query = select(UserSettings).where(UserSettings.user_id == user.user_id)
-        if user.is_guest:
-            query = query.where(or_(UserSettings.expires_at.is_(None), UserSettings.expires_at > datetime.utcnow()))
-        settings = await asyncio.to_thread(lambda: session.exec(query).first())
-        
-        if not settings:
-            existing_query = select(UserSettings).where(UserSettings.user_id == user.user_id)
-            existing = await asyncio.to_thread(lambda: session.exec(existing_query).first())
-            if existing:
-                needs_save = False
-                if user.is_guest:
-                    existing.expires_at = user.expires_at
-                    needs_save = True
-                else:
-                    existing.expires_at = None
-                    needs_save = True
-                
-                language_value = getattr(existing, 'language', None)
-                if language_value is None:
-                    try:
-                        existing.language = "pl"
-                        needs_save = True
-                    except Exception:
-                        pass
-                
-                if needs_save:
-                    session.add(existing)
-                    await asyncio.to_thread(session.commit)
-                    await asyncio.to_thread(session.refresh, existing)
-                return existing
-            
-            settings = UserSettings(
-                user_id=user.user_id,
-                ai_mode="off",
-                theme="dark",
-                distance_unit="m",
-                maintenance_rounds_limit=500,
-                maintenance_days_limit=90,
-                maintenance_notifications_enabled=True,
-                low_ammo_notifications_enabled=True,
-                ai_analysis_intensity="normalna",
-                ai_auto_comments=False,
-                language="pl",
-                currency="pln"
-            )
-            if user.is_guest:
-                settings.expires_at = user.expires_at
-            else:
-                settings.expires_at = None
-            session.add(settings)
-            await asyncio.to_thread(session.commit)
-            await asyncio.to_thread(session.refresh, settings)
-        else:
-            needs_save = False
-            if user.is_guest and settings.expires_at != user.expires_at:
-                settings.expires_at = user.expires_at
-                needs_save = True
-            elif not user.is_guest and settings.expires_at is not None:
-                settings.expires_at = None
-                needs_save = True
-            
-            language_value = getattr(settings, 'language', None)
-            if language_value is None:
-                try:
-                    settings.language = "pl"
-                    needs_save = True
-                except Exception:
-                    pass
-            
-            currency_value = getattr(settings, 'currency', None)
-            if currency_value is None:
-                try:
-                    settings.currency = "pln"
-                    needs_save = True
-                except Exception:
-                    pass
-            
-            if needs_save:
-                session.add(settings)
-                await asyncio.to_thread(session.commit)
-                await asyncio.to_thread(session.refresh, settings)
-        return settings
+    def _build(user: UserContext, stored: Dict[str, Any]) -> UserSettings:
+        """Składa ustawienia w pamięci: zapisane wartości, a w miejsce pustych - domyślne."""
+        values = dict(DEFAULT_SETTINGS)
+        for key, value in stored.items():
+            if key in values and value is not None:
+                values[key] = value
+        return UserSettings(
+            user_id=user.user_id,
+            expires_at=user.expires_at if user.is_guest else None,
+            **values
+        )
+
+    @staticmethod
+    async def _load_row(session: AsyncSession, user_id: str) -> Optional[UserSettings]:
+        query = select(UserSettings).where(UserSettings.user_id == user_id)
+        return (await session.exec(query)).first()
 
     @staticmethod
-    async def update_settings(session: Session, user: UserContext, data: Dict[str, Any]) -> UserSettings:
-        settings = await UserSettingsService.get_settings(session, user)
-        if "ai_mode" in data:
-            settings.ai_mode = data["ai_mode"]
-        if "theme" in data:
-            settings.theme = data["theme"]
-        if "distance_unit" in data:
-            settings.distance_unit = data["distance_unit"]
-        if "maintenance_rounds_limit" in data:
-            settings.maintenance_rounds_limit = data["maintenance_rounds_limit"]
-        if "maintenance_days_limit" in data:
-            settings.maintenance_days_limit = data["maintenance_days_limit"]
-        if "maintenance_notifications_enabled" in data:
-            settings.maintenance_notifications_enabled = data["maintenance_notifications_enabled"]
-        if "low_ammo_notifications_enabled" in data:
-            settings.low_ammo_notifications_enabled = data["low_ammo_notifications_enabled"]
-        if "ai_analysis_intensity" in data:
-            settings.ai_analysis_intensity = data["ai_analysis_intensity"]
-        if "ai_auto_comments" in data:
-            settings.ai_auto_comments = data["ai_auto_comments"]
-        if "language" in data:
-            settings.language = data["language"]
-        if "currency" in data:
-            settings.currency = data["currency"]
+    def invalidate_cache(user_id: str) -> None:
+        _settings_cache.invalidate(user_id)
+
+    @staticmethod
+    async def get_settings(session: AsyncSession, user: UserContext) -> UserSettings:
+        """
+        Ustawienia tylko do odczytu - nigdy nie zapisuje do bazy.
+
+        Zwracany obiekt nie jest związany z sesją; brakujący wiersz tworzy dopiero update_settings.
+        """
+        stored = _settings_cache.get(user.user_id)
+        if stored is None:
+            row = await UserSettingsService._load_row(session, user.user_id)
+            stored = row.model_dump(include=set(DEFAULT_SETTINGS)) if row else {}
+            _settings_cache.put(user.user_id, stored)
+        return UserSettingsService._build(user, stored)
+
+    @staticmethod
+    async def update_settings(session: AsyncSession, user: UserContext, data: Dict[str, Any]) -> UserSettings:
+        settings = await UserSettingsService._load_row(session, user.user_id)
+        if not settings:
+            settings = UserSettings(user_id=user.user_id, **DEFAULT_SETTINGS)
+        for key, default in DEFAULT_SETTINGS.items():
+            if key in data:
+                setattr(settings, key, data[key])
+            elif getattr(settings, key, None) is None:
+                setattr(settings, key, default)
         if user.is_guest:
             settings.expires_at = user.expires_at
         else:
             settings.expires_at = None
         session.add(settings)
-        await asyncio.to_thread(session.commit)
-        await asyncio.to_thread(session.refresh, settings)
+        try:
+            await session.commit()
+        finally:
+            UserSettingsService.invalidate_cache(user.user_id)
+        await session.refresh(settings)
         return settings
-
-
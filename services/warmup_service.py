@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Kroki rozgrzewki po starcie; aplikacja jest gotowa (GET /ready), gdy wymagane kroki się zakończyły
+REQUIRED_STEPS = ("schema", "rates_snapshot")
+OPTIONAL_STEPS = ("currency_rates", "rate_history", "maintenance_due", "ai_jobs")
+
+
+class WarmupState:
+    """Stan kroków rozgrzewki (pending/running/done/failed) z czasami wykonania."""
+
+    def __init__(self, required=REQUIRED_STEPS, optional=OPTIONAL_STEPS):
+        self._lock = threading.Lock()
+        self.required = tuple(required)
+        self.started_at = time.time()
+        self.steps: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "required": name in self.required}
+            for name in (*self.required, *optional)
+        }
+
+    def _update(self, name: str, **values: Any) -> None:
+        with self._lock:
+            self.steps.setdefault(name, {"required": name in self.required}).update(values)
+
+    async def run_step(self, name: str, step: Callable[[], Awaitable[Any]]) -> bool:
+        """Wykonuje krok i zapisuje wynik; błąd jest logowany, nie przerywa rozgrzewki."""
+        start = time.perf_counter()
+        self._update(name, status="running", error=None)
+        try:
+            await step()
+        except asyncio.CancelledError:
+            self._update(name, status="pending")
+            raise
+        except Exception as e:
+            duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            self._update(name, status="failed", error=str(e), duration_ms=duration_ms)
+            logger.error(f"[WARMUP] Krok {name} nie powiódł się po {duration_ms} ms: {e}", exc_info=True)
+            return False
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        self._update(name, status="done", duration_ms=duration_ms)
+        logger.info(f"[WARMUP] Krok {name} zakończony w {duration_ms} ms")
+        return True
+
+    def skip(self, name: str, reason: str) -> None:
+        self._update(name, status="skipped", error=reason)
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(self.steps[name]["status"] == "done" for name in self.required)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: dict(step) for name, step in self.steps.items()}
+        return {
+            "ready": all(steps[name]["status"] == "done" for name in self.required),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "steps": steps,
+        }
+
+
+warmup_state = WarmupState()
+_tasks: List[asyncio.Task] = []
+
+
+def get_warmup_state() -> WarmupState:
+    return warmup_state
+
+
+async def _check_schema() -> None:
+    # init_db sprawdza tabele i może wykonać ALTER TABLE - synchroniczny silnik, poza pętlą zdarzeń
+    from database import init_db
+    await asyncio.to_thread(init_db)
+
+
+async def _load_rates_snapshot() -> None:
+    from database import async_session_maker
+    from services.currency_service import load_rates_snapshot
+    async with async_session_maker() as session:
+        await load_rates_snapshot(session)
+
+
+async def _refresh_currency_rates() -> None:
+    """Pobiera kursy z NBP tylko, gdy w snapshocie brakuje dzisiejszych."""
+    from database import async_session_maker
+    from services.currency_service import fetch_and_save_currency_rates, get_rates_snapshot, SUPPORTED_CURRENCIES
+    today = date.today()
+    snapshot = get_rates_snapshot()
+    if all(snapshot.dates.get(code) == today for code in SUPPORTED_CURRENCIES):
+        logger.info("Currency rates already up to date")
+        return
+    async with async_session_maker() as session:
+        results = await fetch_and_save_currency_rates(session)
+    if not any(result.get("success") for result in results.values()):
+        raise RuntimeError("Could not fetch currency rates from NBP")
+    logger.info("Currency rates fetched on startup")
+
+
+async def _load_rate_history() -> None:
+    from database import async_session_maker
+    from services.currency_service import load_rate_history
+    async with async_session_maker() as session:
+        await load_rate_history(session)
+
+
+async def _start_maintenance_due() -> None:
+    # Okresowe przeliczanie broni wymagających konserwacji (GET /api/maintenance/due)
+    from services.maintenance_due_service import MaintenanceDueService
+    _tasks.append(asyncio.create_task(
+        MaintenanceDueService.run_periodically(settings.maintenance_due_interval_seconds)
+    ))
+
+
+async def _resume_ai_jobs() -> None:
+    # Zlecenia AI przerwane restartem wracają do kolejki
+    from services.ai_job_service import AIJobService
+    resumed = await AIJobService.resume_pending()
+    if resumed:
+        logger.info(f"[WARMUP] Wznowiono {resumed} zleceń AI")
+
+
+async def run_warmup(state: Optional[WarmupState] = None) -> None:
+    """
+    Rozgrzewka po starcie: schemat, snapshot kursów, potem równolegle kursy z NBP, historia kursów
+    i wznowienie przerwanych zleceń AI.
+    Kroki zależne od tabel nie startują, gdy sprawdzenie schematu się nie powiodło.
+    """
+    state = state or warmup_state
+    if not await state.run_step("schema", _check_schema):
+        for name in ("rates_snapshot", *OPTIONAL_STEPS):
+            state.skip(name, "schema check failed")
+        return
+
+    if settings.maintenance_due_interval_seconds > 0:
+        await state.run_step("maintenance_due", _start_maintenance_due)
+    else:
+        state.skip("maintenance_due", "disabled")
+
+    await state.run_step("rates_snapshot", _load_rates_snapshot)
+    await asyncio.gather(
+        state.run_step("currency_rates", _refresh_currency_rates),
+        state.run_step("rate_history", _load_rate_history),
+        state.run_step("ai_jobs", _resume_ai_jobs),
+    )
+
+
+def start_warmup() -> asyncio.Task:
+    """Uruchamia rozgrzewkę w tle - start aplikacji nie czeka na bazę ani NBP."""
+    task = asyncio.create_task(run_warmup())
+    _tasks.append(task)
+    return task
+
+
+async def stop_warmup() -> None:
+    """Anuluje rozgrzewkę i zadania okresowe (przy zamykaniu aplikacji)."""
+    tasks = list(_tasks)
+    _tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
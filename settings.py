@@ -4,13 +4,61 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     database_url: str | None = None
     openai_api_key: str | None = None
+    # Klient OpenAI: adres API (w testach lokalny serwer), timeouty i limit równoległych wywołań
+    openai_base_url: str | None = None
+    openai_connect_timeout_seconds: float = 5.0
+    openai_read_timeout_seconds: float = 60.0
+    openai_max_connections: int = 10
+    openai_max_concurrency: int = 4
+    # Kolejka zleceń AI: liczba workerów w procesie i maksymalna liczba oczekujących zleceń
+    ai_job_workers: int = 2
+    ai_job_queue_size: int = 100
+    # Zlecenie "running" starsze niż tyle sekund uznajemy za przerwane (proces padł) i wznawiamy przy starcie
+    ai_job_stale_seconds: int = 900
     supabase_url: str | None = None
     supabase_anon_key: str | None = None
     supabase_service_role_key: str | None = None
+    # Sekret JWT projektu Supabase (HS256); bez niego tokeny są weryfikowane kluczami z JWKS
+    supabase_jwt_secret: str | None = None
+    supabase_jwt_audience: str = "authenticated"
+    auth_jwks_cache_seconds: int = 600
+    # Nieznany `kid` odświeża JWKS najwyżej raz na tyle sekund - losowe kid nie wymuszą żądania na każdy token
+    auth_jwks_min_refresh_seconds: int = 60
+    auth_token_cache_size: int = 1024
+    auth_token_cache_ttl_seconds: int = 300
+    user_settings_cache_size: int = 4096
+    user_settings_cache_ttl_seconds: int = 60
+    ammo_forecast_cache_size: int = 4096
+    ammo_forecast_cache_ttl_seconds: int = 3600
+    # Cache komentarzy AI: warstwa LRU w procesie i tabela ai_comment_cache (0 wierszy = bez limitu)
+    ai_comment_cache_size: int = 2048
+    ai_comment_cache_ttl_seconds: int = 30 * 24 * 3600
+    ai_comment_cache_max_rows: int = 50000
+    ai_comment_cache_prune_seconds: int = 600
+    # Co ile sekund snapshot kursów walut jest przeładowywany z bazy (zapisy w innych procesach)
+    currency_rates_refresh_seconds: int = 3600
+    # Co ile sekund przeliczać tabelę maintenance_due (0 = wyłączone)
+    maintenance_due_interval_seconds: int = 900
     frontend_url: str | None = None
+    # API kursów NBP (w testach można wskazać lokalny serwer)
+    nbp_api_base_url: str = "https://api.nbp.pl/api/exchangerates"
+    nbp_timeout_seconds: float = 10.0
+    nbp_max_retries: int = 3
+    nbp_retry_backoff_seconds: float = 0.5
     debug: bool = False
     guest_session_ttl_hours: int = 24
 
+    # Pula połączeń (PostgreSQL)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int | None = None
+    # Tryb dla poolera transakcyjnego (PgBouncer, Supabase pooler :6543):
+    # NullPool po stronie aplikacji i brak cache prepared statements w asyncpg
+    db_pooler_mode: bool = False
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore", env_file_encoding="utf-8")
 
 
@@ -1,27 +1,49 @@
 import asyncio
 import pytest
-from sqlmodel import SQLModel, Session, create_engine
+import pytest_asyncio
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.pool import StaticPool
 
 
-@pytest.fixture(scope="function")
-def engine():
-    engine = create_engine(
-        "sqlite://",
+@pytest_asyncio.fixture(scope="function")
+async def engine():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool
     )
-    SQLModel.metadata.create_all(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
     try:
         yield engine
     finally:
-        SQLModel.metadata.drop_all(engine)
-        engine.dispose()
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.drop_all)
+        await engine.dispose()
 
 
-@pytest.fixture(scope="function")
-def session(engine):
-    with Session(engine) as session:
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    from services import user_settings_service, ammo_forecast_service, currency_service
+    from services.ai_comment_cache_service import AICommentCacheService
+
+    def _clear():
+        user_settings_service._settings_cache.clear()
+        AICommentCacheService.clear_memory()
+        ammo_forecast_service._rate_cache.clear()
+        currency_service._set_snapshot(currency_service.RatesSnapshot())
+        currency_service._set_history(currency_service.RateHistory())
+
+    _clear()
+    yield
+    _clear()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
 
 
@@ -30,14 +52,3 @@ def event_loop():
     loop = asyncio.new_event_loop()
     yield loop
     loop.close()
-
-
-
-
-
-
-
-
-
-
-
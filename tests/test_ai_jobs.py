@@ -0,0 +1,292 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select
+from models import Gun, Ammo, ShootingSession, AIJob
+from services import ai_job_service
+from services.ai_job_service import AIJobService
+from services.ai_service import AIService
+from services.user_context import UserContext, UserRole
+
+
+@pytest_asyncio.fixture
+async def ai_jobs(engine, monkeypatch):
+    """Workery pracują na testowej bazie; wywołanie modelu zastąpione licznikiem."""
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(ai_job_service, "_session_factory", lambda: maker)
+    monkeypatch.setattr(ai_job_service.settings, "ai_job_workers", 2)
+    monkeypatch.setattr(ai_job_service.settings, "ai_job_queue_size", 10)
+    calls = []
+
+    async def fake_generate_comment(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return f"Komentarz: {kwargs['hits']}/{kwargs['shots']}"
+
+    monkeypatch.setattr(AIService, "generate_comment", staticmethod(fake_generate_comment))
+    yield {"maker": maker, "calls": calls}
+    await AIJobService.stop_workers()
+
+
+async def _create_session(session: AsyncSession, user: UserContext, hits=8, distance_m=25.0) -> ShootingSession:
+    gun = Gun(name="Glock", caliber="9mm", type="pistolet", user_id=user.user_id)
+    ammo = Ammo(name="FMJ", price_per_unit=1.5, units_in_package=100, caliber="9mm", user_id=user.user_id)
+    session.add(gun)
+    session.add(ammo)
+    await session.commit()
+    ss = ShootingSession(
+        gun_id=gun.id, ammo_id=ammo.id, date=date(2026, 10, 1), shots=10,
+        hits=hits, distance_m=distance_m, user_id=user.user_id
+    )
+    session.add(ss)
+    await session.commit()
+    return ss
+
+
+async def _wait_finished(maker, job_id: str, timeout: float = 5.0) -> AIJob:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        await AIJobService.wait(job_id, 0.05)
+        async with maker() as db:
+            job = await db.get(AIJob, job_id)
+        if job.status in ai_job_service.FINISHED_STATUSES or loop.time() > deadline:
+            return job
+
+
+@pytest.mark.asyncio
+async def test_enqueue_returns_immediately_and_worker_saves_comment(session: AsyncSession, ai_jobs):
+    user = UserContext(user_id="user-1", role=UserRole.user)
+    ss = await _create_session(session, user)
+
+    job = await AIJobService.enqueue(session, user, ss.id)
+    assert job.status == "queued"
+
+    finished = await _wait_finished(ai_jobs["maker"], job.id)
+    assert finished.status == "done"
+    assert json.loads(finished.result) == {"ai_comment": "Komentarz: 8/10"}
+    assert finished.started_at is not None and finished.finished_at is not None
+
+    async with ai_jobs["maker"]() as db:
+        saved = await db.get(ShootingSession, ss.id)
+    assert saved.ai_comment == "Komentarz: 8/10"
+    assert saved.accuracy_percent == 80.0
+
+
+@pytest.mark.asyncio
+async def test_job_failure_keeps_http_status(session: AsyncSession, ai_jobs):
+    user = UserContext(user_id="user-2", role=UserRole.user)
+    ss = await _create_session(session, user, hits=None)
+
+    job = await AIJobService.enqueue(session, user, ss.id)
+    finished = await _wait_finished(ai_jobs["maker"], job.id)
+
+    assert finished.status == "failed"
+    assert finished.error_status == 400
+    assert "liczbę trafień" in finished.error
+    assert ai_jobs["calls"] == []
+
+
+@pytest.mark.asyncio
+async def test_enqueue_validates_before_queueing(session: AsyncSession, ai_jobs):
+    owner = UserContext(user_id="user-3", role=UserRole.user)
+    ss = await _create_session(session, owner)
+    no_distance = await _create_session(session, owner, distance_m=None)
+
+    with pytest.raises(HTTPException) as exc:
+        await AIJobService.enqueue(session, UserContext(user_id="guest-1", role=UserRole.guest, is_guest=True), ss.id)
+    assert exc.value.status_code == 403
+    with pytest.raises(HTTPException) as exc:
+        await AIJobService.enqueue(session, UserContext(user_id="user-4", role=UserRole.user), ss.id)
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException) as exc:
+        await AIJobService.enqueue(session, owner, no_distance.id)
+    assert exc.value.status_code == 400
+
+    job = await AIJobService.enqueue(session, owner, ss.id)
+    with pytest.raises(HTTPException) as exc:
+        await AIJobService.get_job(session, UserContext(user_id="user-4", role=UserRole.user), job.id)
+    assert exc.value.status_code == 404
+    admin_view = await AIJobService.get_job(session, UserContext(user_id="admin-1", role=UserRole.admin), job.id)
+    assert admin_view.id == job.id
+    assert (await _wait_finished(ai_jobs["maker"], job.id)).status == "done"
+
+
+@pytest.mark.asyncio
+async def test_queue_full_returns_503(session: AsyncSession, ai_jobs, monkeypatch):
+    monkeypatch.setattr(ai_job_service.settings, "ai_job_workers", 1)
+    monkeypatch.setattr(ai_job_service.settings, "ai_job_queue_size", 1)
+    release = asyncio.Event()
+
+    async def blocked_generate_comment(**kwargs):
+        await release.wait()
+        return "Komentarz"
+
+    monkeypatch.setattr(AIService, "generate_comment", staticmethod(blocked_generate_comment))
+    user = UserContext(user_id="user-5", role=UserRole.user)
+    ss = await _create_session(session, user)
+
+    first = await AIJobService.enqueue(session, user, ss.id)
+    while ai_job_service._queue.qsize():
+        await asyncio.sleep(0.01)  # worker zabrał pierwsze zlecenie
+    second = await AIJobService.enqueue(session, user, ss.id)
+    with pytest.raises(HTTPException) as exc:
+        await AIJobService.enqueue(session, user, ss.id)
+    assert exc.value.status_code == 503
+
+    release.set()
+    assert (await _wait_finished(ai_jobs["maker"], first.id)).status == "done"
+    assert (await _wait_finished(ai_jobs["maker"], second.id)).status == "done"
+
+
+@pytest.mark.asyncio
+async def test_resume_pending_requeues_interrupted_jobs(session: AsyncSession, ai_jobs):
+    user = UserContext(user_id="user-6", role=UserRole.user)
+    ss = await _create_session(session, user)
+    interrupted = AIJob(
+        session_id=ss.id, user_id=user.user_id, status="running", started_at=datetime.utcnow() - timedelta(hours=1)
+    )
+    # Wykonywane właśnie przez inny, działający worker - zostaje nietknięte
+    running = AIJob(session_id=ss.id, user_id=user.user_id, status="running", started_at=datetime.utcnow())
+    finished = AIJob(session_id=ss.id, user_id=user.user_id, status="done", result='{"ai_comment": "stary"}')
+    session.add_all([interrupted, running, finished])
+    await session.commit()
+
+    assert await AIJobService.resume_pending() == 1
+
+    job = await _wait_finished(ai_jobs["maker"], interrupted.id)
+    assert job.status == "done"
+    assert len(ai_jobs["calls"]) == 1
+    async with ai_jobs["maker"]() as db:
+        assert (await db.get(AIJob, running.id)).status == "running"
+
+
+@pytest.mark.asyncio
+async def test_job_in_two_queues_runs_once(session: AsyncSession, ai_jobs):
+    user = UserContext(user_id="user-7", role=UserRole.user)
+    ss = await _create_session(session, user)
+    job = AIJob(session_id=ss.id, user_id=user.user_id, role=user.role.value)
+    session.add(job)
+    await session.commit()
+
+    # To samo zlecenie wznowione przez dwa procesy - przejmuje je tylko jeden
+    await asyncio.gather(AIJobService.run_job(job.id), AIJobService.run_job(job.id))
+    assert len(ai_jobs["calls"]) == 1
+    assert (await _wait_finished(ai_jobs["maker"], job.id)).status == "done"
+
+
+@pytest.mark.asyncio
+async def test_wait_rechecks_status_and_releases_waiter(session: AsyncSession, ai_jobs):
+    user = UserContext(user_id="user-8", role=UserRole.user)
+    ss = await _create_session(session, user)
+    done = AIJob(session_id=ss.id, user_id=user.user_id, status="done", result='{"ai_comment": "gotowe"}')
+    queued = AIJob(session_id=ss.id, user_id=user.user_id)
+    session.add_all([done, queued])
+    await session.commit()
+
+    # Zakończone przed rejestracją - bez czekania na timeout
+    assert await AIJobService.wait(done.id, 30) is True
+    assert await AIJobService.wait(queued.id, 0.01) is False
+    assert ai_job_service._waiters == {}
+
+
+@pytest.mark.asyncio
+async def test_generate_ai_comment_urls_are_followable(session: AsyncSession, ai_jobs):
+    import httpx
+    from main import app
+    from database import get_async_session
+    from routers.auth import get_user_context
+
+    user = UserContext(user_id="user-9", role=UserRole.user)
+    ss = await _create_session(session, user)
+
+    async def _test_session():
+        async with ai_jobs["maker"]() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = _test_session
+    app.dependency_overrides[get_user_context] = lambda: user
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(f"/api/shooting-sessions/{ss.id}/generate-ai-comment")
+            assert response.status_code == 202
+            created = response.json()
+            assert created["status_url"] == f"http://test/api/shooting-sessions/ai-jobs/{created['job_id']}"
+            assert created["events_url"] == created["status_url"] + "/events"
+
+            await _wait_finished(ai_jobs["maker"], created["job_id"])
+            status = await client.get(created["status_url"])
+            assert status.status_code == 200
+            assert status.json()["status"] == "done"
+            events = await client.get(created["events_url"])
+            assert events.status_code == 200
+            assert "event: done" in events.text
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_vision_hits_update_histogram_and_rank(session: AsyncSession, ai_jobs, monkeypatch):
+    from models import User
+    from schemas.shooting_sessions import ShootingSessionCreate
+    from services.rank_service import count_passed_sessions
+    from services.shooting_sessions_service import ShootingSessionsService
+
+    user = UserContext(user_id="user-10", role=UserRole.user)
+    session.add(User(user_id=user.user_id, skill_level="beginner", rank="Nowicjusz"))
+    ss = await _create_session(session, user, hits=None)
+    for day in range(1, 5):
+        await ShootingSessionsService.create_shooting_session(session, user, ShootingSessionCreate(
+            gun_id=ss.gun_id, ammo_id=ss.ammo_id, date=f"2026-09-0{day}", shots=10, hits=8, distance_m=25
+        ))
+    ss.target_image_path = "targets/user-10.jpg"
+    session.add(ss)
+    await session.commit()
+
+    async def fake_image(path):
+        return "base64-image"
+
+    async def fake_vision(**kwargs):
+        return {"hits": 9, "accuracy": 90.0, "comment": "Dobre skupienie"}
+
+    monkeypatch.setattr(AIJobService, "_load_target_image", staticmethod(fake_image))
+    monkeypatch.setattr(AIService, "analyze_target_with_vision", staticmethod(fake_vision))
+
+    job = await AIJobService.enqueue(session, user, ss.id)
+    assert (await _wait_finished(ai_jobs["maker"], job.id)).status == "done"
+
+    # Sesja oceniona przez Vision przekracza próg i od razu liczy się do rangi (piąta zaliczona)
+    async with ai_jobs["maker"]() as db:
+        owner = (await db.exec(select(User).where(User.user_id == user.user_id))).one()
+        assert await count_passed_sessions(owner, db) == 5
+        assert owner.rank == "Adepciak"
+
+
+@pytest.mark.asyncio
+async def test_queue_filled_during_commit_fails_job_with_503(session: AsyncSession, ai_jobs, monkeypatch):
+    user = UserContext(user_id="user-11", role=UserRole.user)
+    ss = await _create_session(session, user)
+    queue = AIJobService._ensure_workers()
+    original_commit = session.commit
+
+    def put_into_full_queue(item):
+        raise asyncio.QueueFull()
+
+    async def commit_while_queue_fills():
+        # Równoległe żądanie zajmuje ostatnie miejsce, zanim to zdąży wstawić swoje zlecenie
+        monkeypatch.setattr(queue, "put_nowait", put_into_full_queue)
+        await original_commit()
+
+    monkeypatch.setattr(session, "commit", commit_while_queue_fills)
+    with pytest.raises(HTTPException) as exc:
+        await AIJobService.enqueue(session, user, ss.id)
+    assert exc.value.status_code == 503
+
+    async with ai_jobs["maker"]() as db:
+        [job] = (await db.exec(select(AIJob).where(AIJob.user_id == user.user_id))).all()
+    assert (job.status, job.error_status) == ("failed", 503)
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from models import Gun
+from services import ai_service
+from services.ai_service import AIService, close_ai_clients
+from services.ai_comment_cache_service import AICommentCacheService, accuracy_bucket
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    """Lokalny serwer udający /v1/chat/completions; zapisuje żądania i liczbę równoległych wywołań."""
+    seen = {"requests": [], "connections": set(), "active": 0, "max_active": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                seen["requests"].append((self.path, payload["model"], self.headers.get("Authorization")))
+                seen["connections"].add(self.client_address)
+                seen["active"] += 1
+                seen["max_active"] = max(seen["max_active"], seen["active"])
+            time.sleep(0.05)
+            with lock:
+                seen["active"] -= 1
+            body = json.dumps({
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": payload["model"],
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Dobra seria, pilnuj oddechu przy spuście."},
+                }],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ai_service.settings, "openai_base_url", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(ai_service.settings, "openai_max_concurrency", 2)
+    yield seen
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_generate_comment_reuses_client_and_bounds_concurrency(openai_stub):
+    gun = Gun(name="Stub Gun", caliber="9mm", user_id="user-1")
+    try:
+        first = await AIService.generate_comment(gun, 25, 8, 10, 80.0, api_key="test-key-123")
+        client = ai_service._clients["test-key-123"]
+        # Różne wyniki - każde wywołanie omija cache komentarzy
+        comments = await asyncio.gather(*(
+            AIService.generate_comment(gun, 25, hits, 10, hits * 10.0, api_key="test-key-123") for hits in range(6)
+        ))
+        assert ai_service._clients["test-key-123"] is client
+    finally:
+        await close_ai_clients()
+
+    assert first == "Dobra seria, pilnuj oddechu przy spuście."
+    assert set(comments) == {first}
+    assert len(openai_stub["requests"]) == 7
+    assert openai_stub["requests"][0] == ("/v1/chat/completions", "gpt-4o-mini", "Bearer test-key-123")
+    assert openai_stub["max_active"] <= 2
+    # Połączenia keep-alive z puli - nie po jednym na wywołanie
+    assert len(openai_stub["connections"]) <= 2
+    assert ai_service._clients == {}
+
+
+def test_accuracy_bucket():
+    assert [accuracy_bucket(value) for value in (0, 4.9, 5.0, 72.5, 100, 120, None)] == [0, 0, 5, 70, 100, 100, 0]
+
+
+@pytest.mark.asyncio
+async def test_generate_comment_served_from_cache(session: AsyncSession, openai_stub):
+    from models import AICommentCache
+
+    gun = Gun(name="Glock Jana", type="pistolet", caliber="9 mm", user_id="user-1")
+    other_gun = Gun(name="Inna nazwa", type="Pistolet", caliber="9MM", user_id="user-2")
+    try:
+        first = await AIService.generate_comment(gun, 25, 8, 10, 80.0, api_key="test-key-123", session=session)
+        # Inna nazwa broni i zapis kalibru - ten sam odcisk, bez wywołania modelu
+        second = await AIService.generate_comment(other_gun, 25, 8, 10, 80.0, api_key="test-key-123", session=session)
+        assert second == first
+        assert len(openai_stub["requests"]) == 1
+        assert "Glock Jana" not in json.dumps(openai_stub["requests"])
+
+        # Po restarcie procesu (pusta warstwa w pamięci) komentarz przychodzi z tabeli
+        AICommentCacheService.clear_memory()
+        third = await AIService.generate_comment(gun, 25, 8, 10, 80.0, api_key=None, session=session)
+        assert third == first
+        assert len(openai_stub["requests"]) == 1
+    finally:
+        await close_ai_clients()
+
+    stats = AICommentCacheService.stats()
+    assert (stats["memory_hits"], stats["db_hits"], stats["misses"]) == (0, 1, 0)
+    [row] = (await session.exec(select(AICommentCache))).all()
+    assert row.hit_count == 1 and row.comment == first
+
+
+@pytest.mark.asyncio
+async def test_comment_cache_table_is_capped(session: AsyncSession, monkeypatch):
+    from models import AICommentCache
+
+    monkeypatch.setattr(ai_service.settings, "ai_comment_cache_max_rows", 2)
+    monkeypatch.setattr(ai_service.settings, "ai_comment_cache_prune_seconds", 0)
+    for index in range(4):
+        await AICommentCacheService.put(session, f"fp-{index}", f"komentarz {index}", "pl")
+    rows = (await session.exec(select(AICommentCache.fingerprint).order_by(AICommentCache.fingerprint))).all()
+    assert rows == ["fp-2", "fp-3"]
+
+
+@pytest.mark.asyncio
+async def test_comment_cache_prunes_periodically_and_db_hit_does_not_commit(session: AsyncSession, monkeypatch):
+    from models import AICommentCache
+
+    monkeypatch.setattr(ai_service.settings, "ai_comment_cache_prune_seconds", 3600)
+    prunes = []
+
+    async def fake_prune(db, now=None):
+        prunes.append(now)
+
+    monkeypatch.setattr(AICommentCacheService, "prune", staticmethod(fake_prune))
+    for index in range(3):
+        await AICommentCacheService.put(session, f"fp-{index}", f"komentarz {index}", "pl")
+    assert len(prunes) == 1
+
+    AICommentCacheService.clear_memory()
+    commits = []
+    monkeypatch.setattr(session, "commit", lambda: commits.append(1))
+    assert await AICommentCacheService.get(session, "fp-1") == "komentarz 1"
+    assert commits == []
+    # Licznik trafień czeka w transakcji wywołującego
+    row = (await session.exec(select(AICommentCache).where(AICommentCache.fingerprint == "fp-1"))).one()
+    await session.refresh(row)
+    assert row.hit_count == 1
@@ -1,5 +1,5 @@
 import pytest
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models import Ammo
 from services.ammo_service import AmmoService
 from services.user_context import UserContext, UserRole
@@ -7,7 +7,7 @@ from schemas.ammo import AmmoCreate
 
 
 @pytest.mark.asyncio
-async def test_create_and_list_ammo_user(session: Session):
+async def test_create_and_list_ammo_user(session: AsyncSession):
     user = UserContext(user_id="user-1", role=UserRole.user)
     ammo_data = AmmoCreate(name="FMJ 9mm", caliber="9mm", price_per_unit=0.5, units_in_package=100)
 
@@ -21,7 +21,7 @@ async def test_create_and_list_ammo_user(session: Session):
 
 
 @pytest.mark.asyncio
-async def test_add_ammo_quantity_guest(session: Session):
+async def test_add_ammo_quantity_guest(session: AsyncSession):
     guest = UserContext(user_id="guest-1", role=UserRole.guest, is_guest=True)
     ammo_data = AmmoCreate(name="Guest Ammo", caliber="5.56", price_per_unit=1.2, units_in_package=50)
 
@@ -41,3 +41,64 @@ async def test_add_ammo_quantity_guest(session: Session):
 
 
 
+
+
+def test_consumption_rates_weight_recent_days():
+    from datetime import date, timedelta
+    from services.ammo_forecast_service import consumption_rates, MIN_HISTORY_DAYS
+
+    today = date(2025, 6, 1)
+    steady = [("steady", today - timedelta(days=d), 10) for d in range(60)]
+    rates = consumption_rates(["steady", "recent", "unused"], steady + [("recent", today, 70)], today)
+    assert rates["steady"] == pytest.approx(10.0)
+    # Jedna sesja jest rozkładana co najmniej na MIN_HISTORY_DAYS dni
+    assert 0 < rates["recent"] < 70 / MIN_HISTORY_DAYS * 2
+    assert rates["unused"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_ammo_forecast_is_cached_until_sessions_change(session: AsyncSession, engine):
+    from datetime import date, timedelta
+    from sqlalchemy import event
+    from models import Gun
+    from schemas.shooting_sessions import ShootingSessionCreate
+    from services.ammo_forecast_service import AmmoForecastService
+    from services.shooting_sessions_service import ShootingSessionsService
+
+    user = UserContext(user_id="forecast-1", role=UserRole.user)
+    gun = Gun(name="Forecast Gun", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="Forecast Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    session.add_all([gun, ammo])
+    await session.commit()
+    for days_ago in range(30):
+        await ShootingSessionsService.create_shooting_session(session, user, ShootingSessionCreate(
+            gun_id=gun.id, ammo_id=ammo.id, date=(date.today() - timedelta(days=days_ago)).isoformat(), shots=20
+        ))
+
+    [forecast] = await AmmoForecastService.get_forecasts(session, user)
+    assert forecast["units_in_package"] == 400
+    assert forecast["daily_rate"] == pytest.approx(20.0)
+    assert forecast["days_until_empty"] == 20
+    assert not forecast["reorder_suggested"]
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        await AmmoForecastService.get_forecasts(session, user)
+        assert not any("shooting_sessions" in statement for statement in statements)
+        await ShootingSessionsService.create_shooting_session(session, user, ShootingSessionCreate(
+            gun_id=gun.id, ammo_id=ammo.id, date=date.today().isoformat(), shots=200
+        ))
+        statements.clear()
+        [forecast] = await AmmoForecastService.get_forecasts(session, user)
+        assert any("shooting_sessions" in statement for statement in statements)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+
+    assert forecast["daily_rate"] > 20.0
+    assert forecast["reorder_suggested"] and forecast["low_stock_alert"]
+    assert forecast["suggested_quantity"] > 0
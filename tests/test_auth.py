@@ -0,0 +1,121 @@
+import time
+import jwt
+import pytest
+from services import auth_token_service
+from services.auth_token_service import TokenCache, authenticate_token
+from services.exceptions import UnauthorizedError
+from services.user_context import UserContext, UserRole
+from settings import settings
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+
+
+def _token(exp_in: int = 3600, **claims) -> str:
+    payload = {
+        "sub": "user-1",
+        "aud": "authenticated",
+        "email": "jan@example.com",
+        "exp": int(time.time()) + exp_in,
+        "user_metadata": {"username": "jan", "role": "admin"},
+        **claims
+    }
+    return jwt.encode(payload, SECRET, algorithm="HS256")
+
+
+@pytest.fixture
+def local_auth(monkeypatch):
+    monkeypatch.setattr(settings, "supabase_jwt_secret", SECRET)
+    cache = TokenCache(max_size=2, ttl_seconds=300)
+    monkeypatch.setattr(auth_token_service, "token_cache", cache)
+    return cache
+
+
+async def _remote_lookup_forbidden(token: str) -> UserContext:
+    raise AssertionError("Token powinien zostać zweryfikowany lokalnie")
+
+
+@pytest.mark.asyncio
+async def test_token_verified_locally_and_cached(local_auth, monkeypatch):
+    token = _token()
+    user = await authenticate_token(token, _remote_lookup_forbidden)
+    assert user.user_id == "user-1"
+    assert user.username == "jan"
+    assert user.role == UserRole.admin
+    assert len(local_auth) == 1
+
+    # Drugie żądanie nie dekoduje tokena ponownie
+    def _fail(*args, **kwargs):
+        raise AssertionError("Token powinien pochodzić z cache")
+    monkeypatch.setattr(auth_token_service.jwt, "decode", _fail)
+    assert (await authenticate_token(token, _remote_lookup_forbidden)).user_id == "user-1"
+
+
+@pytest.mark.asyncio
+async def test_invalid_and_expired_tokens_are_rejected(local_auth):
+    with pytest.raises(UnauthorizedError):
+        await authenticate_token(_token(exp_in=-10), _remote_lookup_forbidden)
+    forged = jwt.encode({"sub": "x", "aud": "authenticated", "exp": int(time.time()) + 60}, "other-secret-with-at-least-32-bytes", algorithm="HS256")
+    with pytest.raises(UnauthorizedError):
+        await authenticate_token(forged, _remote_lookup_forbidden)
+    assert len(local_auth) == 0
+
+
+def test_token_cache_honors_exp_and_size():
+    cache = TokenCache(max_size=2, ttl_seconds=300)
+    user = UserContext(user_id="u", role=UserRole.user)
+    cache.put("expiring", user, time.time() - 1)
+    assert cache.get("expiring") is None
+
+    cache.put("a", user, None)
+    cache.put("b", user, None)
+    cache.get("a")
+    cache.put("c", user, None)
+    assert cache.get("b") is None
+    assert cache.get("a") is user and cache.get("c") is user
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_remote_lookup_used_without_local_key(monkeypatch):
+    monkeypatch.setattr(settings, "supabase_jwt_secret", None)
+    monkeypatch.setattr(settings, "supabase_url", None)
+    monkeypatch.setattr(auth_token_service, "token_cache", TokenCache(max_size=10, ttl_seconds=300))
+    calls = []
+
+    async def remote(token: str) -> UserContext:
+        calls.append(token)
+        return UserContext(user_id="remote-user", role=UserRole.user)
+
+    token = _token()
+    assert (await authenticate_token(token, remote)).user_id == "remote-user"
+    assert (await authenticate_token(token, remote)).user_id == "remote-user"
+    assert calls == [token]
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refreshes_jwks_once(monkeypatch):
+    class _Key:
+        def __init__(self, kid):
+            self.key_id, self.key = kid, f"key-{kid}"
+
+    class _Client:
+        fetches = 0
+
+        def get_signing_keys(self, refresh=False):
+            _Client.fetches += 1
+            return [_Key("known")]
+
+    monkeypatch.setattr(auth_token_service, "_get_jwks_client", lambda: _Client())
+    monkeypatch.setattr(auth_token_service, "_signing_keys", {})
+    monkeypatch.setattr(auth_token_service, "_jwks_refresh", {"at": 0.0, "failed": False})
+
+    for index in range(5):
+        with pytest.raises(jwt.PyJWKClientError):
+            await auth_token_service._get_signing_key(f"random-{index}")
+    assert _Client.fetches == 1
+    # Klucz z pobranego zestawu jest dostępny bez kolejnego żądania
+    assert await auth_token_service._get_signing_key("known") == "key-known"
+    assert _Client.fetches == 1
+    assert set(auth_token_service._signing_keys) == {"known"}
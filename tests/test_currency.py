@@ -0,0 +1,279 @@
+import json
+import threading
+import pytest
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import CurrencyRate
+from services import currency_service
+from services.currency_service import (
+    RateHistory,
+    RateSeries,
+    backfill_currency_rates,
+    close_http_client,
+    convert_batch,
+    convert_currency,
+    convert_currency_on,
+    fetch_and_save_currency_rates,
+    get_rate_history,
+    get_rates_snapshot,
+    load_rates_snapshot,
+    update_currency_rate,
+)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_loads_latest_rates_and_converts_without_queries(session: AsyncSession, engine):
+    session.add_all([
+        CurrencyRate(code="USD", rate=3.9, date=date(2025, 1, 1)),
+        CurrencyRate(code="USD", rate=4.0, date=date(2025, 1, 2)),
+        CurrencyRate(code="EUR", rate=4.3, date=date(2025, 1, 2)),
+    ])
+    await session.commit()
+
+    snapshot = await load_rates_snapshot(session)
+    assert dict(snapshot.rates) == {"USD": 4.0, "EUR": 4.3}
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        assert await convert_currency(session, 40.0, "pln", "usd") == pytest.approx(10.0)
+        assert await convert_currency(session, 10.0, "usd", "eur") == pytest.approx(40.0 / 4.3)
+        assert await convert_currency(session, 10.0, "usd", "chf") is None
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_update_currency_rate_swaps_snapshot(session: AsyncSession):
+    await load_rates_snapshot(session)
+    before = get_rates_snapshot()
+
+    await update_currency_rate(session, "gbp", 5.0, date(2025, 2, 1))
+    after = get_rates_snapshot()
+    assert after is not before
+    assert before.rate("GBP") is None
+    assert after.rate("GBP") == 5.0
+
+    # Starszy kurs nie nadpisuje nowszego w snapshocie
+    await update_currency_rate(session, "GBP", 4.5, date(2025, 1, 1))
+    assert get_rates_snapshot().rate("GBP") == 5.0
+
+
+def _serve_nbp(monkeypatch, respond):
+    """Lokalny serwer udający API NBP; `respond(path)` zwraca (status, dane JSON)."""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            status, data = respond(self.path)
+            body = json.dumps(data).encode() if data is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(currency_service.app_settings, "nbp_api_base_url", f"http://127.0.0.1:{server.server_port}/api/exchangerates")
+    monkeypatch.setattr(currency_service.app_settings, "nbp_retry_backoff_seconds", 0.01)
+    return server, requests_seen
+
+
+@pytest.fixture
+def nbp_stub(monkeypatch):
+    """Pierwsze żądanie kończy się 503, kolejne zwracają bieżącą tabelę A."""
+    calls = []
+
+    def respond(path):
+        calls.append(path)
+        if len(calls) == 1:
+            return 503, None
+        return 200, [{
+            "table": "A",
+            "effectiveDate": "2025-03-03",
+            "rates": [
+                {"currency": "dolar amerykański", "code": "USD", "mid": 4.0},
+                {"currency": "euro", "code": "EUR", "mid": 4.2},
+                {"currency": "frank szwajcarski", "code": "CHF", "mid": 4.5},
+            ],
+        }]
+
+    server, seen = _serve_nbp(monkeypatch, respond)
+    yield seen
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_rates_uses_single_table_request_with_retry(session: AsyncSession, nbp_stub):
+    session.add(CurrencyRate(code="USD", rate=3.9, date=date(2025, 3, 3)))
+    await session.commit()
+    try:
+        results = await fetch_and_save_currency_rates(session)
+        # Ponowne pobranie tego samego dnia nadpisuje kurs zamiast dublować wiersz
+        await fetch_and_save_currency_rates(session)
+    finally:
+        await close_http_client()
+
+    assert nbp_stub == ["/api/exchangerates/tables/A/?format=json"] * 3
+    assert results["USD"] == {"rate": 4.0, "date": "2025-03-03", "success": True}
+    assert results["EUR"]["success"] is True
+    assert results["GBP"]["success"] is False
+
+    rows = (await session.exec(select(CurrencyRate).order_by(CurrencyRate.code))).all()
+    assert [(row.code, row.rate, row.date) for row in rows] == [
+        ("EUR", 4.2, date(2025, 3, 3)),
+        ("USD", 4.0, date(2025, 3, 3)),
+    ]
+    assert get_rates_snapshot().rate("USD") == 4.0
+
+
+def test_rate_series_uses_last_quote_on_or_before_day():
+    series = RateSeries.from_points([(date(2025, 1, 3), 4.1), (date(2025, 1, 2), 4.0), (date(2025, 1, 6), 4.2)])
+    assert series.rate_on(date(2025, 1, 1)) is None
+    assert series.rate_on(date(2025, 1, 2)) == 4.0
+    # Weekend - kurs z piątku
+    assert series.rate_on(date(2025, 1, 5)) == 4.1
+    assert series.rate_on(date(2025, 2, 1)) == 4.2
+    assert series.with_points([(date(2025, 1, 4), 5.0)]).rate_on(date(2025, 1, 5)) == 5.0
+
+
+@pytest.mark.asyncio
+async def test_backfill_fetches_ranges_and_converts_by_session_date(session: AsyncSession, monkeypatch):
+    def respond(path):
+        start, end = (date.fromisoformat(part) for part in path.split("/")[5:7])
+        tables = []
+        day = start
+        while day <= end:
+            if day.weekday() < 5:
+                tables.append({"effectiveDate": day.isoformat(), "rates": [
+                    {"code": "USD", "mid": 4.0 if day.year == 2024 else 3.5},
+                    {"code": "EUR", "mid": 4.5},
+                ]})
+            day = date.fromordinal(day.toordinal() + 1)
+        return 200, tables
+
+    server, seen = _serve_nbp(monkeypatch, respond)
+    try:
+        count = await backfill_currency_rates(session, date(2024, 10, 1), date(2025, 1, 31))
+    finally:
+        await close_http_client()
+        server.shutdown()
+        server.server_close()
+
+    # 123 dni -> dwa zapytania o zakres (po najwyżej 93 dni), każde o wszystkie waluty naraz
+    assert sorted(seen) == [
+        "/api/exchangerates/tables/A/2024-10-01/2025-01-01/?format=json",
+        "/api/exchangerates/tables/A/2025-01-02/2025-01-31/?format=json",
+    ]
+    weekdays = sum(1 for n in range(123) if date.fromordinal(date(2024, 10, 1).toordinal() + n).weekday() < 5)
+    assert count == weekdays * 2
+
+    assert (await session.exec(select(func.count()).select_from(CurrencyRate))).one() == count
+
+    currency_service._set_history(RateHistory())
+    assert await convert_currency_on(session, 40.0, "pln", "usd", date(2024, 12, 31)) == pytest.approx(10.0)
+    assert await convert_currency_on(session, 35.0, "pln", "usd", date(2025, 1, 4)) == pytest.approx(10.0)
+    history = get_rate_history()
+    assert history.convert_many([40.0, 35.0], [date(2024, 11, 2), date(2025, 1, 15)], "pln", "usd") == [
+        pytest.approx(10.0), pytest.approx(10.0)
+    ]
+    assert history.rate_on("USD", date(2024, 9, 1)) is None
+
+
+@pytest.mark.asyncio
+async def test_reports_convert_costs_to_user_currency(session: AsyncSession):
+    from models import Ammo, Gun
+    from routers.shooting_sessions import create_session_reads
+    from schemas.shooting_sessions import ShootingSessionCreate
+    from services.ammo_service import AmmoService
+    from services.shooting_sessions_service import ShootingSessionsService
+    from services.user_context import UserContext, UserRole
+    from services.user_settings_service import UserSettingsService
+
+    session.add_all([
+        CurrencyRate(code="USD", rate=4.0, date=date(2025, 1, 31)),
+        CurrencyRate(code="USD", rate=5.0, date=date(2025, 2, 3)),
+    ])
+    user = UserContext(user_id="currency-1", role=UserRole.user)
+    gun = Gun(name="Currency Gun", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="Currency Ammo", price_per_unit=2.0, units_in_package=500, caliber="9mm", user_id=user.user_id)
+    session.add_all([gun, ammo])
+    await session.commit()
+    await UserSettingsService.update_settings(session, user, {"currency": "usd"})
+
+    created = []
+    for day, cost in [(date(2025, 1, 31), 40.0), (date(2025, 2, 5), 50.0), (date(2024, 12, 1), 8.0)]:
+        result = await ShootingSessionsService.create_shooting_session(session, user, ShootingSessionCreate(
+            gun_id=gun.id, ammo_id=ammo.id, date=day.isoformat(), shots=10, cost=cost
+        ))
+        created.append(result["session"])
+
+    reads = await create_session_reads(created, session, user)
+    # Kurs z dnia sesji; sesja sprzed historii kursów - najnowszy kurs
+    assert [(read.cost, read.converted_cost, read.currency) for read in reads] == [
+        (40.0, 10.0, "USD"), (50.0, 10.0, "USD"), (8.0, 1.6, "USD")
+    ]
+
+    summary = await ShootingSessionsService.get_monthly_summary(session, user, 12, 0, None)
+    assert [(item["month"], item["total_cost"], item["total_cost_converted"]) for item in summary["items"]] == [
+        ("2024-12", 8.0, 1.6), ("2025-01", 40.0, 10.0), ("2025-02", 50.0, 10.0)
+    ]
+
+    value = await AmmoService.get_inventory_value(session, user)
+    assert value["currency"] == "USD"
+    assert value["items"][0]["units_in_package"] == 470
+    assert (value["total_value_pln"], value["total_value"]) == (940.0, 188.0)
+
+
+@pytest.mark.asyncio
+async def test_convert_batch_uses_latest_and_dated_rates(session: AsyncSession):
+    session.add_all([
+        CurrencyRate(code="USD", rate=4.0, date=date(2025, 1, 2)),
+        CurrencyRate(code="USD", rate=5.0, date=date(2025, 2, 3)),
+        CurrencyRate(code="EUR", rate=4.5, date=date(2025, 1, 2)),
+    ])
+    await session.commit()
+
+    results = await convert_batch(session, [
+        (50.0, "pln", "usd", None),
+        (40.0, "PLN", "USD", date(2025, 1, 15)),
+        (2.0, "usd", "eur", None),
+        (1.0, "usd", "chf", None),
+        (7.0, "chf", "CHF", None),
+        (10.0, "pln", "usd", date(2024, 12, 1)),
+        (3.0, "usd", "chf", date(2025, 1, 15)),
+    ])
+    # Dzień sprzed historii - najnowszy kurs (jak convert_pln_amounts); waluta bez kursu - None
+    assert results == [
+        pytest.approx(10.0), pytest.approx(10.0), pytest.approx(10.0 / 4.5), None, 7.0, pytest.approx(2.0), None
+    ]
+
+
+@pytest.mark.asyncio
+async def test_single_and_batch_conversion_agree_before_history(session: AsyncSession):
+    session.add_all([
+        CurrencyRate(code="USD", rate=4.0, date=date(2025, 1, 2)),
+        CurrencyRate(code="USD", rate=5.0, date=date(2025, 2, 3)),
+    ])
+    await session.commit()
+
+    before_history = date(2024, 12, 1)
+    single = await convert_currency_on(session, 10.0, "pln", "usd", before_history)
+    [batched] = await convert_batch(session, [(10.0, "pln", "usd", before_history)])
+    # Dzień sprzed historii - w obu ścieżkach najnowszy kurs
+    assert single == batched == pytest.approx(2.0)
+    assert await convert_currency_on(session, 10.0, "pln", "chf", before_history) is None
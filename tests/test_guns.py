@@ -1,5 +1,5 @@
 import pytest
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models import Gun
 from services.gun_service import GunService
 from services.user_context import UserContext, UserRole
@@ -7,7 +7,7 @@ from schemas.gun import GunCreate
 
 
 @pytest.mark.asyncio
-async def test_create_and_list_guns_user(session: Session):
+async def test_create_and_list_guns_user(session: AsyncSession):
     user = UserContext(user_id="user-1", role=UserRole.user)
     gun_data = GunCreate(name="Test Gun", caliber="9mm", type="Pistol", notes=None)
 
@@ -21,7 +21,7 @@ async def test_create_and_list_guns_user(session: Session):
 
 
 @pytest.mark.asyncio
-async def test_guest_gun_expires(session: Session):
+async def test_guest_gun_expires(session: AsyncSession):
     guest = UserContext(user_id="guest-1", role=UserRole.guest, is_guest=True)
     gun_data = GunCreate(name="Guest Gun", caliber="5.56", type="Rifle")
 
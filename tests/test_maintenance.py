@@ -0,0 +1,327 @@
+import pytest
+from datetime import date
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+from services.maintenance_service import MaintenanceService
+from services.shooting_sessions_service import ShootingSessionsService
+from services.gun_round_counter_service import GunRoundCounterService
+from services.gun_service import GunService
+from services.user_context import UserContext, UserRole
+from models import Gun, Ammo, Maintenance, ShootingSession, GunRoundCounter
+from schemas.gun import GunCreate
+from schemas.shooting_sessions import ShootingSessionCreate, ShootingSessionUpdate
+
+
+@pytest.mark.asyncio
+async def test_list_all_is_single_read_only_query(session: AsyncSession, engine):
+    user = UserContext(user_id="maint-1", role=UserRole.user)
+    guns = [Gun(name=f"Gun {i}", caliber="9mm", user_id=user.user_id) for i in range(2)]
+    ammo = Ammo(name="Maint Ammo", price_per_unit=1.0, units_in_package=500, caliber="9mm", user_id=user.user_id)
+    session.add_all(guns + [ammo])
+    await session.commit()
+    for gun in guns:
+        session.add(Maintenance(gun_id=gun.id, user_id=user.user_id, date=date(2025, 1, 1), rounds_since_last=11))
+        session.add(Maintenance(gun_id=gun.id, user_id=user.user_id, date=date(2025, 2, 1), rounds_since_last=7))
+    session.add(ShootingSession(gun_id=guns[0].id, ammo_id=ammo.id, user_id=user.user_id, date=date(2025, 1, 15), shots=40))
+    session.add(ShootingSession(gun_id=guns[0].id, ammo_id=ammo.id, user_id=user.user_id, date=date(2025, 2, 10), shots=30))
+    session.add(ShootingSession(gun_id=guns[0].id, ammo_id=ammo.id, user_id=user.user_id, date=date(2025, 3, 10), shots=20))
+    await session.commit()
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        result = await MaintenanceService.list_all(session, user)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+
+    assert statements == ["SELECT"]
+    items = result["items"]
+    assert len(items) == 4
+    by_gun = {}
+    for item in items:
+        by_gun.setdefault(item["gun_name"], []).append(item)
+    # Najnowsza konserwacja: strzały liczone na bieżąco, starsza: wartość zapisana
+    assert [i["rounds_since_last"] for i in by_gun["Gun 0"]] == [50, 11]
+    assert [i["rounds_since_last"] for i in by_gun["Gun 1"]] == [0, 11]
+
+    page = await MaintenanceService.list_all(session, user, limit=3)
+    rest = await MaintenanceService.list_all(session, user, limit=3, cursor=page["next_cursor"])
+    assert page["has_more"] and not rest["has_more"]
+    assert {i["id"] for i in page["items"] + rest["items"]} == {i["id"] for i in items}
+
+
+@pytest.mark.asyncio
+async def test_gun_round_counters_follow_session_and_maintenance_writes(session: AsyncSession):
+    user = UserContext(user_id="maint-2", role=UserRole.user)
+    gun = await GunService.create_gun(session, GunCreate(name="Counter Gun", caliber="9mm"), user)
+    ammo = Ammo(name="Counter Ammo", price_per_unit=1.0, units_in_package=500, caliber="9mm", user_id=user.user_id)
+    session.add(ammo)
+    await session.commit()
+
+    async def counters():
+        row = await GunRoundCounterService.get_counter(session, gun.id)
+        return row.lifetime_rounds, row.rounds_since_maintenance
+
+    first = await ShootingSessionsService.create_shooting_session(
+        session, user, ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date="2025-01-10", shots=40)
+    )
+    await ShootingSessionsService.create_shooting_session(
+        session, user, ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date="2025-03-10", shots=20)
+    )
+    assert await counters() == (60, 60)
+
+    await MaintenanceService.create_maintenance(session, user, gun.id, {"date": date(2025, 2, 1)})
+    assert await counters() == (60, 20)
+
+    await ShootingSessionsService.update_shooting_session(
+        session, first["session"].id, user, ShootingSessionUpdate(shots=30)
+    )
+    assert await counters() == (50, 20)
+    await ShootingSessionsService.update_shooting_session(
+        session, first["session"].id, user, ShootingSessionUpdate(date="2025-02-15")
+    )
+    assert await counters() == (50, 50)
+
+    await ShootingSessionsService.delete_shooting_session(session, first["session"].id, user)
+    assert await counters() == (20, 20)
+
+    # Ręczna korekta licznika jest wykrywana i naprawiana przez uzgadnianie
+    row = await session.get(GunRoundCounter, gun.id)
+    row.lifetime_rounds = 999
+    session.add(row)
+    await session.commit()
+    assert await session.run_sync(GunRoundCounterService.reconcile, user.user_id) == 1
+    await session.refresh(row)
+    assert await counters() == (20, 20)
+
+
+@pytest.mark.asyncio
+async def test_statistics_query_count_does_not_grow_with_guns(session: AsyncSession, engine):
+    user = UserContext(user_id="maint-3", role=UserRole.user)
+    guns = [await GunService.create_gun(session, GunCreate(name=f"Stat Gun {i}", caliber="9mm"), user) for i in range(3)]
+    ammo = Ammo(name="Stat Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    session.add(ammo)
+    await session.commit()
+    await ShootingSessionsService.create_shooting_session(
+        session, user, ShootingSessionCreate(gun_id=guns[0].id, ammo_id=ammo.id, date="2025-01-10", shots=600)
+    )
+    await MaintenanceService.create_maintenance(session, user, guns[1].id, {"date": date.today()})
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        result = await MaintenanceService.get_statistics(session, user)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+
+    # Stan broni + ustawienia użytkownika (limity)
+    assert statements == ["SELECT", "SELECT"]
+    status = {item["gun_id"]: item for item in result["guns_status"]}
+    assert status[guns[0].id]["rounds_since_last"] == 600
+    assert status[guns[0].id]["rounds_limit"] == 500
+    assert status[guns[0].id]["maintenance_due"] is True
+    assert status[guns[0].id]["days_since_last"] == (date.today() - date(2025, 1, 10)).days
+    assert status[guns[1].id]["days_since_last"] == 0
+    assert status[guns[1].id]["maintenance_due"] is False
+    assert result["longest_without_maintenance"]["gun_id"] == guns[0].id
+
+
+@pytest.mark.asyncio
+async def test_maintenance_due_evaluation_and_cheap_read(session: AsyncSession):
+    from services.maintenance_due_service import MaintenanceDueService
+    from services.user_settings_service import UserSettingsService
+
+    user = UserContext(user_id="maint-4", role=UserRole.user)
+    quiet = UserContext(user_id="maint-5", role=UserRole.user)
+    busy = await GunService.create_gun(session, GunCreate(name="Busy Gun", caliber="9mm"), user)
+    fresh = await GunService.create_gun(session, GunCreate(name="Fresh Gun", caliber="9mm"), user)
+    quiet_gun = await GunService.create_gun(session, GunCreate(name="Quiet Gun", caliber="9mm"), quiet)
+    ammo = Ammo(name="Due Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    quiet_ammo = Ammo(name="Quiet Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=quiet.user_id)
+    session.add_all([ammo, quiet_ammo])
+    await session.commit()
+    await UserSettingsService.update_settings(session, user, {"maintenance_rounds_limit": 100})
+    await UserSettingsService.update_settings(session, quiet, {"maintenance_notifications_enabled": False})
+    today = date.today().isoformat()
+    await ShootingSessionsService.create_shooting_session(
+        session, user, ShootingSessionCreate(gun_id=busy.id, ammo_id=ammo.id, date=today, shots=150)
+    )
+    await ShootingSessionsService.create_shooting_session(
+        session, quiet, ShootingSessionCreate(gun_id=quiet_gun.id, ammo_id=quiet_ammo.id, date=today, shots=900)
+    )
+
+    assert await MaintenanceDueService.evaluate(session) == 1
+    due = await MaintenanceDueService.list_due(session, user)
+    assert [(d.gun_id, d.rounds_since_last, d.rounds_exceeded, d.days_exceeded) for d in due] == [(busy.id, 150, True, False)]
+    assert fresh.id not in {d.gun_id for d in due}
+    assert await MaintenanceDueService.list_due(session, quiet) == []
+
+    await MaintenanceService.create_maintenance(session, user, busy.id, {"date": date.today()})
+    assert await MaintenanceDueService.list_due(session, user) == []
+
+
+@pytest.mark.asyncio
+async def test_daily_prefix_sums_answer_date_ranges(session: AsyncSession):
+    user = UserContext(user_id="maint-6", role=UserRole.user)
+    gun = await GunService.create_gun(session, GunCreate(name="Range Gun", caliber="9mm"), user)
+    ammo = Ammo(name="Range Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    session.add(ammo)
+    await session.commit()
+    created = []
+    for day, shots in (("2025-01-10", 10), ("2025-01-20", 20), ("2025-01-20", 5), ("2025-02-05", 40)):
+        result = await ShootingSessionsService.create_shooting_session(
+            session, user, ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date=day, shots=shots)
+        )
+        created.append(result["session"])
+    # Sesja wpisana wstecz przesuwa sumy narastające późniejszych dni
+    await ShootingSessionsService.create_shooting_session(
+        session, user, ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date="2025-01-01", shots=3)
+    )
+    await ShootingSessionsService.delete_shooting_session(session, created[1].id, user)
+
+    assert await GunRoundCounterService.rounds_between(session, gun.id) == 58
+    assert await GunRoundCounterService.rounds_between(session, gun.id, date(2025, 1, 10), date(2025, 1, 31)) == 5
+    assert await GunRoundCounterService.rounds_between(session, gun.id, date(2025, 1, 1), date(2025, 2, 5)) == 55
+
+    # Konserwacja z datą wsteczną liczy strzały od poprzedniej bez skanowania sesji
+    await MaintenanceService.create_maintenance(session, user, gun.id, {"date": date(2025, 1, 15)})
+    backdated = await MaintenanceService.create_maintenance(session, user, gun.id, {"date": date(2025, 1, 31)})
+    assert backdated.rounds_since_last == 5
+    row = await GunRoundCounterService.get_counter(session, gun.id)
+    assert (row.lifetime_rounds, row.rounds_since_maintenance) == (58, 40)
+    assert await session.run_sync(GunRoundCounterService.reconcile, user.user_id) == 0
+
+
+@pytest.mark.asyncio
+async def test_counter_read_does_not_persist_and_ammo_delete_subtracts(session: AsyncSession):
+    from services.ammo_service import AmmoService
+
+    user = UserContext(user_id="maint-7", role=UserRole.user)
+    legacy = Gun(name="Legacy Gun", caliber="9mm", user_id=user.user_id)
+    session.add(legacy)
+    await session.commit()
+    old_ammo = Ammo(name="Legacy Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    session.add(old_ammo)
+    await session.commit()
+    session.add(ShootingSession(gun_id=legacy.id, ammo_id=old_ammo.id, user_id=user.user_id, date=date(2025, 1, 5), shots=12))
+    session.add(Maintenance(gun_id=legacy.id, user_id=user.user_id, date=date(2025, 1, 5)))
+    session.add(ShootingSession(gun_id=legacy.id, ammo_id=old_ammo.id, user_id=user.user_id, date=date(2025, 1, 9), shots=8))
+    await session.commit()
+
+    # Broń bez wiersza licznika: wartości z sesji, nic nie jest zapisywane
+    row = await GunRoundCounterService.get_counter(session, legacy.id)
+    assert (row.lifetime_rounds, row.rounds_since_maintenance, row.last_maintenance_date) == (20, 8, date(2025, 1, 5))
+    assert not session.new and not session.dirty
+    assert (await session.get(GunRoundCounter, legacy.id)) is None
+
+    gun = await GunService.create_gun(session, GunCreate(name="Mixed Gun", caliber="9mm"), user)
+    ammo = Ammo(name="Kept Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    gone = Ammo(name="Gone Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    session.add_all([ammo, gone])
+    await session.commit()
+    for ammo_id, day, shots in ((ammo.id, "2025-01-10", 10), (gone.id, "2025-01-10", 5), (gone.id, "2025-01-20", 7), (ammo.id, "2025-02-01", 4)):
+        await ShootingSessionsService.create_shooting_session(
+            session, user, ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo_id, date=day, shots=shots)
+        )
+
+    await AmmoService.delete_ammo(session, gone.id, user)
+    row = await GunRoundCounterService.get_counter(session, gun.id)
+    assert (row.lifetime_rounds, row.rounds_since_maintenance) == (14, 14)
+    assert await GunRoundCounterService.rounds_between(session, gun.id, date(2025, 1, 10)) == 4
+    assert await GunRoundCounterService.rounds_between(session, gun.id, None, date(2025, 1, 31)) == 10
+
+
+@pytest.mark.asyncio
+async def test_statistics_without_counter_row_read_sessions(session: AsyncSession, engine):
+    user = UserContext(user_id="maint-8", role=UserRole.user)
+    gun = Gun(name="No Counter Gun", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="No Counter Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    session.add_all([gun, ammo])
+    await session.commit()
+    session.add(Maintenance(gun_id=gun.id, user_id=user.user_id, date=date(2025, 3, 1)))
+    session.add(ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id=user.user_id, date=date(2025, 2, 1), shots=30))
+    session.add(ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id=user.user_id, date=date(2025, 3, 2), shots=9))
+    await session.commit()
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        result = await MaintenanceService.get_statistics(session, user)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+
+    assert statements == ["SELECT", "SELECT"]
+    assert [item["rounds_since_last"] for item in result["guns_status"]] == [9]
+    assert (await session.get(GunRoundCounter, gun.id)) is None
+
+
+@pytest.mark.asyncio
+async def test_periodic_evaluation_runs_only_with_lock(engine, monkeypatch):
+    import asyncio
+    import database
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from services import maintenance_due_service
+    from services.maintenance_due_service import MaintenanceDueService
+
+    monkeypatch.setattr(database, "async_session_maker", async_sessionmaker(engine, class_=AsyncSession))
+    runs = []
+
+    async def fake_evaluate(session, user_id=None):
+        runs.append(user_id)
+        return 0
+
+    monkeypatch.setattr(MaintenanceDueService, "evaluate", staticmethod(fake_evaluate))
+
+    async def one_pass(lock_acquired: bool) -> None:
+        async def fake_lock(session, key):
+            assert key == maintenance_due_service.EVALUATION_LOCK_KEY
+            return lock_acquired
+
+        monkeypatch.setattr(maintenance_due_service, "try_advisory_xact_lock", fake_lock)
+        task = asyncio.create_task(MaintenanceDueService.run_periodically(3600))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    # Blokadę trzyma inny worker - przebieg pominięty
+    await one_pass(False)
+    assert runs == []
+    await one_pass(True)
+    assert runs == [None]
+
+
+@pytest.mark.asyncio
+async def test_backdated_maintenance_counts_from_previous_one(session: AsyncSession):
+    user = UserContext(user_id="maint-9", role=UserRole.user)
+    gun = await GunService.create_gun(session, GunCreate(name="Backdated Gun", caliber="9mm"), user)
+    ammo = Ammo(name="Backdated Ammo", price_per_unit=1.0, units_in_package=1000, caliber="9mm", user_id=user.user_id)
+    session.add(ammo)
+    await session.commit()
+    for day in ("2025-01-05", "2025-02-05", "2025-03-05"):
+        await ShootingSessionsService.create_shooting_session(
+            session, user, ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date=day, shots=10)
+        )
+
+    latest = await MaintenanceService.create_maintenance(session, user, gun.id, {"date": date(2025, 3, 1)})
+    assert latest.rounds_since_last == 20
+    # Konserwacja wpisana wstecz przed najnowszą - strzały od początku do jej daty, nie wartość ujemna
+    backdated = await MaintenanceService.create_maintenance(session, user, gun.id, {"date": date(2025, 1, 10)})
+    assert backdated.rounds_since_last == 10
+    same_day = await MaintenanceService.create_maintenance(session, user, gun.id, {"date": date(2025, 1, 10)})
+    assert same_day.rounds_since_last == 0
+    items = await MaintenanceService.list_for_gun(session, user, gun.id)
+    assert all(item["rounds_since_last"] >= 0 for item in items)
+    row = await GunRoundCounterService.get_counter(session, gun.id)
+    assert (row.lifetime_rounds, row.rounds_since_maintenance) == (30, 10)
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from services.pool_metrics import TimedQueuePool, instrument_engine
+
+
+def test_pool_metrics_track_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05
+    )
+    metrics = instrument_engine(engine, "test")
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+
+        stats = metrics.snapshot(engine.pool)
+        assert stats["checkouts"] == 1
+        assert stats["checkins"] == 1
+        assert stats["connects"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["wait_count"] == 2
+        assert stats["wait_max_ms"] >= 50
+        assert stats["checkedout"] == 0
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_health_metrics_require_admin():
+    import httpx
+    from main import app
+    from routers.auth import get_user_context
+    from services.user_context import UserContext, UserRole
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            app.dependency_overrides[get_user_context] = lambda: UserContext(user_id="user-1", role=UserRole.user)
+            assert (await client.get("/health/pool")).status_code == 403
+            assert (await client.get("/health/ai-cache")).status_code == 403
+            app.dependency_overrides[get_user_context] = lambda: UserContext(user_id="admin-1", role=UserRole.admin)
+            response = await client.get("/health/pool")
+            assert response.status_code == 200
+            assert (await client.get("/health/ai-cache")).status_code == 200
+    finally:
+        app.dependency_overrides.clear()
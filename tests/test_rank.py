@@ -0,0 +1,90 @@
+import pytest
+from datetime import date
+from sqlmodel.ext.asyncio.session import AsyncSession
+from services.shooting_sessions_service import ShootingSessionsService
+from services.accuracy_histogram_service import AccuracyHistogramService
+from services.rank_service import count_passed_sessions
+from services.user_context import UserContext, UserRole
+from models import Gun, Ammo, User, AccuracyHistogram, ShootingSession
+from schemas.shooting_sessions import ShootingSessionCreate, ShootingSessionUpdate
+
+
+async def _setup(session: AsyncSession, user_id: str):
+    user = UserContext(user_id=user_id, role=UserRole.user)
+    gun = Gun(name="Rank Gun", caliber="9mm", user_id=user_id)
+    ammo = Ammo(name="Rank Ammo", price_per_unit=1.0, units_in_package=500, caliber="9mm", user_id=user_id)
+    db_user = User(user_id=user_id, skill_level="beginner")
+    session.add(gun)
+    session.add(ammo)
+    session.add(db_user)
+    await session.commit()
+    for obj in (gun, ammo, db_user):
+        await session.refresh(obj)
+    return user, gun, ammo, db_user
+
+
+@pytest.mark.asyncio
+async def test_count_passed_sessions_uses_histogram(session: AsyncSession):
+    user, gun, ammo, db_user = await _setup(session, "rank-1")
+    created = []
+    for day, hits in [(1, 7), (2, 8), (3, 9), (4, 10)]:
+        result = await ShootingSessionsService.create_shooting_session(
+            session, user,
+            ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date=f"2025-01-0{day}", shots=10, hits=hits, distance_m=25)
+        )
+        created.append(result["session"])
+
+    # Pierwszy zapis tworzy histogram, kolejne aktualizują go przyrostowo
+    assert await count_passed_sessions(db_user, session) == 3
+    assert await session.get(AccuracyHistogram, user.user_id) is not None
+
+    db_user.skill_level = "advanced"
+    assert await count_passed_sessions(db_user, session) == 1
+
+    await ShootingSessionsService.update_shooting_session(
+        session, created[0].id, user, ShootingSessionUpdate(hits=10)
+    )
+    assert await count_passed_sessions(db_user, session) == 2
+
+    await ShootingSessionsService.delete_shooting_session(session, created[3].id, user)
+    assert await count_passed_sessions(db_user, session) == 1
+
+    db_user.skill_level = "beginner"
+    assert await count_passed_sessions(db_user, session) == 3
+
+
+@pytest.mark.asyncio
+async def test_histogram_rebuild_matches_sessions(session: AsyncSession):
+    _, gun, ammo, db_user = await _setup(session, "rank-2")
+    session.add(ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id="rank-2", date=date(2025, 1, 1), shots=4, hits=3))
+    session.add(ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id="rank-2", date=date(2025, 1, 2), shots=10, accuracy_percent=84.99))
+    session.add(ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id="rank-2", date=date(2025, 1, 3), shots=10))
+    await session.commit()
+
+    assert await session.run_sync(AccuracyHistogramService.rebuild_all) == 1
+    buckets = await AccuracyHistogramService.get_buckets(session, "rank-2")
+    assert sum(buckets) == 2
+    assert buckets[75] == 1 and buckets[84] == 1
+    db_user.skill_level = "intermediate"
+    assert await count_passed_sessions(db_user, session) == 0
+
+
+@pytest.mark.asyncio
+async def test_histogram_read_does_not_persist_and_ammo_delete_subtracts(session: AsyncSession):
+    from services.ammo_service import AmmoService
+    user, gun, ammo, db_user = await _setup(session, "rank-3")
+    other_ammo = Ammo(name="Rank Ammo 2", price_per_unit=1.0, units_in_package=500, caliber="9mm", user_id=user.user_id)
+    session.add(other_ammo)
+    # Sesje sprzed histogramu - brak wiersza
+    session.add(ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id=user.user_id, date=date(2025, 1, 1), shots=10, hits=9))
+    session.add(ShootingSession(gun_id=gun.id, ammo_id=other_ammo.id, user_id=user.user_id, date=date(2025, 1, 2), shots=10, hits=8))
+    await session.commit()
+
+    assert await count_passed_sessions(db_user, session) == 2
+    assert await session.get(AccuracyHistogram, user.user_id) is None
+
+    await session.run_sync(AccuracyHistogramService.rebuild, user.user_id)
+    await AmmoService.delete_ammo(session, other_ammo.id, user)
+    buckets = await AccuracyHistogramService.get_buckets(session, user.user_id)
+    assert buckets[90] == 1 and buckets[80] == 0
+    assert await count_passed_sessions(db_user, session) == 1
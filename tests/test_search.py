@@ -0,0 +1,65 @@
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import Gun, Ammo, ShootingSession, normalize_search_text
+from services.search_service import SearchService, rebuild_search_text
+from services.user_context import UserContext, UserRole
+from datetime import date
+
+
+def test_normalize_search_text_strips_polish_diacritics():
+    assert normalize_search_text("  Żółć   Łódź ") == "zolc lodz"
+    assert normalize_search_text(None) == ""
+
+
+@pytest.mark.asyncio
+async def test_search_returns_ranked_hits_for_user(session: AsyncSession):
+    user = UserContext(user_id="user-1", role=UserRole.user)
+    other = UserContext(user_id="user-2", role=UserRole.user)
+    gun = Gun(name="Ślązak", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="Geco Ślązak Match", caliber="9mm", price_per_unit=1.0, units_in_package=10, user_id=user.user_id)
+    foreign = Gun(name="Slazak obcy", user_id=other.user_id)
+    session.add(gun)
+    session.add(ammo)
+    session.add(foreign)
+    await session.commit()
+    session.add(ShootingSession(
+        gun_id=gun.id, ammo_id=ammo.id, user_id=user.user_id, date=date(2025, 1, 10), shots=10,
+        notes="Trening na osi nr 3", ai_comment="Dobre skupienie, ślązak trzyma grupę"
+    ))
+    await session.commit()
+
+    result = await SearchService.search(session, user, "SLAZAK")
+
+    assert [hit["type"] for hit in result["items"]][0] == "gun"
+    assert {hit["type"] for hit in result["items"]} == {"gun", "ammo", "session"}
+    assert all(hit["id"] != foreign.id for hit in result["items"])
+
+
+@pytest.mark.asyncio
+async def test_rebuild_search_text_fills_missing_values(session: AsyncSession):
+    gun = Gun(name="Kałasznikow", user_id="user-1")
+    session.add(gun)
+    await session.commit()
+    await (await session.connection()).exec_driver_sql("UPDATE guns SET search_text = NULL")
+    await session.commit()
+    session.expire_all()
+
+    await session.run_sync(rebuild_search_text)
+
+    await session.refresh(gun)
+    assert gun.search_text == "kalasznikow"
+
+
+@pytest.mark.asyncio
+async def test_search_ranking_treats_like_wildcards_literally(session: AsyncSession):
+    user = UserContext(user_id="user-1", role=UserRole.user)
+    literal = Gun(name="5_ Tokarev", user_id=user.user_id)
+    lookalike = Gun(name="5x Tokarev 5_", user_id=user.user_id)
+    session.add(literal)
+    session.add(lookalike)
+    await session.commit()
+
+    result = await SearchService.search(session, user, "5_")
+
+    scores = {hit["id"]: hit["score"] for hit in result["items"]}
+    assert scores == {literal.id: 1.0, lookalike.id: 0.5}
@@ -1,21 +1,22 @@
 import pytest
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from services.shooting_sessions_service import ShootingSessionsService
+from services.session_summary_service import SessionSummaryService
 from services.user_context import UserContext, UserRole
 from models import Gun, Ammo, ShootingSession
 from schemas.shooting_sessions import ShootingSessionCreate, ShootingSessionUpdate
 
 
 @pytest.mark.asyncio
-async def test_create_shooting_session(session: Session):
+async def test_create_shooting_session(session: AsyncSession):
     user = UserContext(user_id="user-1", role=UserRole.user)
     gun = Gun(name="Test Gun", caliber="9mm", user_id=user.user_id)
     ammo = Ammo(name="Test Ammo", price_per_unit=2.0, units_in_package=200, caliber="9mm", user_id=user.user_id)
     session.add(gun)
     session.add(ammo)
-    session.commit()
-    session.refresh(gun)
-    session.refresh(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
 
     session_data = ShootingSessionCreate(
         gun_id=gun.id,
@@ -34,15 +35,15 @@ async def test_create_shooting_session(session: Session):
 
 
 @pytest.mark.asyncio
-async def test_create_shooting_session_with_accuracy(session: Session):
+async def test_create_shooting_session_with_accuracy(session: AsyncSession):
     user = UserContext(user_id="user-2", role=UserRole.user)
     gun = Gun(name="Accuracy Gun", caliber="5.56", user_id=user.user_id)
     ammo = Ammo(name="Accuracy Ammo", price_per_unit=1.0, units_in_package=100, caliber="5.56", user_id=user.user_id)
     session.add(gun)
     session.add(ammo)
-    session.commit()
-    session.refresh(gun)
-    session.refresh(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
 
     session_data = ShootingSessionCreate(
         gun_id=gun.id,
@@ -61,15 +62,15 @@ async def test_create_shooting_session_with_accuracy(session: Session):
 
 
 @pytest.mark.asyncio
-async def test_update_shooting_session(session: Session):
+async def test_update_shooting_session(session: AsyncSession):
     user = UserContext(user_id="user-3", role=UserRole.user)
     gun = Gun(name="Update Gun", caliber="9mm", user_id=user.user_id)
     ammo = Ammo(name="Update Ammo", price_per_unit=2.0, units_in_package=200, caliber="9mm", user_id=user.user_id)
     session.add(gun)
     session.add(ammo)
-    session.commit()
-    session.refresh(gun)
-    session.refresh(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
 
     session_data = ShootingSessionCreate(
         gun_id=gun.id,
@@ -89,15 +90,15 @@ async def test_update_shooting_session(session: Session):
 
 
 @pytest.mark.asyncio
-async def test_delete_shooting_session(session: Session):
+async def test_delete_shooting_session(session: AsyncSession):
     user = UserContext(user_id="user-4", role=UserRole.user)
     gun = Gun(name="Delete Gun", caliber="9mm", user_id=user.user_id)
     ammo = Ammo(name="Delete Ammo", price_per_unit=2.0, units_in_package=200, caliber="9mm", user_id=user.user_id)
     session.add(gun)
     session.add(ammo)
-    session.commit()
-    session.refresh(gun)
-    session.refresh(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
 
     initial_ammo = ammo.units_in_package
 
@@ -109,26 +110,26 @@ async def test_delete_shooting_session(session: Session):
     created = await ShootingSessionsService.create_shooting_session(session, user, session_data)
     session_id = created["session"].id
 
-    session.refresh(ammo)
+    await session.refresh(ammo)
     assert ammo.units_in_package == initial_ammo - 30
 
     result = await ShootingSessionsService.delete_shooting_session(session, session_id, user)
     assert result["message"] == "Session deleted"
 
-    session.refresh(ammo)
+    await session.refresh(ammo)
     assert ammo.units_in_package == initial_ammo
 
 
 @pytest.mark.asyncio
-async def test_get_all_sessions(session: Session):
+async def test_get_all_sessions(session: AsyncSession):
     user = UserContext(user_id="user-5", role=UserRole.user)
     gun = Gun(name="List Gun", caliber="9mm", user_id=user.user_id)
     ammo = Ammo(name="List Ammo", price_per_unit=1.0, units_in_package=100, caliber="9mm", user_id=user.user_id)
     session.add(gun)
     session.add(ammo)
-    session.commit()
-    session.refresh(gun)
-    session.refresh(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
 
     for i in range(3):
         session_data = ShootingSessionCreate(
@@ -144,15 +145,15 @@ async def test_get_all_sessions(session: Session):
 
 
 @pytest.mark.asyncio
-async def test_get_monthly_summary(session: Session):
+async def test_get_monthly_summary(session: AsyncSession):
     user = UserContext(user_id="user-6", role=UserRole.user)
     gun = Gun(name="Summary Gun", caliber="9mm", user_id=user.user_id)
     ammo = Ammo(name="Summary Ammo", price_per_unit=2.0, units_in_package=200, caliber="9mm", user_id=user.user_id)
     session.add(gun)
     session.add(ammo)
-    session.commit()
-    session.refresh(gun)
-    session.refresh(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
 
     session_data1 = ShootingSessionCreate(
         gun_id=gun.id,
@@ -176,14 +177,150 @@ async def test_get_monthly_summary(session: Session):
     assert result["items"][0]["total_cost"] == 50.0
 
 
+@pytest.mark.asyncio
+async def test_get_all_sessions_keyset_cursor(session: AsyncSession):
+    user = UserContext(user_id="user-7", role=UserRole.user)
+    gun = Gun(name="Cursor Gun", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="Cursor Ammo", price_per_unit=1.0, units_in_package=100, caliber="9mm", user_id=user.user_id)
+    session.add(gun)
+    session.add(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
+
+    for day in range(1, 6):
+        session_data = ShootingSessionCreate(
+            gun_id=gun.id,
+            ammo_id=ammo.id,
+            date=f"2025-02-0{day}",
+            shots=5
+        )
+        await ShootingSessionsService.create_shooting_session(session, user, session_data)
+
+    first = await ShootingSessionsService.get_all_sessions(session, user, limit=2, offset=0, search=None)
+    assert first["total"] == 5
+    assert first["has_more"] is True
+    assert [s.date.isoformat() for s in first["items"]] == ["2025-02-05", "2025-02-04"]
+
+    second = await ShootingSessionsService.get_all_sessions(
+        session, user, limit=2, offset=0, search=None, cursor=first["next_cursor"], include_total=False
+    )
+    assert second["total"] is None
+    assert [s.date.isoformat() for s in second["items"]] == ["2025-02-03", "2025-02-02"]
+
+    last = await ShootingSessionsService.get_all_sessions(
+        session, user, limit=2, offset=0, search=None, cursor=second["next_cursor"]
+    )
+    assert [s.date.isoformat() for s in last["items"]] == ["2025-02-01"]
+    assert last["has_more"] is False
+    assert last["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_get_all_sessions_search_paginated_in_sql(session: AsyncSession):
+    user = UserContext(user_id="user-8", role=UserRole.user)
+    gun = Gun(name="Search Gun", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="Search Ammo", price_per_unit=1.0, units_in_package=100, caliber="9mm", user_id=user.user_id)
+    session.add(gun)
+    session.add(ammo)
+    await session.commit()
+    await session.refresh(gun)
+    await session.refresh(ammo)
+
+    for day, notes in [(1, "trening"), (2, "zawody"), (3, "trening"), (4, "trening")]:
+        session_data = ShootingSessionCreate(
+            gun_id=gun.id,
+            ammo_id=ammo.id,
+            date=f"2025-03-0{day}",
+            shots=5,
+            notes=notes
+        )
+        await ShootingSessionsService.create_shooting_session(session, user, session_data)
+
+    first = await ShootingSessionsService.get_all_sessions(session, user, limit=2, offset=0, search="trening")
+    assert first["total"] == 3
+    assert [s.date.isoformat() for s in first["items"]] == ["2025-03-04", "2025-03-03"]
+
+    second = await ShootingSessionsService.get_all_sessions(session, user, limit=2, offset=2, search="trening")
+    assert second["total"] == 3
+    assert [s.date.isoformat() for s in second["items"]] == ["2025-03-01"]
+    assert second["has_more"] is False
+
+
+@pytest.mark.asyncio
+async def test_monthly_summary_rollup_follows_session_writes(session: AsyncSession):
+    user = UserContext(user_id="user-9", role=UserRole.user)
+    gun = Gun(name="Rollup Gun", caliber="9mm", user_id=user.user_id)
+    other_gun = Gun(name="Rollup Gun 2", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="Rollup Ammo", price_per_unit=1.0, units_in_package=200, caliber="9mm", user_id=user.user_id)
+    session.add(gun)
+    session.add(other_gun)
+    session.add(ammo)
+    await session.commit()
+    for obj in (gun, other_gun, ammo):
+        await session.refresh(obj)
+
+    first = await ShootingSessionsService.create_shooting_session(
+        session, user, ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date="2025-04-10", shots=10)
+    )
+    second = await ShootingSessionsService.create_shooting_session(
+        session, user, ShootingSessionCreate(gun_id=other_gun.id, ammo_id=ammo.id, date="2025-04-12", shots=20)
+    )
 
+    await ShootingSessionsService.update_shooting_session(
+        session, first["session"].id, user, ShootingSessionUpdate(date="2025-05-01", shots=5)
+    )
+    result = await ShootingSessionsService.get_monthly_summary(session, user, limit=12, offset=0, search=None)
+    assert [(i["month"], i["total_shots"], i["total_cost"]) for i in result["items"]] == [
+        ("2025-04", 20, 20.0),
+        ("2025-05", 5, 5.0),
+    ]
 
+    filtered = await ShootingSessionsService.get_monthly_summary(
+        session, user, limit=12, offset=0, search=None, gun_id=gun.id
+    )
+    assert [i["month"] for i in filtered["items"]] == ["2025-05"]
 
+    await ShootingSessionsService.delete_shooting_session(session, second["session"].id, user)
+    result = await ShootingSessionsService.get_monthly_summary(session, user, limit=12, offset=0, search=None)
+    assert [i["month"] for i in result["items"]] == ["2025-05"]
 
+    await session.run_sync(SessionSummaryService.rebuild, user.user_id)
+    rebuilt = await ShootingSessionsService.get_monthly_summary(session, user, limit=12, offset=0, search=None)
+    assert rebuilt["items"] == result["items"]
 
 
+@pytest.mark.asyncio
+async def test_session_list_reads_settings_once(session: AsyncSession, monkeypatch):
+    from routers.shooting_sessions import create_session_reads
+    from services.user_settings_service import UserSettingsService
 
+    user = UserContext(user_id="user-10", role=UserRole.user)
+    gun = Gun(name="List Gun", caliber="9mm", user_id=user.user_id)
+    ammo = Ammo(name="List Ammo", price_per_unit=1.0, units_in_package=500, caliber="9mm", user_id=user.user_id)
+    session.add(gun)
+    session.add(ammo)
+    await session.commit()
+    await UserSettingsService.update_settings(session, user, {"distance_unit": "yd"})
+
+    sessions = []
+    for day in range(1, 6):
+        result = await ShootingSessionsService.create_shooting_session(
+            session, user,
+            ShootingSessionCreate(gun_id=gun.id, ammo_id=ammo.id, date=f"2025-06-0{day}", shots=10, distance_m=25)
+        )
+        sessions.append(result["session"])
 
+    calls = []
+    get_settings = UserSettingsService.get_settings
 
+    async def counting_get_settings(db_session, ctx):
+        calls.append(ctx.user_id)
+        return await get_settings(db_session, ctx)
 
+    monkeypatch.setattr(UserSettingsService, "get_settings", staticmethod(counting_get_settings))
+    reads = await create_session_reads(sessions, session, user)
 
+    assert calls == [user.user_id]
+    assert len(reads) == 5
+    assert all(read.distance_unit == "yd" for read in reads)
@@ -0,0 +1,36 @@
+import pytest
+from sqlmodel import select
+from models import UserSettings
+from services.user_settings_service import UserSettingsService
+from services.user_context import UserContext, UserRole
+
+
+@pytest.mark.asyncio
+async def test_reading_settings_never_writes(session):
+    user = UserContext(user_id="user-1", role=UserRole.user)
+    settings = await UserSettingsService.get_settings(session, user)
+    assert settings.language == "pl"
+    assert settings.currency == "pln"
+    assert settings.maintenance_rounds_limit == 500
+    assert (await session.exec(select(UserSettings))).all() == []
+
+
+@pytest.mark.asyncio
+async def test_update_creates_row_and_invalidates_cache(session):
+    user = UserContext(user_id="user-1", role=UserRole.user)
+    assert (await UserSettingsService.get_settings(session, user)).distance_unit == "m"
+
+    await UserSettingsService.update_settings(session, user, {"distance_unit": "yd", "currency": "usd"})
+    rows = (await session.exec(select(UserSettings))).all()
+    assert len(rows) == 1
+    assert rows[0].language == "pl"
+
+    settings = await UserSettingsService.get_settings(session, user)
+    assert settings.distance_unit == "yd"
+    assert settings.currency == "usd"
+
+    # Kolejny odczyt pochodzi z cache - nie widzi zmian zrobionych z pominięciem serwisu
+    rows[0].theme = "light"
+    session.add(rows[0])
+    await session.commit()
+    assert (await UserSettingsService.get_settings(session, user)).theme == "dark"
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from services import warmup_service
+from services.warmup_service import WarmupState, run_warmup
+
+
+@pytest.mark.asyncio
+async def test_ready_after_required_steps_even_if_nbp_fails(monkeypatch):
+    calls = []
+
+    def _step(name, fail=False, delay=0.0):
+        async def step():
+            calls.append(name)
+            await asyncio.sleep(delay)
+            if fail:
+                raise RuntimeError(f"{name} failed")
+        return step
+
+    monkeypatch.setattr(warmup_service, "_check_schema", _step("schema"))
+    monkeypatch.setattr(warmup_service, "_load_rates_snapshot", _step("rates_snapshot"))
+    monkeypatch.setattr(warmup_service, "_refresh_currency_rates", _step("currency_rates", fail=True))
+    monkeypatch.setattr(warmup_service, "_load_rate_history", _step("rate_history"))
+    monkeypatch.setattr(warmup_service, "_resume_ai_jobs", _step("ai_jobs"))
+    monkeypatch.setattr(warmup_service.settings, "maintenance_due_interval_seconds", 0)
+
+    state = WarmupState()
+    assert not state.ready
+    await run_warmup(state)
+
+    snapshot = state.snapshot()
+    assert snapshot["ready"] is True
+    assert calls[:2] == ["schema", "rates_snapshot"]
+    assert snapshot["steps"]["currency_rates"]["status"] == "failed"
+    assert snapshot["steps"]["currency_rates"]["error"] == "currency_rates failed"
+    assert snapshot["steps"]["rate_history"]["status"] == "done"
+    assert snapshot["steps"]["ai_jobs"]["status"] == "done"
+    assert snapshot["steps"]["maintenance_due"]["status"] == "skipped"
+
+
+@pytest.mark.asyncio
+async def test_schema_failure_skips_dependent_steps(monkeypatch):
+    async def _fail():
+        raise RuntimeError("database unavailable")
+
+    async def _unexpected():
+        raise AssertionError("step should not run")
+
+    monkeypatch.setattr(warmup_service, "_check_schema", _fail)
+    monkeypatch.setattr(warmup_service, "_load_rates_snapshot", _unexpected)
+
+    state = WarmupState()
+    await run_warmup(state)
+
+    snapshot = state.snapshot()
+    assert snapshot["ready"] is False
+    assert snapshot["steps"]["schema"]["status"] == "failed"
+    assert snapshot["steps"]["rates_snapshot"]["status"] == "skipped"
+
+
+def test_init_db_backfills_rollups_for_create_all_deploys(tmp_path, monkeypatch):
+    from datetime import date
+    from sqlmodel import Session, create_engine, select
+    import database
+    from models import Gun, Ammo, Maintenance, ShootingSession, GunRoundCounter, GunDailyRounds, AccuracyHistogram
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+    database.init_db()
+    # Dane sprzed liczników: sesje i konserwacje bez wierszy gun_round_counters / accuracy_histograms
+    with Session(engine) as session:
+        gun = Gun(id="legacy-gun", name="Legacy", caliber="9mm", user_id="legacy-user")
+        ammo = Ammo(id="legacy-ammo", name="FMJ", price_per_unit=1.0, units_in_package=100, caliber="9mm", user_id="legacy-user")
+        session.add_all([gun, ammo])
+        session.commit()
+        session.add_all([
+            ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id="legacy-user", date=date(2025, 1, 5), shots=10, hits=9),
+            Maintenance(gun_id=gun.id, user_id="legacy-user", date=date(2025, 1, 6)),
+            ShootingSession(gun_id=gun.id, ammo_id=ammo.id, user_id="legacy-user", date=date(2025, 1, 9), shots=20, hits=10),
+        ])
+        session.commit()
+
+    database.init_db()
+
+    with Session(engine) as session:
+        counter = session.get(GunRoundCounter, "legacy-gun")
+        assert (counter.lifetime_rounds, counter.rounds_since_maintenance) == (30, 20)
+        days = session.exec(select(GunDailyRounds.day, GunDailyRounds.cumulative_shots).order_by(GunDailyRounds.day)).all()
+        assert days == [(date(2025, 1, 5), 10), (date(2025, 1, 9), 30)]
+        buckets = session.get(AccuracyHistogram, "legacy-user").buckets
+        assert (buckets[90], buckets[50], sum(buckets)) == (1, 1, 2)
+    engine.dispose()